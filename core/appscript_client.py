@@ -1,5 +1,6 @@
 import requests
-from typing import Optional, List
+from typing import Optional, List, Dict, Mapping
+from urllib.parse import urlsplit, parse_qs
 from .config import (
     SCRIPT_URL,
     SHEET_ID,
@@ -8,10 +9,14 @@ from .config import (
     AWS_REGION,
     S3_BUCKET_NAME
 )
+from .survey_loader import thaw
+
+# one pooled session shared by every batch (and tenant) of the process
+_session = requests.Session()
 
 def call_appscript(
     video_path: str,
-    survey_data: dict,
+    survey_data: Mapping,
     video_name: str,
     video_url: str
 ) -> Optional[str]:
@@ -30,7 +35,7 @@ def call_appscript_batch(
     video_urls: List[str],
     video_times: List[str],
     video_end_times: List[str],  # Add new parameter
-    survey_data_list: List[dict]
+    survey_data_list: List[Mapping]
 ) -> Optional[str]:
     """
     call the appscript to generate the pages
@@ -40,7 +45,7 @@ def call_appscript_batch(
     video_urls (List[str]): List of Amazon S3 links for each video
     video_times (List[str]): List of ISO timestamps for each video
     video_end_times (List[str]): List of ISO end timestamps for each video
-    survey_data_list (List[dict]): List of survey JSONs, one for each video
+    survey_data_list (List[Mapping]): List of survey JSONs, one for each video
     output:
     Optional[str]: The generated page URL, or None on failure.
     """
@@ -50,7 +55,8 @@ def call_appscript_batch(
         "videoUrls": video_urls,
         "videoTimes": video_times,
         "videoEndTimes": video_end_times,  # Add to payload
-        "surveyJsonList": survey_data_list,
+        # surveys are shared read-only mappings, json needs plain dicts
+        "surveyJsonList": [thaw(survey) for survey in survey_data_list],
         "sheetId": SHEET_ID,
         "awsAccessKey": AWS_ACCESS_KEY_ID,
         "awsSecretKey": AWS_SECRET_ACCESS_KEY,
@@ -58,7 +64,7 @@ def call_appscript_batch(
         "s3Bucket": S3_BUCKET_NAME
     }
     try:
-        resp = requests.post(SCRIPT_URL, json=payload, timeout=(5, 30))
+        resp = _session.post(SCRIPT_URL, json=payload, timeout=(5, 30))
         resp.raise_for_status()
         return resp.text.strip()
     except requests.Timeout:
@@ -68,8 +74,40 @@ def call_appscript_batch(
     return None
 
 
+def page_id_from_url(page_url: str) -> Optional[str]:
+    """Return the page id (the ?id= query value) of a generated survey page URL."""
+    values = parse_qs(urlsplit(page_url).query).get("id")
+    return values[0] if values else None
 
 
+def get_survey_statuses(page_ids: List[str], script_url: str = SCRIPT_URL) -> Optional[Dict[str, bool]]:
+    """
+    ask the appscript for the completion state of many survey pages at once
+    input:
+    page_ids (List[str]): ids of the generated pages (see page_id_from_url)
+    script_url (str): Apps Script endpoint
+    output:
+    Optional[Dict[str, bool]]: page id -> True if the survey was submitted
+    (its page destroyed), False if still open. Ids the script does not know
+    are left out. None if the call failed.
 
-
-
+    request:  {"action": "status", "pageIds": [...], "sheetId": ...}
+    response: {"statuses": {"<page id>": true | false, ...}}
+    """
+    if not page_ids:
+        return {}
+    payload = {
+        "action": "status",
+        "pageIds": page_ids,
+        "sheetId": SHEET_ID
+    }
+    try:
+        resp = _session.post(script_url, json=payload, timeout=(5, 30))
+        resp.raise_for_status()
+        statuses = resp.json()["statuses"]
+        return {str(k): bool(v) for k, v in statuses.items()}
+    except requests.Timeout:
+        print("❌ call Apps Script status timeout")
+    except (requests.RequestException, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"❌ unexpected call Apps Script status: {e}")
+    return None
@@ -0,0 +1,159 @@
+import os
+import time
+import datetime
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .video_metadata import extract_timestamp_from_filename
+from .config import BACKLOG_SESSION_GAP, BACKLOG_MAX_SESSION_FILES, BACKLOG_SESSION_DELAY
+
+
+def group_into_sessions(paths: List[str], session_gap: float = BACKLOG_SESSION_GAP,
+                        max_files: int = BACKLOG_MAX_SESSION_FILES) -> List[List[str]]:
+    """
+    Group video files into recording sessions, oldest first.
+
+    Files are ordered by the timestamp in their filename (file mtime when the
+    name has none); a gap of more than session_gap seconds starts a new
+    session, and so does reaching max_files files.
+    """
+    timed: List[Tuple[float, str]] = []
+    for path in paths:
+        iso_ts, _ = extract_timestamp_from_filename(os.path.basename(path))
+        try:
+            ts = datetime.datetime.fromisoformat(iso_ts).timestamp() if iso_ts else os.path.getmtime(path)
+        except (OSError, ValueError):
+            ts = 0.0
+        timed.append((ts, path))
+    timed.sort()
+
+    sessions: List[List[str]] = []
+    last_ts = None
+    for ts, path in timed:
+        if not sessions or ts - last_ts > session_gap or len(sessions[-1]) >= max_files:
+            sessions.append([])
+        sessions[-1].append(path)
+        last_ts = ts
+    return sessions
+
+
+class BacklogDrainer:
+    """
+    Catch up on files that arrived while AVAS was not running.
+
+    The backlog is grouped into sessions (group_into_sessions) and each
+    session is processed as one batch through VideoHandler.process_batch, on
+    a background thread so startup is not delayed. Between sessions the
+    drainer waits session_delay seconds, and it only starts a session while
+    the video handler has no live batch pending. Within a session the handler
+    itself holds off between files while a live batch is pending, so new
+    recordings are not held up behind the backlog.
+    """
+
+    def __init__(self, video_handler, paths: List[str],
+                 session_gap: float = BACKLOG_SESSION_GAP,
+                 max_files: int = BACKLOG_MAX_SESSION_FILES,
+                 session_delay: float = BACKLOG_SESSION_DELAY,
+                 on_progress: Optional[Callable[[Dict], None]] = None,
+                 poll_interval: float = 1.0):
+        """
+        Args:
+            video_handler: VideoHandler the sessions are handed to
+            paths: backlog file paths
+            session_gap: seconds between recordings that start a new session
+            max_files: most files in one session
+            session_delay: pause between sessions in seconds (rate limit)
+            on_progress: called with progress() after every session
+            poll_interval: how often to check again while live events are pending
+        """
+        self.video_handler = video_handler
+        self.sessions = group_into_sessions(paths, session_gap, max_files)
+        self.session_delay = session_delay
+        self.on_progress = on_progress
+        self.poll_interval = poll_interval
+
+        self.total_files = sum(len(s) for s in self.sessions)
+        self.done_files = 0
+        self.done_sessions = 0
+        self.started_at: Optional[float] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not self.sessions or (self._thread and self._thread.is_alive()):
+            return self
+        print(f"Catch-up: {self.total_files} backlog files in {len(self.sessions)} sessions")
+        self._thread = threading.Thread(target=self.run, name="backlog-drainer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after the session in progress."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def progress(self) -> Dict:
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        remaining = None
+        if self.done_files:
+            remaining = elapsed / self.done_files * (self.total_files - self.done_files)
+        return {
+            "sessions_done": self.done_sessions,
+            "sessions_total": len(self.sessions),
+            "files_done": self.done_files,
+            "files_total": self.total_files,
+            "elapsed": elapsed,
+            "eta": remaining,
+        }
+
+    def run(self):
+        """Drain all sessions on the calling thread."""
+        self.started_at = time.time()
+        for index, session in enumerate(self.sessions):
+            if not self._wait_for_live_events():
+                break
+            try:
+                self.video_handler.process_batch(session, backlog=True)
+            except Exception as e:
+                print(f"Catch-up: session {index + 1} failed: {e}")
+            self.done_sessions += 1
+            self.done_files += len(session)
+            self._report()
+            if index + 1 < len(self.sessions) and self._stop.wait(self.session_delay):
+                break
+
+        if self.done_sessions == len(self.sessions):
+            print(f"Catch-up complete: {self.done_files} files in {time.time() - self.started_at:.0f}s")
+        else:
+            print(f"Catch-up stopped: {self.done_files}/{self.total_files} files processed")
+
+    def _wait_for_live_events(self) -> bool:
+        """Wait until the live batch queue is idle; False if stopped meanwhile."""
+        while not self._stop.is_set():
+            if self.video_handler.is_idle():
+                return True
+            self._stop.wait(self.poll_interval)
+        return False
+
+    def _report(self):
+        progress = self.progress()
+        eta = f", about {progress['eta']:.0f}s left" if progress['eta'] is not None else ""
+        print(
+            f"Catch-up: {progress['files_done']}/{progress['files_total']} files "
+            f"({progress['sessions_done']}/{progress['sessions_total']} sessions){eta}"
+        )
+        if self.on_progress:
+            try:
+                self.on_progress(progress)
+            except Exception as e:
+                print(f"Catch-up progress callback failed: {e}")
@@ -18,6 +18,8 @@ AWS_ACCESS_KEY_ID     = os.environ.get("AWS_ACCESS_KEY_ID", "")
 AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY", "")
 AWS_REGION            = os.environ.get("AWS_REGION", "eu-north-1")
 S3_BUCKET_NAME        = os.environ.get("S3_BUCKET_NAME", "")
+# S3-compatible endpoint (MinIO, a local stand-in); empty = AWS
+S3_ENDPOINT_URL       = os.environ.get("S3_ENDPOINT_URL", "")
             
 #target folder setting
 WATCH_DIR = Path(f"{PROJECT_ROOT.parent}/highlights")
@@ -31,13 +33,23 @@ SURVEY_JSON_PATH = Path(
     )
 )
 SURVEY_JSON_PATH.parent.mkdir(parents=True, exist_ok=True)
+# rules choosing a survey template per video by filename prefix, time of day or duration,
+# survey files relative to its directory (see core/survey_rules.py); without it every
+# video gets SURVEY_JSON_PATH
+SURVEY_RULES_FILE = Path(os.environ.get("SURVEY_RULES_FILE", SURVEY_JSON_PATH.parent / "rules.json"))
 
 # Apps Script URL
-SCRIPT_URL = (
+SCRIPT_URL = os.environ.get(
+    "SCRIPT_URL",
     "https://script.google.com/macros/s/"
     "AKfycbxKbuS1CGC6kGLPJqkPqsjWQGnOV4k_6dTN7Og5SBvoD77PwUN1XIjJ-dvy4bPExblbHw/exec"
 )
 
+# ask the Apps Script for survey completion in one {"action": "status"} call per check;
+# only enable once the deployed script handles that action (see README), otherwise
+# every survey page is downloaded and inspected
+APPSCRIPT_STATUS_ENABLED = os.environ.get("APPSCRIPT_STATUS_ENABLED", "0").lower() in ("1", "true", "yes")
+
 # ─── Google Sheet setting ───
 SHEET_ID = os.environ.get("SHEET_ID", "")
 
@@ -49,14 +61,114 @@ SMTP_USERNAME   = os.environ.get("SMTP_USERNAME", "")
 SMTP_PASSWORD   = os.environ.get("SMTP_PASSWORD", "")
 FROM_EMAIL      = os.environ.get("FROM_EMAIL", "")
 
+# idle SMTP sessions kept open for reuse, and how long they may stay idle (seconds)
+SMTP_POOL_SIZE    = int(os.environ.get("SMTP_POOL_SIZE", "1"))
+SMTP_IDLE_TIMEOUT = float(os.environ.get("SMTP_IDLE_TIMEOUT", "120"))
+SMTP_TIMEOUT      = float(os.environ.get("SMTP_TIMEOUT", "30"))
+# only turn off for a local relay or test server that does not offer TLS
+SMTP_STARTTLS     = os.environ.get("SMTP_STARTTLS", "1").lower() in ("1", "true", "yes")
+
+"""
+Batch notifications are written to NOTIFY_SPOOL_DIR and sent by a background dispatcher.
+NOTIFY_DIGEST_WINDOW (seconds, 0 = off): batches finishing within the window share one email
+failed sends are retried after NOTIFY_RETRY_BASE * 2^attempts seconds, capped at NOTIFY_RETRY_MAX,
+and moved to the spool's failed/ folder after NOTIFY_MAX_ATTEMPTS
+"""
+NOTIFY_SPOOL_DIR     = Path(os.environ.get("NOTIFY_SPOOL_DIR", PROJECT_ROOT / "data" / "notification_spool"))
+NOTIFY_DIGEST_WINDOW = float(os.environ.get("NOTIFY_DIGEST_WINDOW", "0"))
+NOTIFY_RETRY_BASE    = float(os.environ.get("NOTIFY_RETRY_BASE", "30"))
+NOTIFY_RETRY_MAX     = float(os.environ.get("NOTIFY_RETRY_MAX", "3600"))
+NOTIFY_MAX_ATTEMPTS  = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", "20"))
+
 
 # ─── survey reminder setting ───
 REMINDER_CHECK_HOUR = int(os.environ.get("REMINDER_CHECK_HOUR", "13"))
 REMINDER_CHECK_MINUTE = int(os.environ.get("REMINDER_CHECK_MINUTE", "14"))
-
-
-
-
-
-
-
+# days after creation on which a pending survey is included in the reminder; after the
+# last one it repeats with the last gap (1,3,7 -> day 1, 3, 7, 11, 15, ...)
+REMINDER_BACKOFF_DAYS = [
+    int(day) for day in os.environ.get("REMINDER_BACKOFF_DAYS", "1,3,7").split(",") if day.strip()
+]
+# survey pages checked in parallel, and the cap on parallel requests to one host
+REMINDER_CHECK_WORKERS = int(os.environ.get("REMINDER_CHECK_WORKERS", "32"))
+REMINDER_PER_HOST_LIMIT = int(os.environ.get("REMINDER_PER_HOST_LIMIT", "16"))
+# with the webhook enabled, survey pages are only probed every REMINDER_RECONCILE_DAYS days
+REMINDER_RECONCILE_DAYS = float(os.environ.get("REMINDER_RECONCILE_DAYS", "7"))
+PENDING_SURVEYS_FILE = Path(os.environ.get("PENDING_SURVEYS_FILE", PROJECT_ROOT / "data" / "pending_surveys.json"))
+# pending survey changes appended to the log before it is folded into pending_surveys.json
+SURVEY_STORE_COMPACT_EVERY = int(os.environ.get("SURVEY_STORE_COMPACT_EVERY", "200"))
+
+
+# ─── survey completion webhook ───
+# POST /survey-complete on WEBHOOK_HOST:WEBHOOK_PORT removes a survey from the reminder (0 = disabled)
+WEBHOOK_HOST  = os.environ.get("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT  = int(os.environ.get("WEBHOOK_PORT", "0"))
+# if set, callers must send it in the X-AVAS-Token header or ?token=; browser pages
+# (the survey page) may only call the webhook cross-origin when it is set
+WEBHOOK_TOKEN = os.environ.get("WEBHOOK_TOKEN", "")
+
+
+# ─── metrics ───
+# GET /metrics on METRICS_HOST:METRICS_PORT in the Prometheus text format (0 = disabled)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# ─── control API ───
+# status and control endpoints for the `status`, `flush`, ... CLI commands (0 = disabled)
+CONTROL_HOST = os.environ.get("CONTROL_HOST", "127.0.0.1")
+CONTROL_PORT = int(os.environ.get("CONTROL_PORT", "0"))
+# if set, callers must send it in the X-AVAS-Token header
+CONTROL_TOKEN = os.environ.get("CONTROL_TOKEN", "")
+
+# ─── tracing ───
+# per-video span log, one JSON object per line (empty = stderr)
+TRACE_LOG_FILE = os.environ.get("TRACE_LOG_FILE", str(PROJECT_ROOT / "data" / "logs" / "trace.jsonl"))
+
+# ─── scheduler setting ───
+# longest single sleep of the job scheduler; bounds how late a run is noticed after suspend
+SCHEDULER_MAX_SLEEP = float(os.environ.get("SCHEDULER_MAX_SLEEP", "60"))
+# seconds between directory state snapshots
+STATE_UPDATE_INTERVAL = float(os.environ.get("STATE_UPDATE_INTERVAL", "60"))
+# per-file processing state of the watch directory
+STATE_DB_FILE = Path(os.environ.get("STATE_DB_FILE", PROJECT_ROOT / "data" / "directory_state.db"))
+# processing attempts after which a file is no longer retried at startup
+STATE_MAX_ATTEMPTS = int(os.environ.get("STATE_MAX_ATTEMPTS", "3"))
+# seconds a shutdown waits for the batch in flight before giving up on it
+SHUTDOWN_DRAIN_TIMEOUT = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT", "10"))
+
+# ─── offline backlog catch-up ───
+# recordings further apart than this (seconds) belong to different sessions
+BACKLOG_SESSION_GAP = float(os.environ.get("BACKLOG_SESSION_GAP", "1800"))
+# most backlog files processed as one batch
+BACKLOG_MAX_SESSION_FILES = int(os.environ.get("BACKLOG_MAX_SESSION_FILES", "20"))
+# pause between backlog sessions (seconds)
+BACKLOG_SESSION_DELAY = float(os.environ.get("BACKLOG_SESSION_DELAY", "1"))
+
+# ─── worker processes ───
+# 0 = process batches in the watcher process; N = hand them to N worker processes
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", "0"))
+JOB_QUEUE_FILE = Path(os.environ.get("JOB_QUEUE_FILE", PROJECT_ROOT / "data" / "jobs.db"))
+# seconds between heartbeats of a running job, and without one after which it is taken over
+WORKER_HEARTBEAT = float(os.environ.get("WORKER_HEARTBEAT", "10"))
+WORKER_STALE_AFTER = float(os.environ.get("WORKER_STALE_AFTER", "60"))
+# how often an idle worker looks for new jobs (seconds)
+WORKER_POLL_INTERVAL = float(os.environ.get("WORKER_POLL_INTERVAL", "1"))
+
+# ─── multi-node leases ───
+# several nodes sharing one watch directory (e.g. over NFS) claim files with lease files
+LEASE_ENABLED = os.environ.get("LEASE_ENABLED", "0").lower() in ("1", "true", "yes")
+# where lease files live (default: .avas-leases inside the watch directory)
+LEASE_DIR = os.environ.get("LEASE_DIR", "")
+# seconds without heartbeat after which another node takes a file over, and the heartbeat interval
+LEASE_TTL = float(os.environ.get("LEASE_TTL", "120"))
+LEASE_HEARTBEAT = float(os.environ.get("LEASE_HEARTBEAT", "20"))
+# .done markers are deleted once their video is gone from the watch directory; with a
+# retention (seconds, 0 = off) also when older, and a video still there may then be processed again
+LEASE_DONE_RETENTION = float(os.environ.get("LEASE_DONE_RETENTION", "0"))
+
+# ─── tenants ───
+# JSON file listing several watch directories served by one process (empty = WATCH_DIR only),
+# see core/tenants.py for the format
+TENANTS_FILE = os.environ.get("TENANTS_FILE", "")
+# batches processed at the same time across all tenants, handed out round-robin
+TENANT_BATCH_SLOTS = int(os.environ.get("TENANT_BATCH_SLOTS", "2"))
@@ -0,0 +1,98 @@
+import hmac
+from typing import Dict, Optional
+
+import requests
+
+from .local_http import LocalHTTPServer, Request
+from .config import CONTROL_HOST, CONTROL_PORT, CONTROL_TOKEN
+
+# action name -> HTTP method; the path is /<action>
+ACTIONS = {
+    "status": "GET",
+    "flush": "POST",
+    "retry-failed": "POST",
+    "pause": "POST",
+    "resume": "POST",
+}
+
+
+class ControlAPI:
+    """
+    Local API to inspect and steer a running MonitorCore.
+
+        GET  /status        queued files, running stage per file, recent
+                            failures, catch-up progress, pending surveys
+        POST /flush         start the pending batch now
+        POST /retry-failed  retry every failed file
+        POST /pause         hold batches and uploads (events keep queueing)
+        POST /resume        continue
+    """
+
+    def __init__(self, monitor, host: str = CONTROL_HOST, port: int = CONTROL_PORT,
+                 token: str = CONTROL_TOKEN):
+        """
+        Args:
+            monitor: MonitorCore to report on and control
+            host: interface to bind
+            port: TCP port (0 picks a free one)
+            token: shared secret expected in X-AVAS-Token, empty to accept any local caller
+        """
+        self.monitor = monitor
+        self.token = token
+        self.server = LocalHTTPServer(host, port, name="control api")
+        self.server.route("GET", "/status", self._guard(lambda request: monitor.status()))
+        self.server.route("POST", "/flush", self._guard(lambda request: {"flushed": monitor.flush()}))
+        self.server.route("POST", "/retry-failed", self._guard(lambda request: {"retried": monitor.retry_failed()}))
+        self.server.route("POST", "/pause", self._guard(lambda request: self._set_paused(True)))
+        self.server.route("POST", "/resume", self._guard(lambda request: self._set_paused(False)))
+
+    @property
+    def url(self) -> str:
+        return self.server.url
+
+    def start(self):
+        self.server.start()
+        return self
+
+    def stop(self):
+        self.server.stop()
+
+    def _set_paused(self, paused: bool) -> Dict:
+        if paused:
+            self.monitor.pause()
+        else:
+            self.monitor.resume()
+        return {"paused": paused}
+
+    def _guard(self, action):
+        def handler(request: Request):
+            if self.token:
+                supplied = request.headers.get("X-AVAS-Token") or ""
+                if not hmac.compare_digest(supplied, self.token):
+                    return 401, {"error": "invalid token"}
+            return 200, action(request)
+        return handler
+
+
+def start_control_api(monitor) -> Optional[ControlAPI]:
+    """Start the control API if CONTROL_PORT is configured."""
+    if not CONTROL_PORT:
+        return None
+    try:
+        return ControlAPI(monitor).start()
+    except OSError as e:
+        print(f"Control API not started: {e}")
+        return None
+
+
+def call_control(action: str, host: str = CONTROL_HOST, port: int = CONTROL_PORT,
+                 token: str = CONTROL_TOKEN, timeout: float = 10) -> Dict:
+    """Client side: run an action against a running AVAS and return the JSON reply."""
+    if action not in ACTIONS:
+        raise ValueError(f"unknown action {action!r}")
+    if not port:
+        raise RuntimeError("control API disabled, set CONTROL_PORT")
+    headers = {"X-AVAS-Token": token} if token else {}
+    response = requests.request(ACTIONS[action], f"http://{host}:{port}/{action}", headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
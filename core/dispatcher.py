@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import uuid
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .notifier import batch_email, send_notification_email
+from .tracing import span
+from .config import (
+    RECIPIENT_EMAIL,
+    NOTIFY_SPOOL_DIR,
+    NOTIFY_DIGEST_WINDOW,
+    NOTIFY_RETRY_BASE,
+    NOTIFY_RETRY_MAX,
+    NOTIFY_MAX_ATTEMPTS
+)
+
+# upper bound on how long the dispatcher sleeps between spool scans
+_MAX_IDLE_WAIT = 60.0
+
+
+class NotificationDispatcher:
+    """
+    Send notification emails from an on-disk spool in a background thread.
+
+    Every notification is written to spool_dir as one JSON file before
+    enqueue() returns, so an SMTP outage never blocks the caller and nothing
+    is lost on restart. Failed sends are retried with exponential backoff.
+    With a digest window, batch notifications that arrive within the window
+    are merged into a single email per recipient.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Optional[Path] = None,
+        digest_window: float = NOTIFY_DIGEST_WINDOW,
+        retry_base: float = NOTIFY_RETRY_BASE,
+        retry_max: float = NOTIFY_RETRY_MAX,
+        max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+    ):
+        """
+        Args:
+            spool_dir: directory holding one JSON file per queued notification (default NOTIFY_SPOOL_DIR)
+            digest_window: seconds to hold batch notifications for merging (0 = off)
+            retry_base: first retry delay in seconds, doubled on every failure
+            retry_max: cap for the retry delay in seconds
+            max_attempts: failed attempts before a notification is moved to failed/
+        """
+        self.spool_dir = Path(spool_dir) if spool_dir else NOTIFY_SPOOL_DIR
+        self.failed_dir = self.spool_dir / "failed"
+        self.failed_dir.mkdir(parents=True, exist_ok=True)
+        self.digest_window = digest_window
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_attempts = max_attempts
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the dispatcher thread; notifications left in the spool are resent."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the dispatcher thread; unsent notifications stay in the spool."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def flush(self):
+        """Send everything that is queued now, ignoring the digest window."""
+        self._flush = True
+        self._wake.set()
+
+    def enqueue_batch(self, video_names: List[str], video_urls: List[str], recipient: str = RECIPIENT_EMAIL,
+                      trace_ids: Optional[List[str]] = None):
+        """Queue a batch-complete notification (eligible for digesting); trace_ids are the videos' traces."""
+        self._write_entry({
+            'kind': 'batch',
+            'recipient': recipient,
+            'video_names': list(video_names),
+            'video_urls': list(video_urls),
+            'trace_ids': list(trace_ids or []),
+        })
+
+    def enqueue_email(self, recipient: str, subject: str, body: str):
+        """Queue a plain email (never digested)."""
+        self._write_entry({
+            'kind': 'email',
+            'recipient': recipient,
+            'subject': subject,
+            'body': body,
+        })
+
+    def pending_count(self) -> int:
+        return len(list(self.spool_dir.glob("*.json")))
+
+    def _write_entry(self, entry: Dict):
+        now = time.time()
+        entry_id = f"{int(now * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        entry.update({'id': entry_id, 'created_at': now, 'attempts': 0, 'next_attempt': now})
+        self._save_entry(entry)
+        self._wake.set()
+
+    def _save_entry(self, entry: Dict):
+        # write-then-rename so the dispatcher never reads a half-written file
+        path = self.spool_dir / f"{entry['id']}.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _load_spool(self) -> List[Dict]:
+        entries = []
+        for path in sorted(self.spool_dir.glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries.append(json.load(f))
+            except Exception as e:
+                print(f"Error reading spooled notification {path.name}: {e}")
+        return entries
+
+    def _remove_entry(self, entry: Dict):
+        try:
+            os.remove(self.spool_dir / f"{entry['id']}.json")
+        except FileNotFoundError:
+            pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            # cleared before the scan, so an enqueue during or after it ends the next wait
+            self._wake.clear()
+            try:
+                delay = self.dispatch_due()
+            except Exception as e:
+                print(f"Notification dispatcher error: {e}")
+                delay = self.retry_base
+            self._wake.wait(delay)
+
+    def dispatch_due(self) -> float:
+        """
+        Send every notification that is due.
+
+        Returns:
+            Seconds until the next queued notification becomes due
+        """
+        now = time.time()
+        flush, self._flush = self._flush, False
+        next_due = now + _MAX_IDLE_WAIT
+
+        emails: List[Tuple[List[Dict], str, str, str]] = []
+        batches: Dict[str, List[Dict]] = {}
+        for entry in self._load_spool():
+            if entry['next_attempt'] > now and not flush:
+                next_due = min(next_due, entry['next_attempt'])
+            elif entry['kind'] == 'batch':
+                batches.setdefault(entry['recipient'], []).append(entry)
+            else:
+                emails.append(([entry], entry['recipient'], entry['subject'], entry['body']))
+
+        for recipient, group in batches.items():
+            release_at = min(e['created_at'] for e in group) + self.digest_window
+            retrying = any(e['attempts'] for e in group)
+            if release_at > now and not retrying and not flush:
+                next_due = min(next_due, release_at)
+                continue
+            emails.append((group, recipient) + self._digest(group))
+
+        for group, recipient, subject, body in emails:
+            try:
+                if group[0]['kind'] == 'batch':
+                    # the last stage of each video's trace, timed around the actual send
+                    with span("notify", trace_ids=[t for e in group for t in e.get('trace_ids', [])],
+                              videos=sum(len(e['video_names']) for e in group),
+                              queued_ms=round((now - min(e['created_at'] for e in group)) * 1000, 3),
+                              attempt=max(e['attempts'] for e in group) + 1):
+                        send_notification_email(recipient, subject, body)
+                else:
+                    send_notification_email(recipient, subject, body)
+            except Exception as e:
+                print(f"Failed to send notification ({len(group)} queued): {e}")
+                retry_at = self._reschedule(group, now)
+                if retry_at is not None:
+                    next_due = min(next_due, retry_at)
+                continue
+            for entry in group:
+                self._remove_entry(entry)
+            print(f"Sent notification to {recipient}: {subject}")
+
+        return max(0.0, next_due - time.time())
+
+    @staticmethod
+    def _digest(group: List[Dict]) -> Tuple[str, str]:
+        video_urls = []
+        for entry in group:
+            video_urls.extend(url for url in entry['video_urls'] if url not in video_urls)
+        subject, body = batch_email(video_urls)
+        if len(group) > 1:
+            video_count = sum(len(e['video_names']) for e in group)
+            subject = f"{subject} ({len(group)} batches, {video_count} videos)"
+        return subject, body
+
+    def _reschedule(self, group: List[Dict], now: float) -> Optional[float]:
+        retry_at = None
+        for entry in group:
+            entry['attempts'] += 1
+            if entry['attempts'] >= self.max_attempts:
+                print(f"Giving up on notification {entry['id']} after {entry['attempts']} attempts")
+                self._remove_entry(entry)
+                entry['next_attempt'] = None
+                with open(self.failed_dir / f"{entry['id']}.json", 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                continue
+            delay = min(self.retry_base * (2 ** (entry['attempts'] - 1)), self.retry_max)
+            entry['next_attempt'] = now + delay
+            self._save_entry(entry)
+            retry_at = entry['next_attempt'] if retry_at is None else min(retry_at, entry['next_attempt'])
+        return retry_at
+
+
+# Global instance
+_dispatcher_instance: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher(start: bool = True) -> NotificationDispatcher:
+    """
+    Get or create the global dispatcher, starting its thread on first use.
+
+    Worker processes create it with start=False: they only write to the
+    spool, and the watcher process sends.
+    """
+    global _dispatcher_instance
+    with _dispatcher_lock:
+        if _dispatcher_instance is None:
+            _dispatcher_instance = NotificationDispatcher()
+            if start:
+                _dispatcher_instance.start()
+        return _dispatcher_instance
+
+
+def stop_dispatcher(timeout: Optional[float] = None):
+    """
+    Stop the global dispatcher if it was started; queued notifications stay
+    in the spool and are sent by the next get_dispatcher().
+    """
+    global _dispatcher_instance
+    with _dispatcher_lock:
+        dispatcher, _dispatcher_instance = _dispatcher_instance, None
+    if dispatcher is not None:
+        dispatcher.stop(timeout)
+
+
+def notify_batch(video_names: List[str], video_urls: List[str], recipient: str = RECIPIENT_EMAIL,
+                 trace_ids: Optional[List[str]] = None) -> None:
+    """Queue a batch-complete notification; sending happens in the background."""
+    get_dispatcher().enqueue_batch(video_names, video_urls, recipient, trace_ids)
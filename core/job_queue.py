@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# job status values
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    paths      TEXT    NOT NULL,
+    status     TEXT    NOT NULL DEFAULT 'queued',
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    worker     TEXT,
+    heartbeat  REAL,
+    error      TEXT,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS job_paths (
+    path   TEXT PRIMARY KEY,
+    job_id INTEGER NOT NULL
+);
+"""
+
+
+class Job:
+    """A claimed batch of video paths."""
+
+    def __init__(self, job_id: int, paths: List[str], attempts: int):
+        self.id = job_id
+        self.paths = paths
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"Job({self.id}, {len(self.paths)} files, attempt {self.attempts})"
+
+
+class JobQueue:
+    """
+    Durable queue of processing jobs shared by the watcher and worker processes.
+
+    A job is one batch of video paths. The watcher enqueues, workers claim
+    the oldest queued job in an IMMEDIATE transaction (so two workers never
+    get the same job) and keep a heartbeat on it while processing. Jobs of
+    a worker that died are put back with requeue_stale() / requeue_worker().
+    A path is in at most one unfinished job, so enqueuing the same file again
+    (e.g. after a watcher restart) does not duplicate work.
+    """
+
+    def __init__(self, db_file: Path, max_attempts: int = 3):
+        """
+        Args:
+            db_file: SQLite file, created if missing
+            max_attempts: claims after which a job that keeps failing is left failed
+        """
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        self._connect()
+
+    def _connect(self):
+        # a connection must not be shared across a fork
+        self._conn = sqlite3.connect(str(self.db_file), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._pid = os.getpid()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, paths: Iterable[str]) -> Optional[int]:
+        """Queue a job for the paths not already waiting or running; returns its id, or None."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                fresh = [p for p in dict.fromkeys(paths)
+                         if db.execute("SELECT 1 FROM job_paths WHERE path = ?", (p,)).fetchone() is None]
+                if not fresh:
+                    return None
+                job_id = db.execute(
+                    "INSERT INTO jobs (paths, status, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (json.dumps(fresh), QUEUED, now, now)
+                ).lastrowid
+                db.executemany("INSERT INTO job_paths (path, job_id) VALUES (?, ?)", ((p, job_id) for p in fresh))
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Take the oldest queued job for worker, or None if there is none."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                row = db.execute(
+                    "SELECT id, paths, attempts FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, paths, attempts = row
+                db.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, heartbeat = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (RUNNING, worker, now, now, job_id)
+                )
+        return Job(job_id, json.loads(paths), attempts + 1)
+
+    def heartbeat(self, job_id: int):
+        with self._lock:
+            self._db().execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def complete(self, job_id: int):
+        self._finish(job_id, DONE, None)
+
+    def fail(self, job_id: int, error: str):
+        """Record a failed run; the job is queued again until max_attempts."""
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                row = db.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return
+                status = FAILED if row[0] >= self.max_attempts else QUEUED
+                db.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, error = ?, updated_at = ? WHERE id = ?",
+                    (status, error, time.time(), job_id)
+                )
+                if status == FAILED:
+                    db.execute("DELETE FROM job_paths WHERE job_id = ?", (job_id,))
+
+    def _finish(self, job_id: int, status: str, error: Optional[str]):
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (status, error, time.time(), job_id)
+                )
+                db.execute("DELETE FROM job_paths WHERE job_id = ?", (job_id,))
+
+    def requeue_stale(self, older_than: float) -> int:
+        """Put back running jobs whose heartbeat is older than older_than seconds."""
+        return self._requeue("heartbeat < ?", (time.time() - older_than,))
+
+    def requeue_worker(self, worker: str) -> int:
+        """Put back the running jobs of a worker known to be gone."""
+        return self._requeue("worker = ?", (worker,))
+
+    def _requeue(self, condition: str, params: tuple) -> int:
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                count = db.execute(
+                    f"UPDATE jobs SET status = ?, worker = NULL, updated_at = ? WHERE status = ? AND {condition}",
+                    (QUEUED, time.time(), RUNNING) + params
+                ).rowcount
+        if count:
+            print(f"Job queue: {count} interrupted jobs queued again")
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def running(self) -> List[Dict]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT id, paths, worker, heartbeat FROM jobs WHERE status = ? ORDER BY id", (RUNNING,)
+            ).fetchall()
+        return [{"id": i, "paths": json.loads(p), "worker": w, "heartbeat": h} for i, p, w, h in rows]
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs older than older_than seconds."""
+        with self._lock:
+            return self._db().execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - older_than)
+            ).rowcount
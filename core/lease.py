@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .config import LEASE_DIR, LEASE_TTL, LEASE_HEARTBEAT, LEASE_DONE_RETENTION
+
+# claim() results
+CLAIMED = "claimed"
+HELD = "held"
+DONE = "done"
+
+LEASE_DIR_NAME = ".avas-leases"
+
+
+class LeaseManager:
+    """
+    Claim video files across several AVAS nodes sharing one watch directory.
+
+    Before a node processes a file it creates <lease dir>/<file>.lease with
+    O_CREAT|O_EXCL, which succeeds on exactly one node (also over NFSv3+).
+    While the file is processed a heartbeat thread touches the lease; a
+    lease not touched for ttl seconds is expired and may be taken over, so
+    the files of a node that died mid-upload are picked up by another. When
+    a file is finished a <file>.done marker is written before the lease is
+    removed, and no node claims it again. prune_done() deletes the markers
+    of files that have left the watch directory.
+
+    Lease expiry compares the lease's mtime with the local clock, so node
+    clocks must be synchronised to well within ttl.
+    """
+
+    def __init__(self, node_id: Optional[str] = None, ttl: float = LEASE_TTL,
+                 heartbeat: float = LEASE_HEARTBEAT, lease_dir: Optional[str] = LEASE_DIR or None,
+                 done_retention: float = LEASE_DONE_RETENTION):
+        """
+        Args:
+            node_id: name written into leases (default host-pid)
+            ttl: seconds without heartbeat after which a lease is expired
+            heartbeat: seconds between lease renewals
+            lease_dir: directory for lease files (default .avas-leases next to each video)
+            done_retention: seconds after which prune_done() deletes a .done
+                marker even if its video is still there (0 = never)
+        """
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.done_retention = done_retention
+        self.lease_dir = Path(lease_dir) if lease_dir else None
+        # path -> token of the lease this node holds
+        self._held: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ─── files ───
+
+    def _dir_for(self, path: str) -> Path:
+        return self.lease_dir or Path(os.path.dirname(os.path.abspath(path))) / LEASE_DIR_NAME
+
+    def _lease_file(self, path: str) -> Path:
+        return self._dir_for(path) / (os.path.basename(path) + ".lease")
+
+    def _done_file(self, path: str) -> Path:
+        return self._dir_for(path) / (os.path.basename(path) + ".done")
+
+    @staticmethod
+    def _read(lease_file: Path) -> Optional[Dict]:
+        try:
+            with open(lease_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _expired(self, lease_file: Path) -> bool:
+        try:
+            return time.time() - os.stat(lease_file).st_mtime > self.ttl
+        except FileNotFoundError:
+            return True
+
+    # ─── claiming ───
+
+    def claim(self, path: str) -> str:
+        """
+        Try to take the lease on path.
+
+        Returns:
+            CLAIMED if this node may process it, HELD if another node holds a
+            live lease, DONE if it was processed already
+        """
+        done_file = self._done_file(path)
+        if done_file.exists():
+            return DONE
+        lease_file = self._lease_file(path)
+        lease_file.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            if path in self._held:
+                return CLAIMED
+
+        for _ in range(3):
+            token = uuid.uuid4().hex
+            try:
+                fd = os.open(lease_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._expired(lease_file):
+                    return HELD
+                if not self._break(lease_file):
+                    return HELD
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"node": self.node_id, "token": token, "claimed_at": time.time()}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            # finished by another node between the done check and the create
+            if done_file.exists():
+                self._remove_if_ours(lease_file, token)
+                return DONE
+            with self._lock:
+                self._held[path] = token
+            return CLAIMED
+        return HELD
+
+    def _break(self, lease_file: Path) -> bool:
+        """
+        Remove an expired lease; True if the caller may try to create it again.
+
+        The lease is renamed away first (only one node's rename succeeds); if
+        what was renamed turns out to be a fresh lease - another node took
+        over in between - it is put back.
+        """
+        stale = lease_file.with_name(f"{lease_file.name}.{uuid.uuid4().hex}.stale")
+        try:
+            os.rename(lease_file, stale)
+        except FileNotFoundError:
+            return True
+        try:
+            if not self._expired(stale):
+                try:
+                    os.link(stale, lease_file)
+                except FileExistsError:
+                    pass
+                return False
+            owner = (self._read(stale) or {}).get("node", "unknown node")
+            print(f"Lease on {lease_file.name[:-len('.lease')]} expired (held by {owner}), taking over")
+            return True
+        finally:
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
+
+    def release(self, path: str, done: bool):
+        """
+        Give up the lease on path. With done=True the file is marked processed
+        for every node (also when this node held no lease, e.g. for outputs).
+        """
+        if done:
+            done_file = self._done_file(path)
+            done_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(done_file, "w", encoding="utf-8") as f:
+                json.dump({"node": self.node_id, "done_at": time.time()}, f)
+        with self._lock:
+            token = self._held.pop(path, None)
+        if token is not None:
+            self._remove_if_ours(self._lease_file(path), token)
+
+    def _remove_if_ours(self, lease_file: Path, token: str):
+        if (self._read(lease_file) or {}).get("token") == token:
+            try:
+                os.unlink(lease_file)
+            except FileNotFoundError:
+                pass
+
+    def held(self) -> List[str]:
+        with self._lock:
+            return list(self._held)
+
+    def orphaned(self, paths: Iterable[str]) -> List[str]:
+        """Paths whose lease has expired without the file being done (its node died)."""
+        result = []
+        for path in paths:
+            lease_file = self._lease_file(path)
+            if lease_file.exists() and self._expired(lease_file) and not self._done_file(path).exists():
+                result.append(path)
+        return result
+
+    def prune_done(self, watch_dir: str) -> int:
+        """
+        Delete the .done markers of files no longer in watch_dir, and with a
+        done_retention those older than it. Safe to run on several nodes.
+
+        Returns:
+            number of markers deleted
+        """
+        marker_dir = self.lease_dir or Path(os.path.abspath(watch_dir)) / LEASE_DIR_NAME
+        try:
+            entries = list(os.scandir(marker_dir))
+        except FileNotFoundError:
+            return 0
+        now = time.time()
+        removed = 0
+        for entry in entries:
+            if not entry.name.endswith(".done"):
+                continue
+            try:
+                expired = self.done_retention > 0 and now - entry.stat().st_mtime > self.done_retention
+                if expired or not os.path.exists(os.path.join(watch_dir, entry.name[:-len(".done")])):
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                # pruned by another node
+                continue
+        return removed
+
+    # ─── heartbeat ───
+
+    def renew(self):
+        """Touch every held lease; leases taken over by another node are dropped."""
+        with self._lock:
+            held = dict(self._held)
+        for path, token in held.items():
+            lease_file = self._lease_file(path)
+            if (self._read(lease_file) or {}).get("token") != token:
+                print(f"Lost the lease on {os.path.basename(path)}")
+                with self._lock:
+                    self._held.pop(path, None)
+                continue
+            try:
+                os.utime(lease_file, None)
+            except FileNotFoundError:
+                pass
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the heartbeat; held leases are released so other nodes need not wait for expiry."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        for path in self.held():
+            self.release(path, done=False)
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat):
+            try:
+                self.renew()
+            except Exception as e:
+                print(f"Lease heartbeat failed: {e}")
@@ -0,0 +1,140 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit, parse_qs
+
+
+class Request:
+    """What a route handler gets to see of an HTTP request."""
+
+    def __init__(self, method: str, path: str, query: Dict[str, str], headers, body: bytes):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Parse the body as JSON; raises ValueError on malformed input."""
+        return json.loads(self.body or b"null")
+
+
+# a handler returns (status, body) or (status, body, content type);
+# dict and list bodies are sent as JSON
+Response = Union[Tuple[int, object], Tuple[int, object, str]]
+Handler = Callable[[Request], Response]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # room for bursts of connections while handler threads start
+    request_queue_size = 128
+
+
+class LocalHTTPServer:
+    """
+    Small threaded HTTP server for AVAS' local endpoints.
+
+    Routes are registered per (method, path); each request runs on its own
+    thread. Binds to 127.0.0.1 by default; port 0 picks a free port.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, name: str = "http", cors: bool = False):
+        """
+        Args:
+            host: interface to bind
+            port: TCP port, 0 for any free port
+            name: used in thread names and log lines
+            cors: allow cross-origin requests (for calls made from a browser page)
+        """
+        self.name = name
+        self.cors = cors
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._httpd = _Server((host, port), self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    @property
+    def url(self) -> str:
+        host = self._httpd.server_address[0]
+        return f"http://{host}:{self.port}"
+
+    def route(self, method: str, path: str, handler: Handler):
+        self._routes[(method.upper(), path)] = handler
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, args=(0.1,), name=f"{self.name}-server", daemon=True
+        )
+        self._thread.start()
+        print(f"{self.name} listening on {self.url}")
+        return self
+
+    def stop(self):
+        if self._thread:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: object, content_type: str = "text/plain; charset=utf-8"):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body, ensure_ascii=False)
+                    content_type = "application/json"
+                data = body if isinstance(body, bytes) else str(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                if server.cors:
+                    self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _dispatch(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+
+                handler = server._routes.get((self.command, parts.path))
+                if handler is None:
+                    allowed = any(path == parts.path for _, path in server._routes)
+                    self._send(405 if allowed else 404, "method not allowed" if allowed else "not found")
+                    return
+
+                query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+                request = Request(self.command, parts.path, query, self.headers, body)
+                try:
+                    self._send(*handler(request))
+                except Exception as e:
+                    print(f"{server.name}: error handling {self.command} {parts.path}: {e}")
+                    self._send(500, {"error": str(e)})
+
+            def do_OPTIONS(self):
+                # CORS preflight
+                self.send_response(204)
+                if server.cors:
+                    self.send_header("Access-Control-Allow-Origin", "*")
+                    self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+                    self.send_header("Access-Control-Allow-Headers", "Content-Type, X-AVAS-Token")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            do_GET = _dispatch
+            do_POST = _dispatch
+
+        return RequestHandler
@@ -1,6 +1,8 @@
-import signal
 import sys
-import time
+import socket
+import signal
+import argparse
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 import os
@@ -8,20 +10,90 @@ import os
 BASE_DIR = Path(__file__).parent
 load_dotenv(BASE_DIR / ".env")
 
-from core.config import WATCH_DIR
+from core.config import WATCH_DIR, TENANTS_FILE
 from core.monitor import MonitorCore
+from core.tenants import load_tenants
+from core.control import ACTIONS, call_control
+from core.worker import run_worker
+
+def run():
+    shutdown = threading.Event()
 
-def main():
-    core = MonitorCore()
-    core.start(str(WATCH_DIR), callback=None) 
     def handle(sig, frame):
-        print("stop monitoring")
-        core.stop()
-        sys.exit(0)
+        print(f"received {signal.Signals(sig).name}, stopping")
+        shutdown.set()
     signal.signal(signal.SIGINT, handle)
-    while True:
-        time.sleep(1)
+    signal.signal(signal.SIGTERM, handle)
 
-if __name__ == "__main__":
-    main()
+    core = MonitorCore()
+    if TENANTS_FILE:
+        core.start_tenants(load_tenants(TENANTS_FILE))
+    else:
+        core.start(str(WATCH_DIR), callback=None) 
+
+    # the signal handler only sets the event; the drain runs here on the main thread
+    shutdown.wait()
+    core.stop()
+
+def print_status(status):
+    state = "paused" if status["paused"] else ("running" if status["running"] else "stopped")
+    print(f"AVAS is {state}")
+    if status.get("tenants"):
+        print(f"Tenants: {', '.join(status['tenants'])}")
+
+    print(f"\nQueued for the next batch ({len(status['queued'])}):")
+    for name in status["queued"]:
+        print(f"  {name}")
 
+    print(f"\nIn progress ({len(status['active'])}):")
+    for item in status["active"]:
+        print(f"  {item['file']:<40} {item['stage']:<8} {item['elapsed']:>7.1f}s")
+
+    if status.get("catch_up"):
+        c = status["catch_up"]
+        print(f"\nCatch-up: {c['files_done']}/{c['files_total']} files ({c['sessions_done']}/{c['sessions_total']} sessions)")
+
+    if status.get("jobs") is not None:
+        jobs = ", ".join(f"{count} {state}" for state, count in sorted(status["jobs"].items())) or "none"
+        alive = sum(1 for w in status["workers"] or [] if w["alive"])
+        print(f"\nJobs: {jobs}; {alive} worker processes alive")
+
+    print(f"\nRecent failures ({len(status['recent_failures'])}):")
+    for item in status["recent_failures"]:
+        print(f"  {item['file']:<40} {item['stage'] or '-':<8} {item['error']}")
+    if status["failed_files"]:
+        print(f"  {len(status['failed_files'])} files marked failed in the directory state (retry-failed to retry)")
+
+    print(f"\nPending surveys ({len(status['pending_surveys'])}):")
+    for survey in status["pending_surveys"]:
+        print(f"  {survey['video_name']:<40} since {survey['created_at']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="avas", description="AVAS video monitor")
+    parser.add_argument(
+        "command", nargs="?", default="run", choices=["run", "worker"] + list(ACTIONS),
+        help="run the monitor (default), run one worker process (with WORKER_PROCESSES set), "
+             "or talk to a running monitor through the control API"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run()
+        return 0
+    if args.command == "worker":
+        run_worker(f"{socket.gethostname()}-{os.getpid()}")
+        return 0
+
+    try:
+        reply = call_control(args.command)
+    except Exception as e:
+        print(f"{args.command} failed: {e}")
+        return 1
+    if args.command == "status":
+        print_status(reply)
+    else:
+        print(reply)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
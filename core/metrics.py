@@ -0,0 +1,255 @@
+import abc
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import METRICS_HOST, METRICS_PORT
+from .local_http import LocalHTTPServer
+
+# label values in a fixed order, used as the key of one time series
+LabelKey = Tuple[str, ...]
+
+
+class _Metric(abc.ABC):
+    """Base for metrics with optional labels; one value per label combination."""
+
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _format_labels(self, key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        inner = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        return "{" + inner + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines of every time series."""
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """
+    Current value; either set explicitly or read from a function at scrape
+    time (set_function), so nothing is updated on the hot path.
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, func: Optional[Callable[[], float]], **labels):
+        """Read the value from func when scraped; None removes it."""
+        key = self._key(labels)
+        with self._lock:
+            if func is None:
+                self._functions.pop(key, None)
+            else:
+                self._functions[key] = func
+
+    def value(self, **labels) -> Optional[float]:
+        key = self._key(labels)
+        with self._lock:
+            func = self._functions.get(key)
+            value = self._values.get(key)
+        return _call(func) if func else value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, func in functions.items():
+            values[key] = _call(func)
+        return [
+            f"{self.name}{self._format_labels(key)} {_number(value)}"
+            for key, value in sorted(values.items()) if value is not None
+        ]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per series: [count per bucket (+Inf last), sum]
+        self._series: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series else 0
+
+    def sum(self, **labels) -> float:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[1] if series else 0.0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float], labels: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, help_text, buckets, labels))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _call(func: Callable[[], float]) -> Optional[float]:
+    try:
+        return func()
+    except Exception:
+        return None
+
+
+# ─── pipeline metrics ───
+
+REGISTRY = Registry()
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "avas_queue_depth", "Videos waiting in the batch queue")
+BATCH_SIZE = REGISTRY.histogram(
+    "avas_batch_size", "Videos per processed batch", buckets=(1, 2, 5, 10, 20, 50, 100))
+STAGE_SECONDS = REGISTRY.histogram(
+    "avas_stage_seconds", "Duration of pipeline stages",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600), labels=("stage",))
+UPLOADED_BYTES = REGISTRY.counter(
+    "avas_uploaded_bytes_total", "Bytes uploaded to S3")
+TRANSCODE_SPEED = REGISTRY.histogram(
+    "avas_transcode_speed_ratio", "Seconds of video transcoded per second of wall time",
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32))
+FAILURES = REGISTRY.counter(
+    "avas_failures_total", "Pipeline failures", labels=("stage",))
+PENDING_SURVEYS = REGISTRY.gauge(
+    "avas_pending_surveys", "Surveys waiting for completion")
+
+
+def create_metrics_server(host: str = METRICS_HOST, port: int = 0,
+                          registry: Registry = REGISTRY) -> LocalHTTPServer:
+    """A LocalHTTPServer serving GET /metrics for registry (not started)."""
+    server = LocalHTTPServer(host, port, name="metrics")
+    server.route("GET", "/metrics", lambda request: (200, registry.render(), "text/plain; version=0.0.4"))
+    return server
+
+
+def start_metrics_server() -> Optional[LocalHTTPServer]:
+    """Start the /metrics endpoint if METRICS_PORT is configured."""
+    if not METRICS_PORT:
+        return None
+    return create_metrics_server(METRICS_HOST, METRICS_PORT).start()
@@ -1,87 +1,270 @@
 import os
 import time
 import threading
+from typing import Dict, List, Optional, Tuple
 from watchdog.observers import Observer
 from .video_handler import VideoHandler
 from .offline_handler import OfflineHandler
+from .scheduler import get_scheduler, stop_scheduler
+from .dispatcher import get_dispatcher, stop_dispatcher
+from .job_queue import JobQueue
+from .worker import WorkerPool
+from .lease import LeaseManager
+from .reminder import get_reminder, stop_reminder
+from .webhook import start_webhook
+from .metrics import QUEUE_DEPTH, PENDING_SURVEYS, start_metrics_server
+from .tracing import stop_trace_logging
+from .control import start_control_api
+from .tenants import Tenant, FairSlots
+from .config import (
+    STATE_UPDATE_INTERVAL,
+    SHUTDOWN_DRAIN_TIMEOUT,
+    WORKER_PROCESSES,
+    JOB_QUEUE_FILE,
+    LEASE_ENABLED,
+    TENANT_BATCH_SLOTS
+)
 
 class MonitorCore:
     def __init__(self):
         self.observer = None
-        self.thread = None
-        self.video_handler = None
-        self.offline_handler = None
-        self.state_update_thread = None
-        self.running = False
+        # tenant name -> (offline handler, video handler); one unnamed entry without tenants
+        self.watches: Dict[str, Tuple[OfflineHandler, VideoHandler]] = {}
+        self.slots: Optional[FairSlots] = None
+        self.state_update_job = None
+        self.webhook = None
+        self.metrics_server = None
+        self.control_api = None
+        self.reminder = None
+        self.job_queue = None
+        self.worker_pool = None
+        self.lease = None
+        self.stopped = threading.Event()
+        self._stop_lock = threading.Lock()
 
-    def start(self, watch_dir: str, callback):
-        if not os.path.exists(watch_dir):
-            raise FileNotFoundError(f"directory doesnot exsit: {watch_dir}")
+    @property
+    def running(self) -> bool:
+        return self.observer is not None and not self.stopped.is_set()
 
-        self.running = True
-        
-        handler = VideoHandler(callback)
-        self.video_handler = handler
+    @property
+    def video_handler(self) -> Optional[VideoHandler]:
+        """The handler of the watch directory in single-directory mode."""
+        watch = self.watches.get("")
+        return watch[1] if watch else None
+
+    @property
+    def offline_handler(self) -> Optional[OfflineHandler]:
+        watch = self.watches.get("")
+        return watch[0] if watch else None
+
+    def start(self, watch_dir: str, callback, workers: int = WORKER_PROCESSES):
+        """
+        Args:
+            watch_dir: directory to watch
+            callback: called with (video_names, page_urls) after a batch (in-process mode only)
+            workers: 0 to process batches in this process, N to hand them to N worker processes
+        """
+        self._start([Tenant("", watch_dir)], callback, workers)
+
+    def start_tenants(self, tenants: List[Tenant], callback=None, slots: int = TENANT_BATCH_SLOTS):
+        """
+        Serve several watch directories from this process.
+
+        Each tenant has its own handlers, state DB, survey, recipient and
+        batch interval; the scheduler, reminder, notification dispatcher,
+        S3 and HTTP clients are shared, and at most `slots` batches run at
+        a time, handed out round-robin between tenants.
+        """
+        if WORKER_PROCESSES:
+            print("WORKER_PROCESSES is ignored with tenants: batches are processed in this process")
+        self._start(tenants, callback, 0, FairSlots(slots))
+
+    def _start(self, tenants: List[Tenant], callback, workers: int, slots: Optional[FairSlots] = None):
+        for tenant in tenants:
+            if not os.path.exists(tenant.watch_dir):
+                raise FileNotFoundError(f"directory doesnot exsit: {tenant.watch_dir}")
+
+        self.stopped.clear()
+        self.slots = slots
         
-        self.offline_handler = OfflineHandler(watch_dir)
-        offline_files = self.offline_handler.check_and_process_offline_files(handler)
+        if workers:
+            # this process only watches and batches; workers do the processing
+            self.job_queue = JobQueue(JOB_QUEUE_FILE)
+            self.worker_pool = WorkerPool(workers, JOB_QUEUE_FILE).start()
+            get_dispatcher()
         
-        if offline_files:
-            print(f"Processed {len(offline_files)} offline files")
+        elif LEASE_ENABLED:
+            # other nodes share the directory: claim each file before processing it
+            # (in worker mode each worker process claims for itself)
+            self.lease = LeaseManager().start()
         
+        # one observer thread serves every watch directory
         self.observer = Observer()
-        self.observer.schedule(handler, watch_dir, recursive=False)
-        self.thread = threading.Thread(target=self._run, daemon=True)
-        self.thread.start()
+        for tenant in tenants:
+            offline_handler = OfflineHandler(tenant.watch_dir, db_file=tenant.state_file)
+            handler = VideoHandler(
+                callback, batch_interval=tenant.batch_interval, state=offline_handler.state,
+                job_queue=self.job_queue, lease=self.lease, survey_file=tenant.survey_file,
+                survey_rules=tenant.survey_rules,
+                recipient=tenant.recipient, slots=slots, tenant=tenant.name
+            )
+            self.watches[tenant.name] = (offline_handler, handler)
+            
+            offline_files = offline_handler.check_and_process_offline_files(handler)
+            if offline_files:
+                print(f"Catching up on {len(offline_files)} offline files in the background")
+            
+            self.observer.schedule(handler, tenant.watch_dir, recursive=False)
+        self.observer.start()
+        
+        # periodic jobs share one scheduler: state snapshots and the daily survey reminder
+        self.state_update_job = get_scheduler().every(
+            "offline-state", STATE_UPDATE_INTERVAL, self._periodic_state_update
+        )
+        reminder = get_reminder()
+        self.reminder = reminder
+        self.webhook = start_webhook(reminder)
         
-        self.state_update_thread = threading.Thread(target=self._periodic_state_update, daemon=True)
-        self.state_update_thread.start()
+        # gauges are read when /metrics is scraped, not updated on the hot path
+        QUEUE_DEPTH.set_function(lambda: sum(h.queue_depth() for _, h in self.watches.values()))
+        PENDING_SURVEYS.set_function(lambda: len(reminder.store))
+        self.metrics_server = start_metrics_server()
+        self.control_api = start_control_api(self)
         
-        print(f"start monitoring: {watch_dir}")
+        for tenant in tenants:
+            print(f"start monitoring: {tenant.watch_dir}" + (f" ({tenant.name})" if tenant.name else ""))
 
     def _periodic_state_update(self):
-        while self.running:
-            time.sleep(60)
-            if self.offline_handler and self.running:
-                self.offline_handler.update_state()
-
-    def _run(self):
-        self.observer.start()
-        try:
-            while self.running:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            self.stop()
-        self.observer.join()
-
-    def stop(self):
-        self.running = False
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
-        if self.offline_handler:
-            self.offline_handler.update_state()
-        print("stop monitoring.")
-
-
-
-
-
-
-
-
-
-
+        for offline_handler, handler in list(self.watches.values()):
+            if self.stopped.is_set():
+                return
+            offline_handler.update_state()
+            if self.lease:
+                offline_handler.reclaim_orphans(self.lease, handler)
 
+    # ─── live inspection and control (used by the control API) ───
 
+    def status(self) -> dict:
+        """Status of all watch directories; with tenants, file names are shown as tenant/file."""
+        def named(tenant, name):
+            return f"{tenant}/{name}" if tenant else name
 
+        queued, active, failures, failed_files, catch_up = [], [], [], [], []
+        paused = False
+        for tenant, (offline_handler, handler) in sorted(self.watches.items()):
+            paused = paused or handler.paused
+            queued.extend(named(tenant, os.path.basename(p)) for p in handler.queued_files())
+            active.extend(dict(item, file=named(tenant, item["file"])) for item in handler.active_files())
+            failures.extend(dict(item, file=named(tenant, item["file"])) for item in handler.recent_failures())
+            failed_files.extend(
+                dict(row, name=named(tenant, row["name"])) for row in offline_handler.state.failed(limit=50)
+            )
+            drainer = offline_handler.drainer
+            if drainer and drainer.running:
+                catch_up.append(drainer.progress())
+        return {
+            "running": self.running,
+            "paused": paused,
+            "tenants": sorted(name for name in self.watches if name),
+            "queued": queued,
+            "active": active,
+            "recent_failures": sorted(failures, key=lambda item: item["time"], reverse=True),
+            "failed_files": failed_files,
+            "catch_up": {
+                key: sum(p[key] for p in catch_up)
+                for key in ("sessions_done", "sessions_total", "files_done", "files_total")
+            } if catch_up else None,
+            "jobs": self.job_queue.counts() if self.job_queue else None,
+            "workers": self.worker_pool.status() if self.worker_pool else None,
+            "pending_surveys": [
+                {"video_name": s.get("video_name"), "url": s.get("url"), "created_at": s.get("created_at")}
+                for s in self.reminder.get_pending_surveys()
+            ] if self.reminder else [],
+        }
 
+    def flush(self) -> int:
+        return sum(handler.flush() for _, handler in self.watches.values())
 
+    def retry_failed(self) -> list:
+        retried = []
+        for tenant, (offline_handler, handler) in sorted(self.watches.items()):
+            retried.extend(
+                f"{tenant}/{name}" if tenant else name for name in offline_handler.retry_failed(handler)
+            )
+        return retried
 
+    def pause(self):
+        if self.watches:
+            for _, handler in self.watches.values():
+                handler.pause()
+            print("Uploads paused")
 
+    def resume(self):
+        if self.watches:
+            for _, handler in self.watches.values():
+                handler.resume()
+            print("Uploads resumed")
 
+    def wait(self, timeout=None) -> bool:
+        """Block until stop() has finished; True if it has."""
+        return self.stopped.wait(timeout)
 
+    def stop(self, timeout: float = SHUTDOWN_DRAIN_TIMEOUT):
+        """
+        Shut down in order: stop taking events, drain the batch in flight
+        (at most timeout seconds), record the directory state, then stop
+        the background services. Safe to call more than once; start() may
+        be called again afterwards.
+        """
+        with self._stop_lock:
+            if self.stopped.is_set():
+                return
+            deadline = time.monotonic() + timeout
 
+            if self.observer:
+                self.observer.stop()
+            if self.state_update_job:
+                get_scheduler().cancel(self.state_update_job)
+                self.state_update_job = None
 
+            # close every handler first so no tenant starts a new batch while another drains
+            for _, handler in self.watches.values():
+                handler.close()
+            drained = all([
+                handler.drain(deadline - time.monotonic()) for _, handler in self.watches.values()
+            ])
+            for offline_handler, _ in self.watches.values():
+                offline_handler.stop(max(deadline - time.monotonic(), 0))
+            if self.worker_pool:
+                self.worker_pool.stop(max(deadline - time.monotonic(), 0))
+                self.worker_pool = None
+                self.job_queue = None
+            if self.lease:
+                self.lease.stop()
+                self.lease = None
 
+            if self.webhook:
+                self.webhook.stop()
+                self.webhook = None
+            if self.metrics_server:
+                self.metrics_server.stop()
+                self.metrics_server = None
+            if self.control_api:
+                self.control_api.stop()
+                self.control_api = None
+            if self.observer:
+                self.observer.join(max(deadline - time.monotonic(), 0))
+                self.observer = None
+            # files queued but not started are recorded as unprocessed here
+            for offline_handler, _ in self.watches.values():
+                offline_handler.update_state()
+            self.watches.clear()
 
+            # the shared services are dropped, not just stopped, so a later start() gets running ones
+            stop_reminder()
+            self.reminder = None
+            stop_scheduler(1)
+            stop_dispatcher(1)
+            stop_trace_logging()
+            self.stopped.set()
+            print("stop monitoring." if drained else "stop monitoring (in-flight batch abandoned, retried at next start).")
@@ -1,27 +1,226 @@
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
-from typing import List
+from typing import List, Optional, Tuple
 
 from .config import (
     SMTP_SERVER,
     SMTP_PORT,
     SMTP_USERNAME,
     SMTP_PASSWORD,
+    SMTP_POOL_SIZE,
+    SMTP_IDLE_TIMEOUT,
+    SMTP_TIMEOUT,
+    SMTP_STARTTLS,
     FROM_EMAIL,
     RECIPIENT_EMAIL
 )
+from .metrics import STAGE_SECONDS, FAILURES
 
-def send_notification_email(recipient_email: str, subject: str, body: str) -> None:
+# errors after which a pooled session can no longer be trusted
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, OSError)
+
+
+def _is_connection_error(exc: Exception) -> bool:
+    # 421 is the server announcing it is closing the channel
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code == 421
+    return isinstance(exc, _CONNECTION_ERRORS)
+
+
+class SMTPConnectionPool:
+    """
+    Keep authenticated SMTP sessions open between messages.
+
+    Opening a session (connect + STARTTLS + login) costs one to three seconds,
+    so idle sessions are parked here and reused. A parked session is checked
+    with NOOP before reuse, closed once it has been idle longer than
+    idle_timeout, and replaced transparently if the server dropped it.
+    """
+
+    def __init__(
+        self,
+        server: str = SMTP_SERVER,
+        port: int = SMTP_PORT,
+        username: str = SMTP_USERNAME,
+        password: str = SMTP_PASSWORD,
+        max_idle: int = SMTP_POOL_SIZE,
+        idle_timeout: float = SMTP_IDLE_TIMEOUT,
+        timeout: float = SMTP_TIMEOUT,
+        starttls: bool = SMTP_STARTTLS,
+    ):
+        """
+        Args:
+            server: SMTP host
+            port: SMTP port
+            username: login user, login is skipped when empty
+            password: login password
+            max_idle: maximum number of idle sessions kept open
+            idle_timeout: seconds an idle session may be kept before closing
+            timeout: socket timeout for each session
+            starttls: negotiate STARTTLS before login (off only for local test servers)
+        """
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.starttls = starttls
+
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Timer] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                conn.starttls()
+            if self.username and self.password:
+                conn.login(self.username, self.password)
+        except Exception:
+            self._close(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP) -> None:
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_alive(conn: smtplib.SMTP) -> bool:
+        try:
+            return conn.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def acquire(self) -> smtplib.SMTP:
+        """Return a healthy session, reusing an idle one when possible."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            if time.monotonic() - last_used > self.idle_timeout or not self._is_alive(conn):
+                self._close(conn)
+                continue
+            return conn
+        return self._connect()
+
+    def release(self, conn: smtplib.SMTP) -> None:
+        """Park a session for reuse, or close it if the pool is full."""
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((conn, time.monotonic()))
+                self._schedule_reaper()
+                return
+        self._close(conn)
+
+    def discard(self, conn: smtplib.SMTP) -> None:
+        """Close a session that failed and must not be reused."""
+        self._close(conn)
+
+    def _schedule_reaper(self) -> None:
+        # caller holds self._lock
+        if self._reaper is None:
+            self._reaper = threading.Timer(self.idle_timeout, self.close_idle)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def close_idle(self) -> None:
+        """Close sessions that have been idle longer than idle_timeout."""
+        now = time.monotonic()
+        with self._lock:
+            self._reaper = None
+            expired = [c for c, t in self._idle if now - t >= self.idle_timeout]
+            self._idle = [(c, t) for c, t in self._idle if now - t < self.idle_timeout]
+            if self._idle:
+                self._schedule_reaper()
+        for conn in expired:
+            self._close(conn)
+
+    def close_all(self) -> None:
+        """Close every idle session (used on shutdown)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+        for conn, _ in idle:
+            self._close(conn)
+
+    def send_messages(self, messages: List[MIMEText]) -> None:
+        """
+        Send several messages over one session.
+
+        If the session drops mid-way it is replaced once and the failed
+        message is retried; a second failure is raised to the caller.
+        """
+        with STAGE_SECONDS.time(stage="smtp"):
+            try:
+                self._send_messages(list(messages))
+            except Exception:
+                FAILURES.inc(stage="smtp")
+                raise
+
+    def _send_messages(self, pending: List[MIMEText]) -> None:
+        retried = False
+        while pending:
+            conn = self.acquire()
+            try:
+                while pending:
+                    msg = pending[0]
+                    conn.sendmail(msg['From'], [msg['To']], msg.as_string())
+                    pending.pop(0)
+            except Exception as e:
+                if not _is_connection_error(e):
+                    self.release(conn)
+                    raise
+                self.discard(conn)
+                if retried:
+                    raise
+                retried = True
+                continue
+            self.release(conn)
+
+
+_pool: Optional[SMTPConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """Get or create the shared SMTP connection pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPConnectionPool()
+        return _pool
+
+
+def build_message(recipient_email: str, subject: str, body: str) -> MIMEText:
     msg = MIMEText(body, _charset='utf-8')
     msg['Subject'] = subject
     msg['From'] = FROM_EMAIL
     msg['To'] = recipient_email
+    return msg
+
 
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls()
-        if SMTP_USERNAME and SMTP_PASSWORD:
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.sendmail(FROM_EMAIL, [recipient_email], msg.as_string())
+def send_notification_email(recipient_email: str, subject: str, body: str) -> None:
+    get_smtp_pool().send_messages([build_message(recipient_email, subject, body)])
+
+
+def send_notification_emails(emails: List[Tuple[str, str, str]]) -> None:
+    """Send several (recipient, subject, body) emails over one SMTP session."""
+    get_smtp_pool().send_messages([build_message(*email) for email in emails])
 
 def notify(video_name: str, page_url: str) -> None:
     subject = f"[AVAS] Video Ready: {video_name}"
@@ -33,17 +232,12 @@ def notify(video_name: str, page_url: str) -> None:
     )
     send_notification_email(RECIPIENT_EMAIL, subject, body)
 
-def notify_batch(video_names: List[str], video_urls: List[str]) -> None:
+def batch_email(video_urls: List[str]) -> Tuple[str, str]:
+    """Build the (subject, body) of a batch-complete email."""
     subject = "[AVAS] Batch Video Upload Complete"
     lines = [f"<{url}>" for url in video_urls]
     body  = (
         "The following videos have been processed and are available:\n\n"
         + "\n".join(lines)
     )
-    send_notification_email(RECIPIENT_EMAIL, subject, body)
-    print(body)
-
-
-
-
-
+    return subject, body
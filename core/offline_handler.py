@@ -1,116 +1,186 @@
 import os
 import json
-import time
 from pathlib import Path
-from typing import Dict, Set, List, Optional
-from watchdog.events import FileCreatedEvent
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from .config import PROJECT_ROOT
+from .config import STATE_DB_FILE, STATE_MAX_ATTEMPTS
+from .state_db import DirectoryStateDB, DONE
+from .backlog import BacklogDrainer
 
 
 class OfflineHandler:
-    
-    def __init__(self, watch_dir: str):
+    """
+    Track the watch directory across restarts.
+
+    Every video file has a row in the state DB (data/directory_state.db) with
+    its processing status. At startup, files that appeared while AVAS was
+    down, and files whose processing never finished or failed, are handed to
+    a BacklogDrainer that works through them in the background.
+    """
+
+    def __init__(self, watch_dir: str, db_file: Optional[Path] = None,
+                 max_attempts: int = STATE_MAX_ATTEMPTS):
+        """
+        Args:
+            watch_dir: directory being monitored
+            db_file: SQLite state file (default STATE_DB_FILE, data/directory_state.db)
+            max_attempts: processing attempts after which a file is no longer retried
+        """
         self.watch_dir = watch_dir
-        self.state_file = PROJECT_ROOT / "data" / "directory_state.json"
-        self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        
+        self.db_file = Path(db_file) if db_file else STATE_DB_FILE
+        # previous JSON state, imported once on the first start with the DB
+        self.legacy_state_file = self.db_file.with_suffix(".json")
+        self.max_attempts = max_attempts
+        self.state = DirectoryStateDB(self.db_file)
+        # last scan result, used to skip touching the DB when nothing changed
+        self._last_files: Optional[Dict[str, Tuple[int, int]]] = None
+        self.drainer: Optional[BacklogDrainer] = None
+
     def check_and_process_offline_files(self, video_handler) -> List[str]:
         print("Checking for offline files...")
-        
-        last_state = self._load_state()
+
+        first_run = not self.state.initialized
         current_files = self._scan_video_files()
-        new_files = self._find_new_files(last_state, current_files)
-        
-        if new_files:
-            print(f"Found {len(new_files)} offline files to process:")
-            for filename in new_files:
+        self._record_scan(current_files)
+
+        if first_run:
+            self._baseline(current_files)
+
+        # one indexed query: new, interrupted and failed files below max_attempts
+        pending = self.state.pending(self.max_attempts)
+
+        if pending:
+            print(f"Found {len(pending)} offline files to process:")
+            for filename in pending:
                 print(f"  - {filename}")
-            
-            self._trigger_processing(new_files, video_handler)
+
+            self._trigger_processing(pending, video_handler)
         else:
             print("No offline files found")
-        
-        self._save_state(current_files)
-        
-        return list(new_files)
-    
+
+        return pending
+
     def update_state(self) -> None:
         current_files = self._scan_video_files()
-        self._save_state(current_files)
-        print("Directory state updated")
-    
-    def _scan_video_files(self) -> Dict[str, float]:
+        if current_files == self._last_files:
+            return
+        added, removed = self._record_scan(current_files)
+        print(f"Directory state updated: {added} added, {removed} removed")
+
+    def _record_scan(self, files: Dict[str, Tuple[int, int]]) -> Tuple[int, int]:
+        try:
+            result = self.state.sync(files)
+        except Exception as e:
+            print(f"Error saving directory state: {e}")
+            return 0, 0
+        self._last_files = files
+        return result
+
+    def _baseline(self, current_files: Dict[str, Tuple[int, int]]) -> None:
+        """
+        First start with the state DB: files already known to the old JSON
+        state were handled by a previous version; without any previous state
+        existing files are treated as handled, as before.
+        """
+        legacy = self._load_legacy_state()
+        if legacy is None:
+            print("No previous state found, treating as first run")
+            handled = current_files.keys()
+        else:
+            print(f"Importing previous state from {self.legacy_state_file.name}")
+            handled = current_files.keys() & legacy.keys()
+        self.state.mark_many(handled, DONE)
+
+    def _scan_video_files(self) -> Dict[str, Tuple[int, int]]:
+        """
+        One os.scandir pass: the entry type comes from the directory listing
+        and only video files are stat'ed (at most one stat per entry).
+
+        Returns:
+            {filename: (size, mtime_ns)}
+        """
         video_files = {}
         video_extensions = ('.mov', '.avi', '.mp4')
-        
+
         try:
-            for filename in os.listdir(self.watch_dir):
-                filepath = os.path.join(self.watch_dir, filename)
-                
-                if os.path.isfile(filepath) and filename.lower().endswith(video_extensions):
-                    video_files[filename] = os.path.getmtime(filepath)
-                    
+            with os.scandir(self.watch_dir) as entries:
+                for entry in entries:
+                    if not entry.name.lower().endswith(video_extensions):
+                        continue
+                    try:
+                        if entry.is_file():
+                            st = entry.stat()
+                            video_files[entry.name] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        # removed between listing and stat
+                        continue
+
         except Exception as e:
             print(f"Error scanning directory: {e}")
-            
+
         return video_files
-    
-    def _find_new_files(self, last_state: Optional[Dict], current_files: Dict[str, float]) -> Set[str]:
-        if not last_state or 'files' not in last_state:
-            print("No previous state found, treating as first run")
-            return set()
-        
-        last_files = set(last_state['files'].keys())
-        current_filenames = set(current_files.keys())
-        
-        # Simply find files that exist now but didn't exist in last state
-        new_files = current_filenames - last_files
-        
-        return new_files
-    
-    def _trigger_processing(self, filenames: Set[str], video_handler) -> None:
+
+    def _trigger_processing(self, filenames: Iterable[str], video_handler) -> None:
+        paths = []
         for filename in filenames:
             filepath = os.path.join(self.watch_dir, filename)
-            
+
             if not os.path.exists(filepath):
                 print(f"File no longer exists: {filename}")
                 continue
-            
-            event = FileCreatedEvent(filepath)
-            
-            print(f"Processing offline file: {filename}")
-            video_handler.on_created(event)
-            
-            time.sleep(0.1)
-    
-    def _load_state(self) -> Optional[Dict]:
-        if not self.state_file.exists():
+            paths.append(filepath)
+
+        self.drainer = BacklogDrainer(video_handler, paths).start()
+
+    def retry_failed(self, video_handler) -> List[str]:
+        """Reset every failed file and hand it to a new backlog drain."""
+        names = [row["name"] for row in self.state.failed()]
+        if not names:
+            return []
+        if self.drainer and self.drainer.running:
+            print("Retry of failed files deferred: catch-up still running")
+            return []
+        self.state.reset(names)
+        print(f"Retrying {len(names)} failed files")
+        self._trigger_processing(names, video_handler)
+        return names
+
+    def reclaim_orphans(self, lease, video_handler) -> List[str]:
+        """
+        Process files whose lease expired before they were done - their node
+        died mid-way. Claiming them takes the expired lease over. Also prunes
+        the .done markers of files that are gone (LeaseManager.prune_done).
+        """
+        pruned = lease.prune_done(self.watch_dir)
+        if pruned:
+            print(f"Removed {pruned} lease markers of finished files")
+        if self.drainer and self.drainer.running:
+            return []
+        names = sorted(self._last_files or {})
+        paths = lease.orphaned(os.path.join(self.watch_dir, name) for name in names)
+        if paths:
+            print(f"Taking over {len(paths)} files from a node that stopped")
+            self._trigger_processing([os.path.basename(p) for p in paths], video_handler)
+        return paths
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the backlog drainer after its current session."""
+        if self.drainer:
+            self.drainer.stop(timeout)
+
+    def _load_legacy_state(self) -> Optional[Dict]:
+        if not self.legacy_state_file.exists():
             return None
-        
+
         try:
-            with open(self.state_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self.legacy_state_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
         except Exception as e:
             print(f"Error loading state file: {e}")
             return None
-    
-    def _save_state(self, files: Dict[str, float]) -> None:
-        state = {
-            'files': files,
-            'last_update': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-        }
-        
-        try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(state, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving state file: {e}")
-    
-    def get_state_info(self) -> Optional[Dict]:
-        state = self._load_state()
-        if state:
-            file_count = len(state.get('files', {}))
-            last_update = state.get('last_update', 'Unknown')
-            print(f"State info: {file_count} files tracked, last update: {last_update}")
-        return state
\ No newline at end of file
+
+    def get_state_info(self) -> Dict[str, int]:
+        counts = self.state.counts()
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+        print(f"State info: {sum(counts.values())} files tracked ({summary or 'none'})")
+        return counts
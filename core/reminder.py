@@ -1,73 +1,195 @@
-import json
-import os
+import codecs
 import threading
-import time
 import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional
+from urllib.parse import urlsplit
 
 from .notifier import send_notification_email
-from .config import PROJECT_ROOT, RECIPIENT_EMAIL, REMINDER_CHECK_HOUR, REMINDER_CHECK_MINUTE
+from .appscript_client import get_survey_statuses, page_id_from_url
+from .survey_store import PendingSurveyStore
+from .scheduler import Scheduler, get_scheduler
+from .config import (
+    APPSCRIPT_STATUS_ENABLED,
+    PENDING_SURVEYS_FILE,
+    RECIPIENT_EMAIL,
+    REMINDER_CHECK_HOUR,
+    REMINDER_CHECK_MINUTE,
+    REMINDER_BACKOFF_DAYS,
+    REMINDER_CHECK_WORKERS,
+    REMINDER_PER_HOST_LIMIT,
+    REMINDER_RECONCILE_DAYS,
+    WEBHOOK_PORT
+)
+
+
+# keywords that should appear somewhere in a live survey page
+_SURVEY_INDICATORS = ('video', 'survey', 'question', 'submit', 'form')
+# stop reading a survey page after this many bytes
+_MAX_PROBE_BYTES = 256 * 1024
+
+
+def _page_looks_completed(response) -> bool:
+    """
+    Decide from a streamed 200 response whether the survey page is blank/destroyed.
+    
+    A page is completed if it is very short, has none of the survey keywords,
+    or has an empty <body>. Reading stops as soon as the page is long enough,
+    has a keyword and a non-empty body, so live pages cost only the first chunks.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    content = ''
+    received = 0
+    for chunk in response.iter_content(chunk_size=8192):
+        received += len(chunk)
+        content += decoder.decode(chunk).lower()
+        if _is_live_survey(content) or received >= _MAX_PROBE_BYTES:
+            break
+    content = (content + decoder.decode(b'', final=True)).strip()
+    
+    # Check various indicators of blank/destroyed page
+    # 1. Very short content
+    if len(content) < 200:
+        return True
+    
+    # 2. If none of the survey keywords exist, likely destroyed
+    if not any(indicator in content for indicator in _SURVEY_INDICATORS):
+        return True
+    
+    # 3. Check for specific empty page patterns
+    if '<body></body>' in content or '<body>\n</body>' in content:
+        return True
+    
+    return False
+
+
+def _is_live_survey(content: str) -> bool:
+    """True once the (lowercased) page prefix proves it is a live survey."""
+    if len(content.strip()) < 200:
+        return False
+    if not any(indicator in content for indicator in _SURVEY_INDICATORS):
+        return False
+    body = content.find('<body')
+    if body < 0:
+        return False
+    tag_end = content.find('>', body)
+    if tag_end < 0:
+        return False
+    rest = content[tag_end + 1:].lstrip()
+    return bool(rest) and not rest.startswith('</body')
 
 
 class SurveyReminder:
     """Handle survey completion checking and reminder notifications."""
     
-    def __init__(self, check_hour: int, check_minute: int):
+    def __init__(
+        self,
+        check_hour: int,
+        check_minute: int,
+        data_file: Optional[Path] = None,
+        max_workers: int = REMINDER_CHECK_WORKERS,
+        per_host_limit: int = REMINDER_PER_HOST_LIMIT,
+        start_scheduler: bool = True,
+        scheduler: Optional[Scheduler] = None,
+        backoff_days: Optional[List[int]] = None,
+        reconcile_days: float = 0,
+        bulk_status: bool = APPSCRIPT_STATUS_ENABLED
+    ):
         """
         Initialize the survey reminder.
         
         Args:
             check_hour: Hour to check surveys (0-23)
             check_minute: Minute to check surveys (0-59)
+            data_file: Where pending surveys are stored (default PENDING_SURVEYS_FILE)
+            max_workers: Survey pages checked concurrently
+            per_host_limit: Concurrent requests allowed against one host
+            start_scheduler: Register the daily check with the scheduler
+            scheduler: Scheduler to run the daily check on (default: the shared one)
+            backoff_days: Days after creation on which a survey is reminded (default REMINDER_BACKOFF_DAYS)
+            reconcile_days: Probe survey pages only every this many days (0 = on every check),
+                            for when completions are pushed through the webhook
+            bulk_status: Ask the Apps Script for all completion states in one call before
+                         downloading pages (needs a deployment with the status action)
         """
         self.check_hour = check_hour
         self.check_minute = check_minute
-        self.data_file = PROJECT_ROOT / "data" / "pending_surveys.json"
-        self.data_file.parent.mkdir(parents=True, exist_ok=True)
+        self.data_file = Path(data_file) if data_file else PENDING_SURVEYS_FILE
+        self.store = PendingSurveyStore(self.data_file)
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
         
-        # Initialize data file if not exists
-        if not self.data_file.exists():
-            self._save_data([])
+        # Shared HTTP session so concurrent checks reuse pooled connections
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_slots_lock = threading.Lock()
         
         # Start the scheduler
-        self._start_scheduler()
+        self.backoff_days = list(REMINDER_BACKOFF_DAYS if backoff_days is None else backoff_days)
+        self.reconcile_days = reconcile_days
+        self.bulk_status = bulk_status
+        self.last_probe: Optional[datetime.datetime] = None
+        self.job = None
+        self.scheduler = scheduler
+        if start_scheduler:
+            self.scheduler = scheduler or get_scheduler()
+            self._start_scheduler()
     
     def _start_scheduler(self):
-        """Start the daily check scheduler."""
-        scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
-        scheduler_thread.start()
+        """Register the daily check with the shared scheduler."""
+        self.job = self.scheduler.daily(
+            "survey-reminder", self.check_hour, self.check_minute, self.check_and_remind
+        )
         print(f"Survey reminder scheduler started for {self.check_hour:02d}:{self.check_minute:02d} daily")
     
-    def _scheduler_loop(self):
-        """Check every minute if it's time to send reminders."""
-        while True:
-            now = datetime.datetime.now()
-            
-            # Check if it's the scheduled time
-            if now.hour == self.check_hour and now.minute == self.check_minute:
-                self.check_and_remind()
-                # Sleep for 60 seconds to avoid multiple triggers
-                time.sleep(60)
-            else:
-                # Check every 30 seconds
-                time.sleep(30)
+    def _reminder_day(self, step: int) -> int:
+        """Day after creation of reminder number step (0-based) on the backoff schedule."""
+        days = self.backoff_days
+        if step < len(days):
+            return days[step]
+        gap = days[-1] - days[-2] if len(days) > 1 else days[-1]
+        return days[-1] + max(gap, 1) * (step - len(days) + 1)
+    
+    def _reminder_due(self, survey: Dict, today: datetime.date) -> bool:
+        """
+        Whether a pending survey should be in today's reminder.
+        
+        Reminders follow backoff_days, e.g. 1,3,7; after the last entry they
+        repeat with the last gap. The next reminder is due one schedule gap
+        after the last one sent, so a survey that fell behind (missed checks,
+        carried over from an older store) is not reminded on consecutive days
+        to catch up. Never-reminded surveys count from their creation day.
+        """
+        if not self.backoff_days:
+            return True
+        count = survey.get('reminded_count', 0)
+        last_reminded = survey.get('last_reminded')
+        if count and last_reminded:
+            since = datetime.datetime.fromisoformat(last_reminded).date()
+            wait = self._reminder_day(count) - self._reminder_day(count - 1)
+        else:
+            since = datetime.datetime.fromisoformat(survey['created_at']).date()
+            wait = self._reminder_day(count)
+        return (today - since).days >= wait
     
-    def add_survey(self, video_name: str, url: str):
+    def add_survey(self, video_name: str, url: str, recipient: Optional[str] = None):
         """
         Add a new survey to track.
         
         Args:
             video_name: Name of the video file
             url: URL of the survey page
+            recipient: Who is reminded about it (default RECIPIENT_EMAIL)
         """
-        surveys = self._load_data()
-        
         # Check if already exists
-        for survey in surveys:
-            if survey['url'] == url:
-                return
+        if url in self.store:
+            return
         
         # Add new survey
         survey_data = {
@@ -77,86 +199,145 @@ class SurveyReminder:
             'reminded_count': 0,
             'last_reminded': None
         }
+        if recipient and recipient != RECIPIENT_EMAIL:
+            survey_data['recipient'] = recipient
         
-        surveys.append(survey_data)
-        self._save_data(surveys)
-        print(f"Added survey to track: {video_name}")
+        if self.store.add(survey_data):
+            print(f"Added survey to track: {video_name}")
     
     def check_and_remind(self):
         """Check all pending surveys and send reminder if needed."""
         print(f"\n=== Checking surveys at {datetime.datetime.now()} ===")
         
-        surveys = self._load_data()
+        surveys = self.store.all()
         if not surveys:
             print("No pending surveys to check")
             return
         
         pending_surveys = []
         completed_surveys = []
+        known_validators = {s['url']: dict(s.get('page_validators') or {}) for s in surveys}
         
-        # Check each survey
-        for survey in surveys:
-            if self._is_survey_completed(survey['url']):
+        # Check all surveys concurrently, results keep the input order.
+        # With pushed completions the store is trusted between reconciliation passes.
+        now = datetime.datetime.now()
+        if self.last_probe is None or now - self.last_probe >= datetime.timedelta(days=self.reconcile_days):
+            results = self._check_surveys(surveys)
+            self.last_probe = now
+        else:
+            results = [False] * len(surveys)
+        for survey, completed in zip(surveys, results):
+            if completed:
                 completed_surveys.append(survey)
                 print(f"✓ Survey completed: {survey['video_name']}")
             else:
                 pending_surveys.append(survey)
                 print(f"✗ Survey pending: {survey['video_name']}")
         
-        # Remove completed surveys
-        remaining_surveys = [s for s in surveys if s not in completed_surveys]
-        self._save_data(remaining_surveys)
+        # Remove completed surveys, remember page validators of the pending ones
+        self.store.remove_many(s['url'] for s in completed_surveys)
+        self.store.update_many({
+            s['url']: {'page_validators': s['page_validators']}
+            for s in pending_surveys
+            if s.get('page_validators') and s['page_validators'] != known_validators[s['url']]
+        })
         
-        # Send reminder if there are pending surveys
-        if pending_surveys:
-            self._send_reminder_email(pending_surveys)
+        # Send one reminder per recipient for the pending surveys whose backoff is due
+        today = datetime.date.today()
+        due_by_recipient: Dict[str, List[Dict]] = {}
+        for survey in pending_surveys:
+            if self._reminder_due(survey, today):
+                due_by_recipient.setdefault(survey.get('recipient') or RECIPIENT_EMAIL, []).append(survey)
+        for recipient, due_surveys in due_by_recipient.items():
+            if not self._send_reminder_email(due_surveys, recipient):
+                continue
+            reminded_at = datetime.datetime.now().isoformat()
+            self.store.update_many({
+                s['url']: {'reminded_count': s.get('reminded_count', 0) + 1, 'last_reminded': reminded_at}
+                for s in due_surveys
+            })
         
         print(f"=== Check complete: {len(completed_surveys)} completed, {len(pending_surveys)} pending ===\n")
     
-    def _is_survey_completed(self, url: str) -> bool:
+    def _check_surveys(self, surveys: List[Dict]) -> List[bool]:
+        """
+        Check the completion of all surveys.
+        
+        With bulk_status, one status call to the Apps Script answers for every
+        known page; surveys it cannot answer for (and all of them without
+        bulk_status) fall back to checking the page itself, in a bounded
+        thread pool.
+        """
+        page_ids = [page_id_from_url(survey['url']) for survey in surveys]
+        statuses = (get_survey_statuses([pid for pid in page_ids if pid]) if self.bulk_status else None) or {}
+        
+        results: List[Optional[bool]] = [statuses.get(pid) if pid else None for pid in page_ids]
+        fallback = [i for i, result in enumerate(results) if result is None]
+        if fallback:
+            workers = max(1, min(self.max_workers, len(fallback)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="survey-check") as pool:
+                checks = pool.map(
+                    lambda i: self._is_survey_completed(
+                        surveys[i]['url'], surveys[i].setdefault('page_validators', {})
+                    ),
+                    fallback
+                )
+                for i, completed in zip(fallback, checks):
+                    results[i] = completed
+        return results
+    
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        """Semaphore limiting concurrent requests to the host of url."""
+        host = urlsplit(url).netloc
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+    
+    def _is_survey_completed(self, url: str, validators: Optional[Dict] = None) -> bool:
         """
         Check if a survey has been completed by visiting the URL.
+        Only used for surveys the bulk status call could not answer.
+        
+        The body is streamed and reading stops as soon as the page is clearly
+        a live survey. If validators (ETag / Last-Modified of the last visit)
+        are given the request is conditional, and they are updated in place.
         
         Args:
             url: The survey page URL
+            validators: Cache validators remembered for this page, or None
             
         Returns:
             True if survey is completed (page is blank), False otherwise
         """
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
         try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                content = response.text.strip()
-                
-                # Check various indicators of blank/destroyed page
-                # 1. Very short content
-                if len(content) < 200:
-                    return True
-                
-                # 2. Missing key elements that should be in a survey page
-                content_lower = content.lower()
-                survey_indicators = ['video', 'survey', 'question', 'submit', 'form']
-                
-                # If none of these keywords exist, likely destroyed
-                if not any(indicator in content_lower for indicator in survey_indicators):
-                    return True
-                
-                # 3. Check for specific empty page patterns
-                if '<body></body>' in content or '<body>\n</body>' in content:
-                    return True
-                
-                return False
-            else:
-                # Non-200 status might mean completed
-                return response.status_code == 404
+            with self._host_slot(url):
+                with self._session.get(url, timeout=10, stream=True, headers=headers) as response:
+                    if response.status_code == 304:
+                        # unchanged since the last visit, which found it pending
+                        return False
+                    if response.status_code != 200:
+                        # Non-200 status might mean completed
+                        return response.status_code == 404
+                    if validators is not None:
+                        validators['etag'] = response.headers.get('ETag')
+                        validators['last_modified'] = response.headers.get('Last-Modified')
+                    return _page_looks_completed(response)
                 
         except Exception as e:
             print(f"Error checking survey {url}: {e}")
             # On error, assume not completed to avoid false positives
             return False
     
-    def _send_reminder_email(self, pending_surveys: List[Dict]):
-        """Send reminder email for pending surveys."""
+    def _send_reminder_email(self, pending_surveys: List[Dict], recipient: str = RECIPIENT_EMAIL) -> bool:
+        """Send reminder email for pending surveys; returns True if it was sent."""
         # Sort by creation time (oldest first)
         pending_surveys.sort(key=lambda x: x['created_at'])
         
@@ -184,27 +365,33 @@ class SurveyReminder:
         
         # Send email
         try:
-            send_notification_email(RECIPIENT_EMAIL, subject, body)
+            send_notification_email(recipient, subject, body)
             print(f"Reminder email sent for {len(pending_surveys)} pending surveys")
+            return True
         except Exception as e:
             print(f"Failed to send reminder email: {e}")
+            return False
     
-    def _load_data(self) -> List[Dict]:
-        """Load survey data from file."""
-        try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading survey data: {e}")
-            return []
-    
-    def _save_data(self, data: List[Dict]):
-        """Save survey data to file."""
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving survey data: {e}")
+    def mark_completed(self, urls: Optional[List[str]] = None, page_ids: Optional[List[str]] = None) -> List[str]:
+        """
+        Stop tracking surveys reported as submitted (e.g. by the webhook).
+        Idempotent: unknown or already removed surveys are ignored.
+        
+        Args:
+            urls: Survey page URLs
+            page_ids: Page ids (the ?id= of the page URL)
+            
+        Returns:
+            URLs that were pending and are now removed
+        """
+        targets = set(urls or [])
+        if page_ids:
+            wanted = set(page_ids)
+            targets.update(url for url in self.store.urls() if page_id_from_url(url) in wanted)
+        removed = self.store.remove_many(targets)
+        for url in removed:
+            print(f"✓ Survey completed (pushed): {url}")
+        return removed
     
     def force_check(self):
         """Manually trigger a check (for testing)."""
@@ -212,22 +399,42 @@ class SurveyReminder:
     
     def get_pending_surveys(self) -> List[Dict]:
         """Get list of all pending surveys."""
-        return self._load_data()
+        return self.store.all()
 
 
 # Global instance
 _reminder_instance: Optional[SurveyReminder] = None
 
 
-def get_reminder() -> SurveyReminder:
-    """Get or create the global reminder instance."""
+def get_reminder(start_scheduler: bool = True) -> SurveyReminder:
+    """
+    Get or create the global reminder instance.
+
+    Worker processes create it with start_scheduler=False: they only add
+    surveys to the shared store, the daily check runs in the watcher.
+    """
     global _reminder_instance
     if _reminder_instance is None:
-        _reminder_instance = SurveyReminder(check_hour=REMINDER_CHECK_HOUR, check_minute=REMINDER_CHECK_MINUTE)
+        _reminder_instance = SurveyReminder(
+            check_hour=REMINDER_CHECK_HOUR,
+            check_minute=REMINDER_CHECK_MINUTE,
+            start_scheduler=start_scheduler,
+            reconcile_days=REMINDER_RECONCILE_DAYS if WEBHOOK_PORT else 0
+        )
     return _reminder_instance
 
 
-def add_survey_to_track(video_name: str, url: str):
+def stop_reminder():
+    """Drop the global reminder and its daily job; the next get_reminder() registers with the current scheduler."""
+    global _reminder_instance
+    reminder, _reminder_instance = _reminder_instance, None
+    if reminder is not None:
+        if reminder.job is not None:
+            reminder.scheduler.cancel(reminder.job)
+        reminder._session.close()
+
+
+def add_survey_to_track(video_name: str, url: str, recipient: Optional[str] = None):
     """Convenience function to add a survey to track."""
     reminder = get_reminder()
-    reminder.add_survey(video_name, url)
\ No newline at end of file
+    reminder.add_survey(video_name, url, recipient)
\ No newline at end of file
@@ -0,0 +1,178 @@
+import time
+import heapq
+import datetime
+import itertools
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from .config import SCHEDULER_MAX_SLEEP
+
+
+class Job:
+    """A scheduled callable; next_run(after) returns its next due time (epoch seconds)."""
+
+    def __init__(self, name: str, func: Callable[[], None], next_run: Callable[[float], float]):
+        self.name = name
+        self.func = func
+        self.next_run = next_run
+        self.due: float = 0.0
+        self.last_run: Optional[float] = None
+        self.cancelled = False
+        self.running = False
+
+
+class Scheduler:
+    """
+    Run many periodic jobs from one thread kept in a heap by due time.
+
+    The thread sleeps until the earliest job is due instead of polling. Due
+    times are wall-clock, and a sleep never lasts longer than max_sleep, so
+    after a suspend/resume a missed run is noticed within max_sleep and run
+    once (missed occurrences are not replayed one by one).
+
+    Each run happens on its own thread, so a slow job does not delay the
+    others; if a job is still running when it is due again that occurrence
+    is skipped.
+    """
+
+    def __init__(self, max_sleep: float = SCHEDULER_MAX_SLEEP, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            max_sleep: longest single sleep in seconds, bounds catch-up after suspend
+            clock: wall-clock source (seconds since the epoch)
+        """
+        self.max_sleep = max_sleep
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def add_job(self, name: str, func: Callable[[], None], next_run: Callable[[float], float],
+                first_due: Optional[float] = None) -> Job:
+        """
+        Schedule func; next_run(after) gives the next due time after a given time.
+        first_due overrides the first due time (e.g. to run immediately).
+        """
+        job = Job(name, func, next_run)
+        self._push(job, first_due if first_due is not None else next_run(self.clock()))
+        return job
+
+    def every(self, name: str, interval: float, func: Callable[[], None],
+              first_delay: Optional[float] = None) -> Job:
+        """Run func every interval seconds."""
+        delay = interval if first_delay is None else first_delay
+        return self.add_job(name, func, lambda after: after + interval, self.clock() + delay)
+
+    def daily(self, name: str, hour: int, minute: int, func: Callable[[], None]) -> Job:
+        """Run func once a day at hour:minute local time."""
+        return self.add_job(name, func, lambda after: next_daily(after, hour, minute))
+
+    def cancel(self, job: Job):
+        with self._cond:
+            job.cancelled = True
+            self._heap = [entry for entry in self._heap if entry[2] is not job]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def jobs(self) -> List[Job]:
+        with self._cond:
+            return [job for _, _, job in sorted(self._heap)]
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop dispatching; job runs already in progress are not interrupted."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _push(self, job: Job, due: float):
+        with self._cond:
+            if job.cancelled:
+                return
+            job.due = due
+            heapq.heappush(self._heap, (due, next(self._seq), job))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopped:
+                    if not self._heap:
+                        self._cond.wait(self.max_sleep)
+                        continue
+                    now = self.clock()
+                    due = self._heap[0][0]
+                    if due > now:
+                        self._cond.wait(min(due - now, self.max_sleep))
+                        continue
+                    _, _, job = heapq.heappop(self._heap)
+                    break
+                if self._stopped:
+                    return
+
+            # the next occurrence counts from the due time, so cadence does not drift,
+            # but never lies in the past (a missed run is executed once, not replayed)
+            now = self.clock()
+            next_due = job.next_run(job.due)
+            while next_due <= now:
+                next_due = job.next_run(next_due)
+            if job.running:
+                print(f"Scheduler: {job.name} still running, skipping this run")
+            else:
+                job.running = True
+                threading.Thread(target=self._execute, args=(job,), name=f"job-{job.name}", daemon=True).start()
+            self._push(job, next_due)
+
+    def _execute(self, job: Job):
+        job.last_run = self.clock()
+        try:
+            job.func()
+        except Exception as e:
+            print(f"Scheduled job {job.name} failed: {e}")
+        finally:
+            job.running = False
+
+
+def next_daily(after: float, hour: int, minute: int) -> float:
+    """Epoch time of the first hour:minute (local time) strictly after `after`."""
+    base = datetime.datetime.fromtimestamp(after)
+    candidate = base.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate.timestamp() <= after:
+        candidate += datetime.timedelta(days=1)
+    return candidate.timestamp()
+
+
+# Global instance
+_scheduler_instance: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Get or create the global scheduler, starting its thread on first use."""
+    global _scheduler_instance
+    with _scheduler_lock:
+        if _scheduler_instance is None:
+            _scheduler_instance = Scheduler()
+            _scheduler_instance.start()
+        return _scheduler_instance
+
+
+def stop_scheduler(timeout: Optional[float] = None):
+    """Stop the global scheduler if it was started; the next get_scheduler() starts a new one."""
+    global _scheduler_instance
+    with _scheduler_lock:
+        scheduler, _scheduler_instance = _scheduler_instance, None
+    if scheduler is not None:
+        scheduler.stop(timeout)
@@ -0,0 +1,191 @@
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# file status values
+SEEN = "seen"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+# an .mp4 written by a conversion, recorded before ffmpeg creates it; never processed itself
+OUTPUT = "output"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name       TEXT PRIMARY KEY,
+    size       INTEGER,
+    mtime_ns   INTEGER,
+    status     TEXT    NOT NULL DEFAULT 'seen',
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    first_seen REAL,
+    updated_at REAL,
+    scan_id    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS files_status ON files (status, attempts);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class DirectoryStateDB:
+    """
+    Per-file state of the watch directory in SQLite.
+
+    One row per video file name with its size, mtime_ns, processing status
+    (seen / processing / done / failed, or output for conversion results) and attempt count. Files that were
+    seen but never finished - because AVAS was down, crashed mid-batch or the
+    upload failed - are found again with one indexed query.
+    """
+
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_file), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ─── directory scans ───
+
+    @property
+    def initialized(self) -> bool:
+        """False until the first scan has been recorded."""
+        return self._get_meta("initialized") == "1"
+
+    def sync(self, files: Dict[str, Tuple[int, int]], new_status: str = SEEN) -> Tuple[int, int]:
+        """
+        Record a full directory scan {name: (size, mtime_ns)} in one transaction.
+
+        New names are inserted with new_status, known ones keep their status
+        and get size/mtime refreshed, rows for vanished files are deleted.
+
+        Returns:
+            (number of new files, number of vanished files)
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            scan_id = int(self._get_meta("scan_id", locked=True) or 0) + 1
+            before = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO files (name, size, mtime_ns, status, first_seen, updated_at, scan_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "scan_id = excluded.scan_id",
+                ((name, size, mtime_ns, new_status, now, now, scan_id) for name, (size, mtime_ns) in files.items())
+            )
+            vanished = self._conn.execute("DELETE FROM files WHERE scan_id != ?", (scan_id,)).rowcount
+            added = len(files) - (before - vanished)
+            self._set_meta("scan_id", str(scan_id))
+            self._set_meta("initialized", "1")
+        return added, vanished
+
+    def pending(self, max_attempts: int) -> List[str]:
+        """Files not processed successfully yet and below max_attempts, by name."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM files WHERE status IN (?, ?, ?) AND attempts < ? ORDER BY name",
+                (SEEN, PROCESSING, FAILED, max_attempts)
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def failed(self, limit: Optional[int] = None) -> List[Dict]:
+        """Failed files, most recent first."""
+        query = "SELECT name, attempts, last_error, updated_at FROM files WHERE status = ? ORDER BY updated_at DESC"
+        params: tuple = (FAILED,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(("name", "attempts", "last_error", "updated_at"), row)) for row in rows]
+
+    # ─── processing status ───
+
+    def mark(self, name: str, status: str, error: Optional[str] = None):
+        """Set a file's status; PROCESSING counts as an attempt. Unknown names are added."""
+        self.mark_many([name], status, error)
+
+    def mark_many(self, names: Iterable[str], status: str, error: Optional[str] = None):
+        now = time.time()
+        increment = 1 if status == PROCESSING else 0
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT INTO files (name, status, attempts, last_error, first_seen, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET status = excluded.status, "
+                "attempts = attempts + ?, last_error = excluded.last_error, updated_at = excluded.updated_at",
+                ((name, status, increment, error, now, now, increment) for name in names)
+            )
+
+    def interrupt(self, names: Iterable[str]):
+        """Set files left by a shutdown back to SEEN, taking back the attempt PROCESSING counted."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "UPDATE files SET status = ?, attempts = MAX(attempts - 1, 0), updated_at = ? "
+                "WHERE name = ? AND status = ?",
+                ((SEEN, now, name, PROCESSING) for name in names)
+            )
+
+    def reset(self, names: Iterable[str]):
+        """Make files pending again with a fresh attempt count."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "UPDATE files SET status = ?, attempts = 0, last_error = NULL, updated_at = ? WHERE name = ?",
+                ((SEEN, now, name) for name in names)
+            )
+
+    def forget_output(self, name: str):
+        """Drop an OUTPUT row whose conversion did not happen; other statuses are kept."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE name = ? AND status = ?", (name, OUTPUT))
+
+    def get(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM files WHERE name = ?", (name,))
+            row = cur.fetchone()
+            columns = [c[0] for c in cur.description]
+        return dict(zip(columns, row)) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of files per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall()
+        return dict(rows)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return [name for (name,) in self._conn.execute("SELECT name FROM files ORDER BY name")]
+
+    # ─── meta ───
+
+    def _get_meta(self, key: str, locked: bool = False) -> Optional[str]:
+        if locked:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        else:
+            with self._lock:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        # caller holds the lock
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
@@ -1,17 +1,70 @@
 import os
 import json
+import threading
 from pathlib import Path
-from typing import Dict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Tuple
 from .config import SURVEY_JSON_PATH
 
-def load_survey_data() -> Dict:
-    """Load default survey data."""
-    video_survey_data = {}
-    if os.path.exists(SURVEY_JSON_PATH):
-        try:
-            with open(SURVEY_JSON_PATH, "r", encoding="utf-8") as f:
-                video_survey_data = json.load(f)
-            video_survey_data["_survey_file"] = "questions.json"
-        except:
-            pass
-    return video_survey_data
\ No newline at end of file
+_EMPTY: Mapping = MappingProxyType({})
+
+# path -> ((mtime_ns, size), parsed survey)
+_cache: Dict[str, Tuple[Tuple[int, int], Mapping]] = {}
+_cache_lock = threading.Lock()
+
+
+def freeze(value: Any) -> Any:
+    """Read-only copy of parsed JSON: dicts become mappingproxies, lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Plain dicts and lists again, e.g. for json.dumps."""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def load_survey_data(path: Path = SURVEY_JSON_PATH) -> Mapping:
+    """
+    Load survey data (default: the questions.json survey).
+
+    The parsed survey is cached and shared by every caller as a read-only
+    mapping; the file is parsed again only when its mtime or size changes,
+    so edits apply to the next video without a restart. If an edited file
+    does not parse, the last good version is kept.
+    """
+    key = str(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return _EMPTY
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+    except (OSError, ValueError) as e:
+        print(f"Error loading survey {os.path.basename(path)}: {e}")
+        return cached[1] if cached is not None else _EMPTY
+
+    data["_survey_file"] = os.path.basename(path)
+    survey = freeze(data)
+    with _cache_lock:
+        _cache[key] = (stamp, survey)
+    if cached is not None:
+        print(f"Reloaded survey {os.path.basename(path)}")
+    return survey
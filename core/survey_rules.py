@@ -0,0 +1,214 @@
+import os
+import json
+import bisect
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import SURVEY_RULES_FILE
+from .survey_loader import load_survey_data
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _parse_minute(value: str) -> int:
+    hours, minutes = value.strip().split(":")
+    minute = int(hours) * 60 + int(minutes)
+    if not 0 <= minute <= MINUTES_PER_DAY:
+        raise ValueError(f"invalid time {value!r}")
+    return minute
+
+
+def _parse_interval(value: str) -> Tuple[int, int]:
+    """"HH:MM-HH:MM" -> (start, end) minutes; end before start wraps past midnight."""
+    start, _, end = value.partition("-")
+    if not end:
+        raise ValueError(f"invalid time range {value!r}, expected HH:MM-HH:MM")
+    return _parse_minute(start), _parse_minute(end)
+
+
+class _TrieNode:
+    __slots__ = ("children", "mask")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # rules whose prefix ends at this node
+        self.mask = 0
+
+
+class SurveyMatcher:
+    """
+    Pick a survey template per video from an ordered list of rules.
+
+    A rule may constrain the filename prefix, the time of day (from the
+    filename timestamp) and the video duration; the first rule whose
+    constraints all hold wins, otherwise the default. The rules are compiled
+    into one bitmask per criterion - a prefix trie, a per-minute table and
+    sorted duration bounds - so a lookup is a trie walk over the filename,
+    one table index and one bisect, ANDed together, whatever the number of
+    rules.
+    """
+
+    def __init__(self, rules: List[Dict], templates_dir: Path, default: Optional[str] = None):
+        """
+        Args:
+            rules: dicts with "survey" and optionally "prefix", "time" ("HH:MM-HH:MM" or
+                   a list of them), "min_duration" and "max_duration" (seconds, the
+                   video must be at least min_duration and shorter than max_duration)
+            templates_dir: directory the survey file names are relative to
+            default: survey for videos no rule matches (None = the caller's default)
+
+        Raises:
+            ValueError: on malformed rules
+        """
+        self.templates_dir = Path(templates_dir)
+        self.surveys: List[Path] = []
+        self.default = self.templates_dir / default if default else None
+        self._trie = _TrieNode()
+        self._minutes = [0] * MINUTES_PER_DAY
+        # duration segments: _bounds[i-1] <= duration < _bounds[i] selects _segments[i]
+        self._bounds: List[float] = []
+        self._segments: List[int] = []
+        # rules without a time / duration constraint
+        self._any_time = 0
+        self._any_duration = 0
+
+        durations = []
+        for index, rule in enumerate(rules):
+            if not isinstance(rule, dict) or not rule.get("survey"):
+                raise ValueError(f"rule {index} needs a survey")
+            bit = 1 << index
+            self.surveys.append(self.templates_dir / rule["survey"])
+            self._add_prefix(str(rule.get("prefix", "")), bit)
+            self._add_times(rule.get("time"), bit)
+            low, high = rule.get("min_duration"), rule.get("max_duration")
+            if low is None and high is None:
+                self._any_duration |= bit
+            durations.append((
+                float(low) if low is not None else float("-inf"),
+                float(high) if high is not None else float("inf"),
+                bit
+            ))
+        self._compile_durations(durations)
+
+    def _add_prefix(self, prefix: str, bit: int):
+        node = self._trie
+        for char in prefix:
+            node = node.children.setdefault(char, _TrieNode())
+        node.mask |= bit
+
+    def _add_times(self, times, bit: int):
+        if not times:
+            self._any_time |= bit
+            for minute in range(MINUTES_PER_DAY):
+                self._minutes[minute] |= bit
+            return
+        for value in [times] if isinstance(times, str) else times:
+            start, end = _parse_interval(value)
+            minutes = range(start, end) if start < end else list(range(start, MINUTES_PER_DAY)) + list(range(end))
+            for minute in minutes:
+                self._minutes[minute] |= bit
+
+    def _compile_durations(self, durations: List[Tuple[float, float, int]]):
+        self._bounds = sorted({b for low, high, _ in durations for b in (low, high) if abs(b) != float("inf")})
+        # representative value per segment: below the first bound, each bound, ...
+        points = [float("-inf")] + self._bounds
+        self._segments = [
+            sum(bit for low, high, bit in durations if low <= point < high)
+            for point in points
+        ]
+
+    def match(self, filename: str = "", video_time: Optional[str] = None,
+              duration: Optional[float] = None, use_default: bool = True) -> Optional[Path]:
+        """
+        Survey template for a video, or the default (None without one).
+
+        Args:
+            filename: video file name, for prefix rules
+            video_time: "HH:MM" from the filename, for time rules (None matches no time rule)
+            duration: seconds, for duration rules (None matches no duration rule)
+            use_default: False to get None instead of the default when no rule matches
+        """
+        default = self.default if use_default else None
+        candidates = self._trie.mask
+        node = self._trie
+        for char in filename:
+            node = node.children.get(char)
+            if node is None:
+                break
+            candidates |= node.mask
+        if not candidates:
+            return default
+
+        try:
+            candidates &= self._minutes[_parse_minute(video_time) % MINUTES_PER_DAY] if video_time else self._any_time
+        except ValueError:
+            candidates &= self._any_time
+
+        if duration is None:
+            candidates &= self._any_duration
+        else:
+            candidates &= self._segments[bisect.bisect_right(self._bounds, duration)]
+
+        if not candidates:
+            return default
+        first = (candidates & -candidates).bit_length() - 1
+        return self.surveys[first]
+
+    def templates(self) -> List[Path]:
+        return list(dict.fromkeys(self.surveys + ([self.default] if self.default else [])))
+
+
+_EMPTY = SurveyMatcher([], Path("."))
+
+# rules file -> ((mtime_ns, size), matcher)
+_matchers: Dict[str, Tuple[Tuple[int, int], SurveyMatcher]] = {}
+_matchers_lock = threading.Lock()
+
+
+def load_survey_mapping(rules_file: Path = SURVEY_RULES_FILE) -> SurveyMatcher:
+    """
+    The compiled matcher for a rules file, cached until the file changes.
+
+    The rules file is JSON: {"default": "questions.json", "rules": [...]}
+    with survey file names relative to its directory (see SurveyMatcher).
+    All templates are loaded into the survey cache when the rules are
+    compiled. Without a rules file nothing matches; if an edited file is
+    invalid the previous rules stay in use.
+    """
+    key = str(rules_file)
+    try:
+        st = os.stat(rules_file)
+    except OSError:
+        return _EMPTY
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _matchers_lock:
+        cached = _matchers.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    try:
+        with open(rules_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        matcher = SurveyMatcher(data.get("rules", []), Path(rules_file).parent, data.get("default"))
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Error loading survey rules {os.path.basename(rules_file)}: {e}")
+        return cached[1] if cached is not None else _EMPTY
+
+    for template in matcher.templates():
+        if not template.exists():
+            print(f"Survey rules: template {template.name} does not exist")
+        load_survey_data(template)
+    with _matchers_lock:
+        _matchers[key] = (stamp, matcher)
+    print(f"Loaded {len(matcher.surveys)} survey rules from {os.path.basename(rules_file)}")
+    return matcher
+
+
+def get_survey_for_time(mapping: SurveyMatcher, video_time: Optional[str], filename: str = "",
+                        duration: Optional[float] = None, use_default: bool = True) -> Optional[Path]:
+    """Survey template for a video recorded at video_time ("HH:MM"), or None for the default."""
+    return mapping.match(filename, video_time, duration, use_default)
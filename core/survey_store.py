@@ -0,0 +1,216 @@
+import os
+import copy
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process writers are serialised
+    fcntl = None
+
+from .config import SURVEY_STORE_COMPACT_EVERY
+
+
+class PendingSurveyStore:
+    """
+    Pending surveys indexed by URL, persisted as a snapshot plus an append-only log.
+
+    The snapshot (e.g. data/pending_surveys.json) keeps the original format, a
+    JSON list of survey dicts. Every change is appended to a sibling .log file
+    as one JSON line, so adding a survey costs one small write however many
+    surveys are pending. After compact_every log entries the log is folded
+    back into the snapshot (written to a temp file and renamed over it).
+
+    Writers are serialised with a thread lock and, where available, an
+    advisory file lock; before every operation the store replays log entries
+    appended by other processes, and reloads fully if another process
+    compacted the snapshot.
+    """
+
+    def __init__(self, snapshot_file: Path, compact_every: int = SURVEY_STORE_COMPACT_EVERY):
+        """
+        Args:
+            snapshot_file: JSON list of surveys, created if missing
+            compact_every: log entries after which the log is folded into the snapshot
+        """
+        self.snapshot_file = Path(snapshot_file)
+        self.log_file = self.snapshot_file.with_suffix(".log")
+        self.lock_file = self.snapshot_file.with_suffix(".lock")
+        self.compact_every = compact_every
+        self.snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+
+        self._surveys: Dict[str, Dict] = {}
+        self._snapshot_id = None
+        self._log_offset = 0
+        self._log_entries = 0
+        self._lock = threading.Lock()
+
+        with self._locked():
+            if not self.snapshot_file.exists():
+                self._write_snapshot([])
+
+    # ─── public API ───
+
+    def add(self, survey: Dict) -> bool:
+        """Add a survey keyed by survey['url']; returns False if it is already tracked."""
+        with self._locked():
+            if survey['url'] in self._surveys:
+                return False
+            self._append({'op': 'add', 'survey': copy.deepcopy(survey)})
+            return True
+
+    def remove_many(self, urls: Iterable[str]) -> List[str]:
+        """Stop tracking the given URLs; returns those that were tracked."""
+        with self._locked():
+            urls = [url for url in dict.fromkeys(urls) if url in self._surveys]
+            if urls:
+                self._append({'op': 'remove', 'urls': urls})
+            return urls
+
+    def update_many(self, updates: Dict[str, Dict]):
+        """Merge fields into tracked surveys, as {url: {field: value}}."""
+        with self._locked():
+            updates = {url: fields for url, fields in updates.items() if url in self._surveys}
+            if updates:
+                self._append({'op': 'update', 'updates': copy.deepcopy(updates)})
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._locked():
+            return copy.deepcopy(self._surveys.get(url))
+
+    def all(self) -> List[Dict]:
+        """Copies of all pending surveys, oldest first."""
+        with self._locked():
+            return copy.deepcopy(list(self._surveys.values()))
+
+    def urls(self) -> List[str]:
+        """URLs of all pending surveys, oldest first."""
+        with self._locked():
+            return list(self._surveys)
+
+    def __len__(self) -> int:
+        with self._locked():
+            return len(self._surveys)
+
+    def __contains__(self, url: str) -> bool:
+        with self._locked():
+            return url in self._surveys
+
+    def compact(self):
+        """Fold the log into the snapshot now."""
+        with self._locked():
+            self._compact()
+
+    # ─── internals ───
+
+    @contextmanager
+    def _locked(self):
+        """Hold the thread lock and the cross-process file lock, synced with disk."""
+        with self._lock:
+            handle = None
+            if fcntl is not None:
+                handle = open(self.lock_file, 'a')
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                self._sync()
+                yield
+            finally:
+                if handle is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                    handle.close()
+
+    def _stat_id(self):
+        try:
+            st = os.stat(self.snapshot_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _sync(self):
+        """Catch up with changes made by other processes (caller holds the lock)."""
+        snapshot_id = self._stat_id()
+        if snapshot_id != self._snapshot_id:
+            self._reload(snapshot_id)
+        else:
+            self._replay_log()
+
+    def _reload(self, snapshot_id):
+        self._surveys = {}
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                for survey in json.load(f):
+                    self._surveys.setdefault(survey['url'], survey)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading survey data: {e}")
+        self._snapshot_id = snapshot_id
+        self._log_offset = 0
+        self._log_entries = 0
+        self._replay_log()
+
+    def _replay_log(self):
+        try:
+            with open(self.log_file, 'rb') as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            self._log_offset = 0
+            return
+        # only whole lines; a torn last line (crash mid-append) is left unread
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except ValueError:
+                continue
+            self._log_entries += 1
+        self._log_offset += end
+
+    def _apply(self, entry: Dict):
+        op = entry.get('op')
+        if op == 'add':
+            survey = entry['survey']
+            self._surveys.setdefault(survey['url'], survey)
+        elif op == 'remove':
+            for url in entry['urls']:
+                self._surveys.pop(url, None)
+        elif op == 'update':
+            for url, fields in entry['updates'].items():
+                if url in self._surveys:
+                    self._surveys[url].update(fields)
+
+    def _append(self, entry: Dict):
+        line = json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n'
+        with open(self.log_file, 'ab') as f:
+            if f.tell() > self._log_offset:
+                # terminate a torn line left by a crashed writer
+                line = b'\n' + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            self._log_offset = f.tell()
+        self._apply(entry)
+        self._log_entries += 1
+        if self._log_entries >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        self._write_snapshot(list(self._surveys.values()))
+        # the snapshot already holds every logged change, so the log can go
+        with open(self.log_file, 'wb'):
+            pass
+        self._log_offset = 0
+        self._log_entries = 0
+
+    def _write_snapshot(self, surveys: List[Dict]):
+        tmp = self.snapshot_file.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(surveys, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_file)
+        self._snapshot_id = self._stat_id()
@@ -0,0 +1,182 @@
+import os
+import json
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+from .config import (
+    PROJECT_ROOT,
+    BATCH_INTERVAL,
+    RECIPIENT_EMAIL,
+    SURVEY_RULES_FILE,
+    STATE_DB_FILE
+)
+
+
+class Tenant:
+    """One watch directory with its own survey, recipient and batch settings."""
+
+    def __init__(self, name: str, watch_dir: str, survey_file: Optional[str] = None,
+                 recipient: Optional[str] = None, batch_interval: Optional[float] = None,
+                 state_file: Optional[str] = None, survey_rules: Optional[str] = None):
+        """
+        Args:
+            name: short unique name, used in status output and for the state file
+            watch_dir: directory with this tenant's recordings
+            survey_file: survey JSON for videos no rule matches (default: the
+                         rules' default, then SURVEY_JSON_PATH)
+            survey_rules: rules file choosing the survey per video (default SURVEY_RULES_FILE)
+            recipient: notification and reminder address (default RECIPIENT_EMAIL)
+            batch_interval: seconds to collect videos into one batch (default BATCH_INTERVAL)
+            state_file: directory state DB (default data/tenants/<name>/directory_state.db,
+                        STATE_DB_FILE without a name)
+        """
+        self.name = name
+        self.watch_dir = str(watch_dir)
+        self.survey_file = Path(survey_file) if survey_file else None
+        self.survey_rules = Path(survey_rules) if survey_rules else SURVEY_RULES_FILE
+        self.recipient = recipient or RECIPIENT_EMAIL
+        self.batch_interval = BATCH_INTERVAL if batch_interval is None else batch_interval
+        if state_file:
+            self.state_file = Path(state_file)
+        elif name:
+            self.state_file = PROJECT_ROOT / "data" / "tenants" / name / "directory_state.db"
+        else:
+            self.state_file = STATE_DB_FILE
+
+    def __repr__(self):
+        return f"Tenant({self.name!r}, {self.watch_dir!r})"
+
+
+def load_tenants(path) -> List[Tenant]:
+    """
+    Read the tenants file: a JSON list (or {"tenants": [...]}) of objects with
+    name and watch_dir, and optionally survey_file, survey_rules, recipient,
+    batch_interval and state_file. Relative paths are resolved against the file's directory.
+
+    Raises:
+        ValueError: if the file is malformed or names are missing or repeated
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("tenants") if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path.name}: expected a non-empty list of tenants")
+
+    base = path.resolve().parent
+    tenants = []
+    names = set()
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get("name") or not entry.get("watch_dir"):
+            raise ValueError(f"{path.name}: tenant {index} needs a name and a watch_dir")
+        name = str(entry["name"])
+        if name in names:
+            raise ValueError(f"{path.name}: tenant {name!r} is listed twice")
+        if "/" in name or name.startswith("."):
+            raise ValueError(f"{path.name}: invalid tenant name {name!r}")
+        names.add(name)
+
+        def resolve(key):
+            value = entry.get(key)
+            return str(base / value) if value else None
+
+        batch_interval = entry.get("batch_interval")
+        tenants.append(Tenant(
+            name=name,
+            watch_dir=resolve("watch_dir"),
+            survey_file=resolve("survey_file"),
+            recipient=entry.get("recipient"),
+            batch_interval=float(batch_interval) if batch_interval is not None else None,
+            state_file=resolve("state_file"),
+            survey_rules=resolve("survey_rules"),
+        ))
+
+    dirs = [os.path.realpath(t.watch_dir) for t in tenants]
+    if len(set(dirs)) != len(dirs):
+        raise ValueError(f"{path.name}: two tenants share a watch_dir")
+    return tenants
+
+
+class FairSlots:
+    """
+    A fixed number of batch slots shared by all tenants.
+
+    Waiting tenants are served round-robin, so a tenant with a long backlog
+    gets one slot in turn with the others instead of holding all of them.
+    """
+
+    def __init__(self, count: int):
+        """
+        Args:
+            count: batches allowed to run at the same time
+        """
+        if count < 1:
+            raise ValueError("at least one slot is needed")
+        self.count = count
+        self._free = count
+        self._cond = threading.Condition()
+        # tenant -> its waiters in arrival order; tenants take turns in _turns
+        self._waiting: Dict[str, Deque[list]] = {}
+        self._turns: Deque[str] = deque()
+
+    def acquire(self, tenant: str, cancel: Optional[threading.Event] = None) -> bool:
+        """Wait for a slot; False if cancel was set first."""
+        ticket = [False]
+        with self._cond:
+            if tenant not in self._waiting:
+                self._waiting[tenant] = deque()
+                self._turns.append(tenant)
+            self._waiting[tenant].append(ticket)
+            self._grant()
+            while not ticket[0]:
+                if cancel is not None and cancel.is_set():
+                    self._withdraw(tenant, ticket)
+                    return False
+                self._cond.wait(0.5 if cancel is not None else None)
+        return True
+
+    def release(self):
+        with self._cond:
+            self._free += 1
+            self._grant()
+
+    @contextmanager
+    def slot(self, tenant: str, cancel: Optional[threading.Event] = None):
+        """Hold a slot for the with-block; yields False (without a slot) if cancelled."""
+        acquired = self.acquire(tenant, cancel)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release()
+
+    def in_use(self) -> int:
+        with self._cond:
+            return self.count - self._free
+
+    def _grant(self):
+        granted = False
+        while self._free and self._turns:
+            tenant = self._turns.popleft()
+            waiters = self._waiting[tenant]
+            waiters.popleft()[0] = True
+            self._free -= 1
+            granted = True
+            if waiters:
+                self._turns.append(tenant)
+            else:
+                del self._waiting[tenant]
+        if granted:
+            self._cond.notify_all()
+
+    def _withdraw(self, tenant: str, ticket: list):
+        waiters = self._waiting.get(tenant)
+        if waiters is None:
+            return
+        waiters.remove(ticket)
+        if not waiters:
+            del self._waiting[tenant]
+            self._turns.remove(tenant)
@@ -0,0 +1,81 @@
+import sys
+import json
+from typing import Dict, Iterable, List
+
+from .config import TRACE_LOG_FILE
+
+STAGE_ORDER = ["wait", "probe", "convert", "upload", "page", "notify"]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(lines: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Per-stage latency breakdown of span log lines.
+
+    Returns:
+        {stage: {count, failures, total_ms, p50_ms, p95_ms, max_ms}}
+    """
+    durations: Dict[str, List[float]] = {}
+    failures: Dict[str, int] = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if entry.get("event") != "span":
+            continue
+        stage = entry.get("stage", "?")
+        durations.setdefault(stage, []).append(float(entry.get("duration_ms", 0)))
+        if not entry.get("ok", True):
+            failures[stage] = failures.get(stage, 0) + 1
+
+    summary = {}
+    for stage, values in durations.items():
+        values.sort()
+        summary[stage] = {
+            "count": len(values),
+            "failures": failures.get(stage, 0),
+            "total_ms": sum(values),
+            "p50_ms": _percentile(values, 0.5),
+            "p95_ms": _percentile(values, 0.95),
+            "max_ms": values[-1],
+        }
+    return summary
+
+
+def format_summary(summary: Dict[str, Dict]) -> str:
+    stages = [s for s in STAGE_ORDER if s in summary] + sorted(set(summary) - set(STAGE_ORDER))
+    grand_total = sum(row["total_ms"] for row in summary.values()) or 1
+    lines = [f"{'stage':<10}{'count':>8}{'fail':>6}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}{'share':>8}"]
+    for stage in stages:
+        row = summary[stage]
+        lines.append(
+            f"{stage:<10}{row['count']:>8}{row['failures']:>6}{row['p50_ms']:>12.1f}"
+            f"{row['p95_ms']:>12.1f}{row['max_ms']:>12.1f}{row['total_ms'] / grand_total:>8.0%}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    """Usage: python -m core.trace_summary [trace.jsonl]"""
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else TRACE_LOG_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            summary = summarize(f)
+    except OSError as e:
+        print(f"Cannot read {path}: {e}")
+        return 1
+    if not summary:
+        print(f"No spans in {path}")
+        return 0
+    print(format_summary(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
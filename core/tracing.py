@@ -0,0 +1,113 @@
+import json
+import time
+import uuid
+import queue
+import logging
+import datetime
+import threading
+import logging.handlers
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from .config import TRACE_LOG_FILE
+from .metrics import STAGE_SECONDS, FAILURES
+
+_logger = logging.getLogger("avas.trace")
+_logger.propagate = False
+_logger.setLevel(logging.INFO)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, message and the record's `fields`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def start_trace_logging(log_file: Optional[Path] = TRACE_LOG_FILE) -> None:
+    """
+    Route trace records through a QueueHandler to a background QueueListener.
+
+    Processing threads only put the record on an in-memory queue; formatting
+    and file writes happen on the listener thread. Called on first use; an
+    empty log_file writes to stderr instead.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        if log_file:
+            Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+            target: logging.Handler = logging.FileHandler(log_file, encoding="utf-8")
+        else:
+            target = logging.StreamHandler()
+        target.setFormatter(JSONFormatter())
+
+        records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _logger.handlers = [logging.handlers.QueueHandler(records)]
+        _listener = logging.handlers.QueueListener(records, target)
+        _listener.start()
+
+
+def stop_trace_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _logger.handlers = []
+
+
+def log_event(event: str, level: int = logging.INFO, **fields) -> None:
+    """Write one structured log line."""
+    if _listener is None:
+        start_trace_logging(TRACE_LOG_FILE)
+    _logger.log(level, event, extra={"fields": fields})
+
+
+@contextmanager
+def span(stage: str, trace_id: Optional[str] = None, **fields) -> Iterator[Dict]:
+    """
+    Time a pipeline stage and log it as one "span" line.
+
+    The yielded dict can be filled with extra fields inside the block (e.g.
+    the outcome). A stage that raises, or sets ok=False, is logged with
+    ok: false and counted in avas_failures_total; the duration always goes
+    into the avas_stage_seconds histogram.
+    """
+    extra: Dict = {}
+    start = time.perf_counter()
+    try:
+        yield extra
+    except BaseException as e:
+        extra.setdefault("ok", False)
+        extra.setdefault("error", repr(e))
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        ok = extra.pop("ok", True)
+        STAGE_SECONDS.observe(duration, stage=stage)
+        if not ok:
+            FAILURES.inc(stage=stage)
+        record = {"trace_id": trace_id, "stage": stage, "duration_ms": round(duration * 1000, 3), "ok": ok}
+        record.update(fields)
+        record.update(extra)
+        log_event("span", level=logging.INFO if ok else logging.WARNING, **record)
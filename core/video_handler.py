@@ -3,7 +3,10 @@ import threading
 import queue
 import datetime
 import time
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Dict, List
 from watchdog.events import FileSystemEventHandler
 
 from .video_metadata import (
@@ -13,11 +16,16 @@ from .video_metadata import (
     calculate_end_time
 )
 from .survey_loader import load_survey_data
+from .survey_rules import load_survey_mapping, get_survey_for_time
 from .video_processor import convert_to_mp4, process_and_upload_video
 from .appscript_client import call_appscript_batch
-from .notifier import notify_batch  
-from .config import BATCH_INTERVAL
+from .dispatcher import notify_batch
+from .config import BATCH_INTERVAL, SURVEY_JSON_PATH, SURVEY_RULES_FILE, RECIPIENT_EMAIL
 from .reminder import add_survey_to_track
+from .state_db import SEEN, PROCESSING, DONE, FAILED, OUTPUT
+from .metrics import BATCH_SIZE, TRANSCODE_SPEED
+from .tracing import new_trace_id, span, log_event
+from . import lease as leases
 
 
 class VideoHandler(FileSystemEventHandler):
@@ -26,12 +34,31 @@ class VideoHandler(FileSystemEventHandler):
     2. Converts non-.mp4 files to .mp4 via ffmpeg.
     3. Uploads the resulting files to S3.
     4. Calls an App Script to generate a page URL.
-    5. Sends immediate notification email after processing.
+    5. Queues a notification email after processing.
     """
 
     def __init__(
-        self, callback, wait_timeout=300, wait_interval=1, batch_interval=None
+        self, callback, wait_timeout=300, wait_interval=1, batch_interval=None, state=None,
+        job_queue=None, lease=None, survey_file=None, recipient=None, slots=None, tenant="",
+        survey_rules=None
     ):
+        """
+        state: optional DirectoryStateDB; when given, each file's processing
+        status (processing / done / failed) is recorded so unfinished files
+        are retried after a restart.
+        job_queue: optional JobQueue; when given, batches are queued for
+        worker processes instead of being processed here.
+        lease: optional LeaseManager; when given, a file is only processed
+        after claiming it, so nodes sharing the directory split the work.
+        survey_file, recipient: survey JSON and notification address of this
+        directory (default RECIPIENT_EMAIL for the address).
+        survey_rules: rules file choosing the survey per video (default
+        SURVEY_RULES_FILE). Videos no rule matches get survey_file, without
+        one the rules file's default, and otherwise SURVEY_JSON_PATH.
+        slots: optional FairSlots shared with the handlers of other tenants;
+        a batch runs only while it holds one.
+        tenant: tenant name the slots are requested for.
+        """
         super().__init__()
         self.batch_interval = (
             batch_interval if batch_interval is not None else BATCH_INTERVAL
@@ -39,11 +66,33 @@ class VideoHandler(FileSystemEventHandler):
         self.callback = callback
         self.wait_timeout = wait_timeout
         self.wait_interval = wait_interval
+        self.state = state
+        self.job_queue = job_queue
+        self.lease = lease
+        self.survey_file = survey_file
+        self.survey_rules = survey_rules or SURVEY_RULES_FILE
+        self.recipient = recipient or RECIPIENT_EMAIL
+        self.slots = slots
+        self.tenant = tenant
 
         self._skip = set()
         self._queue = queue.Queue()
         self._timer = None
         self._lock = threading.Lock()
+        # one backlog batch at a time; live batches do not wait for it
+        self._backlog_lock = threading.Lock()
+        # live batches currently draining or processing; all batches processing
+        self._live_batches = 0
+        self._running_batches = 0
+        self._batches_done = threading.Condition(self._lock)
+        # set by drain(): no new events or files are started
+        self._closing = threading.Event()
+        # cleared by pause(): batches are held and uploads wait
+        self._resumed = threading.Event()
+        self._resumed.set()
+        # path -> (stage, started at) for files in the running batches
+        self._active: Dict[str, tuple] = {}
+        self._failures = deque(maxlen=50)
 
     def on_created(self, event):
         """
@@ -61,6 +110,14 @@ class VideoHandler(FileSystemEventHandler):
         if ext not in (".mov", ".avi", ".mp4"):
             return
 
+        if self._closing.is_set():
+            # left to the next start, which finds it in the directory state
+            return
+
+        if self._is_output(path):
+            # converted by a worker process, whose _skip this handler cannot see
+            return
+
         with self._lock:
             if path in self._skip:
                 self._skip.remove(path)
@@ -75,39 +132,228 @@ class VideoHandler(FileSystemEventHandler):
     def _run_batch(self):
         """
         batch all the videos in the queue after the timer finish
+        """
+        # reset timer and drain queue atomically
+        with self._lock:
+            self._timer = None
+            if not self._resumed.is_set():
+                # paused: the files stay queued until resume()
+                return
+            items = []
+            while not self._queue.empty():
+                items.append(self._queue.get())
+            self._live_batches += 1
+
+        try:
+            if items:
+                self.process_batch(items)
+        finally:
+            with self._lock:
+                self._live_batches -= 1
+
+    def queue_depth(self) -> int:
+        """Files waiting for the next batch."""
+        return self._queue.qsize()
+
+    def queued_files(self) -> List[str]:
+        with self._lock:
+            return list(self._queue.queue)
+
+    def active_files(self) -> List[Dict]:
+        """Files in the running batches with their current stage and seconds spent in it."""
+        now = time.time()
+        with self._lock:
+            active = dict(self._active)
+        return [
+            {"file": os.path.basename(path), "path": path, "stage": stage, "elapsed": round(now - started, 1)}
+            for path, (stage, started) in sorted(active.items())
+        ]
+
+    def recent_failures(self) -> List[Dict]:
+        with self._lock:
+            return list(self._failures)
+
+    def flush(self) -> int:
+        """Start the pending batch now instead of waiting for the timer; returns its size."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            size = self._queue.qsize()
+        if size:
+            threading.Thread(target=self._run_batch, name="batch-flush", daemon=True).start()
+        return size
+
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    def pause(self):
+        """Hold new batches and uploads; events are still queued."""
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+        with self._lock:
+            if self._timer is None and not self._queue.empty():
+                self._timer = threading.Timer(self.batch_interval, self._run_batch)
+                self._timer.start()
+
+    def is_idle(self) -> bool:
+        """True when no live event is queued, waiting for its timer or being processed, and not paused."""
+        with self._lock:
+            return not self._live_pending() and self._resumed.is_set()
+
+    def _live_pending(self) -> bool:
+        # caller holds self._lock
+        return self._timer is not None or not self._queue.empty() or self._live_batches > 0
+
+    def process_batch(self, items, backlog: bool = False):
+        """
+        Process a list of video paths as one batch (one page, one notification).
+
+        Live batches start as soon as their timer fires. Backlog batches run
+        one at a time and, before each file, wait while a live batch is
+        queued or running, so a new recording waits for at most one backlog
+        file instead of a whole session.
 
         Steps:
-        1. Dequeues all file
-        2. For each one:
+        1. For each file:
            a. Waits for the file to stabilize (_wait_for_stable_file).
            b. Records its last-modified timestamp.
            c. Converts to .mp4 (marking the new .mp4 in self._skip).
            d. Uploads the .mp4 to S3 via upload_to_s3().
-        3. Calls call_appscript_batch() with video metadata to get a page URL.
-        4. Sends immediate notification email.
+        2. Calls call_appscript_batch() with video metadata to get a page URL.
+        3. Queues the notification email for the background dispatcher.
+
+        With a job queue the batch is only queued for the worker processes.
+
+        Args:
+            items: video paths of the batch
+            backlog: True for catch-up sessions from the backlog drainer
         """
-        # reset timer and drain queue atomically
+        if self.job_queue is not None:
+            job_id = self.job_queue.enqueue(items)
+            if job_id is not None:
+                print(f"Queued job {job_id} with {len(items)} files for the workers")
+            return
+        if backlog:
+            with self._backlog_lock:
+                self._run_process_batch(items, backlog=True)
+        else:
+            self._run_process_batch(items)
+
+    def _run_process_batch(self, items, backlog: bool = False):
         with self._lock:
-            self._timer = None
-            items = []
-            while not self._queue.empty():
-                items.append(self._queue.get())
+            if self._closing.is_set():
+                return
+            self._running_batches += 1
+        held = False
+
+        def yield_to_live():
+            # the slot is given up while waiting so the live batch can take it
+            nonlocal held
+            with self._lock:
+                if not self._live_pending():
+                    return
+            if held:
+                self.slots.release()
+                held = False
+            while not self._closing.wait(self.wait_interval):
+                with self._lock:
+                    if not self._live_pending():
+                        break
+            if self.slots is not None:
+                held = self.slots.acquire(self.tenant, cancel=self._closing)
 
-        if not items:
+        try:
+            if self.slots is not None:
+                held = self.slots.acquire(self.tenant, cancel=self._closing)
+                if not held:
+                    return
+            if backlog:
+                self._process_batch(items, before_file=yield_to_live)
+            else:
+                self._process_batch(items)
+        finally:
+            if held:
+                self.slots.release()
+            with self._lock:
+                for path in items:
+                    self._active.pop(path, None)
+                self._running_batches -= 1
+                self._batches_done.notify_all()
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Stop taking new work and wait up to timeout seconds for the batches in flight.
+
+        Queued files that have not been started are dropped here; they are
+        still recorded as unprocessed in the directory state and picked up
+        at the next start. A batch in progress finishes the file it is
+        working on and still creates the page and notification for the files
+        uploaded so far.
+
+        Returns:
+            True if nothing was left running at the deadline
+        """
+        self.close()
+        with self._lock:
+            finished = self._batches_done.wait_for(lambda: self._running_batches == 0, max(timeout, 0))
+        if not finished:
+            print("Shutdown: batch still running at the drain deadline")
+        return finished
+
+    def close(self):
+        """The first half of drain(): stop taking new work without waiting."""
+        if self._closing.is_set():
             return
-        
+        self._closing.set()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            dropped = 0
+            while not self._queue.empty():
+                self._queue.get()
+                dropped += 1
+        if dropped:
+            print(f"Shutdown: {dropped} queued files left for the next start")
+
+    def _process_batch(self, items, before_file=None):
         video_names = []
         video_urls = []
         video_times = []
         video_end_times = []
         survey_data_list = []
 
+        trace_ids = []
+        BATCH_SIZE.observe(len(set(items)))
+
         for path in set(items):
-            if not self._wait_for_stable_file(path):
+            if before_file is not None:
+                before_file()
+            if self._closing.is_set():
+                break
+            filename = os.path.basename(path)
+            if not self._claim(path):
+                continue
+            trace_id = new_trace_id()
+            log_event("video", trace_id=trace_id, file=filename)
+            self._mark([path], PROCESSING)
+            with self._stage([path], "wait", trace_id) as result:
+                stable = self._wait_for_stable_file(path)
+                if not stable:
+                    # interrupted by shutdown is not a failure
+                    result["ok"] = self._closing.is_set()
+            if not stable:
+                if self._closing.is_set():
+                    self._mark([path], SEEN)
+                    break
+                self._mark([path], FAILED, "file did not stabilise", stage="wait")
                 continue
 
             # Extract metadata
-            filename = os.path.basename(path)
             iso_ts, video_time = extract_timestamp_from_filename(filename)
             
             print(f"\n=== Processing {filename} ===")
@@ -126,15 +372,26 @@ class VideoHandler(FileSystemEventHandler):
             video_times.append(iso_ts)
 
             # Get video duration and calculate end time
-            duration = get_video_duration(path)
+            with self._stage([path], "probe", trace_id) as result:
+                duration = get_video_duration(path)
+                result["video_seconds"] = duration
+                # the batch goes on without an end time, but the failure is counted
+                result["ok"] = duration is not None
             print(f"Video duration: {duration} seconds")
             end_time = calculate_end_time(iso_ts, duration)
             print(f"Calculated end time: {end_time}")
             video_end_times.append(end_time)
 
-            # Load survey data
-            video_survey_data = load_survey_data()
-            print(f"Loaded survey data: {video_survey_data}")
+            # Pick the survey by the rules (compiled and cached until the file changes)
+            # the directory's own survey comes before the default of a shared rules file
+            mapping = load_survey_mapping(self.survey_rules)
+            survey_file = get_survey_for_time(
+                mapping, video_time, filename=filename, duration=duration, use_default=False
+            )
+            video_survey_data = load_survey_data(
+                survey_file or self.survey_file or mapping.default or SURVEY_JSON_PATH
+            )
+            print(f"Loaded survey data: {video_survey_data.get('_survey_file', 'unknown')}")
             survey_data_list.append(video_survey_data)
 
             # Convert and upload
@@ -143,21 +400,51 @@ class VideoHandler(FileSystemEventHandler):
             expected_mp4 = base + ".mp4"
             with self._lock:
                 self._skip.add(expected_mp4)
-
-            mp4_path, should_skip = convert_to_mp4(path)
+            if expected_mp4 != path:
+                # before ffmpeg creates it, so a watcher in another process skips it too
+                self._record_output(expected_mp4)
+            if self.lease is not None and expected_mp4 != path:
+                # other nodes must not pick up the conversion output either
+                self.lease.claim(expected_mp4)
+
+            started = time.perf_counter()
+            with self._stage([path], "convert", trace_id) as result:
+                mp4_path, should_skip = convert_to_mp4(path)
+                result["transcoded"] = should_skip
+                # convert_to_mp4 returns the original for .mp4 input and when ffmpeg fails;
+                # the original is still uploaded, the failure is counted
+                result["ok"] = should_skip or mp4_path.lower().endswith(".mp4")
+            elapsed = time.perf_counter() - started
+            if should_skip and duration and elapsed > 0:
+                TRANSCODE_SPEED.observe(duration / elapsed)
             if should_skip:
                 with self._lock:
                     self._skip.add(mp4_path)
-
-            video_url = process_and_upload_video(mp4_path)
+                # the converted copy is an output, not a new recording
+                self._mark([mp4_path], OUTPUT)
+            elif expected_mp4 != path:
+                # no output after all: a recording with that name later is a real one
+                self._forget_output(expected_mp4)
+                if self.lease is not None:
+                    self.lease.release(expected_mp4, done=False)
+
+            if not self._wait_while_paused():
+                self._mark([path], SEEN)
+                break
+            with self._stage([path], "upload", trace_id) as result:
+                video_url = process_and_upload_video(mp4_path)
+                result["ok"] = bool(video_url)
             if not video_url:
+                self._mark([path], FAILED, "upload failed", stage="upload")
                 continue
 
             video_names.append(filename)
             video_urls.append(video_url)
+            trace_ids.append(trace_id)
 
         if not video_names:
             return
+        processed_paths = [p for p in set(items) if os.path.basename(p) in video_names]
 
         print(f"\n=== Final batch data ===")
         print(f"Video names: {video_names}")
@@ -167,8 +454,9 @@ class VideoHandler(FileSystemEventHandler):
         print("========================\n")
 
         # Call Apps Script
-        page_url = (
-            call_appscript_batch(
+        # batch-level stages are logged once, listing the videos' trace ids
+        with self._stage(processed_paths, "page", trace_ids=trace_ids) as result:
+            page_url = call_appscript_batch(
                 video_paths=list(set(items)),
                 video_names=video_names,
                 video_urls=video_urls,
@@ -176,19 +464,22 @@ class VideoHandler(FileSystemEventHandler):
                 video_end_times=video_end_times,
                 survey_data_list=survey_data_list,
             )
-            or video_urls[0]
-        )
+            result["ok"] = bool(page_url)
+        page_url = page_url or video_urls[0]
 
-        # Send immediate notification
+        # Queue notification, the dispatcher sends it in the background
+        # and logs the "notify" span for these trace ids when it does
         try:
-            notify_batch(video_names, [page_url])
-            print(f"Sent immediate notification for {len(video_names)} videos at {datetime.datetime.now()}")
+            notify_batch(video_names, [page_url], self.recipient, trace_ids=trace_ids)
+            print(f"Queued notification for {len(video_names)} videos at {datetime.datetime.now()}")
         except Exception as e:
-            print(f"Failed to send notification: {e}")
+            print(f"Failed to queue notification: {e}")
         
+        self._mark(processed_paths, DONE)
+
         # Add surveys to reminder tracker
         for video_name in video_names:
-            add_survey_to_track(video_name, page_url)
+            add_survey_to_track(video_name, page_url, self.recipient)
             print(f"Added {video_name} to survey reminder tracker")
 
         # Still call the callback immediately if provided
@@ -198,14 +489,101 @@ class VideoHandler(FileSystemEventHandler):
         except TypeError:
             pass
 
+    @contextmanager
+    def _stage(self, paths, stage, trace_id=None, **fields):
+        """Trace a pipeline stage and show it as the current stage of paths."""
+        started = time.time()
+        with self._lock:
+            for path in paths:
+                self._active[path] = (stage, started)
+        with span(stage, trace_id, **fields) as result:
+            yield result
+
+    def _claim(self, path) -> bool:
+        """Take the file's lease when several nodes share the directory; True to go ahead."""
+        if self.lease is None:
+            return True
+        try:
+            result = self.lease.claim(path)
+        except OSError as e:
+            print(f"Cannot claim {os.path.basename(path)}: {e}")
+            return False
+        if result == leases.CLAIMED:
+            return True
+        if result == leases.DONE:
+            print(f"{os.path.basename(path)} already processed by another node")
+            self._mark([path], DONE)
+        else:
+            print(f"{os.path.basename(path)} is being processed by another node")
+        return False
+
+    def _record_output(self, path):
+        if self.state is None:
+            return
+        try:
+            self.state.mark(os.path.basename(path), OUTPUT)
+        except Exception as e:
+            print(f"Failed to record conversion output {os.path.basename(path)}: {e}")
+
+    def _forget_output(self, path):
+        with self._lock:
+            self._skip.discard(path)
+        if self.state is None:
+            return
+        try:
+            self.state.forget_output(os.path.basename(path))
+        except Exception as e:
+            print(f"Failed to drop conversion output {os.path.basename(path)}: {e}")
+
+    def _is_output(self, path) -> bool:
+        """True if the state DB records path as a conversion output."""
+        if self.state is None:
+            return False
+        try:
+            return (self.state.get(os.path.basename(path)) or {}).get("status") == OUTPUT
+        except Exception as e:
+            print(f"Failed to read the state of {os.path.basename(path)}: {e}")
+            return False
+
+    def _wait_while_paused(self) -> bool:
+        """Block while paused; False if shutdown started meanwhile."""
+        while not self._resumed.wait(self.wait_interval):
+            if self._closing.is_set():
+                return False
+        return not self._closing.is_set()
+
+    def _mark(self, paths, status, error=None, stage=None):
+        """Record the processing status of files in the state DB, if one is attached."""
+        if status == FAILED:
+            with self._lock:
+                for path in paths:
+                    self._failures.append({
+                        "file": os.path.basename(path), "stage": stage, "error": error, "time": time.time()
+                    })
+        if self.lease is not None and status != PROCESSING:
+            for path in paths:
+                try:
+                    self.lease.release(path, done=(status in (DONE, OUTPUT)))
+                except OSError as e:
+                    print(f"Failed to release the lease on {os.path.basename(path)}: {e}")
+        if self.state is None:
+            return
+        try:
+            names = [os.path.basename(p) for p in paths]
+            if status == SEEN:
+                # stopped by a shutdown: not an attempt, or restarts would use up its retries
+                self.state.interrupt(names)
+            else:
+                self.state.mark_many(names, status, error)
+        except Exception as e:
+            print(f"Failed to record {status} state: {e}")
+
     def _wait_for_stable_file(self, path):
         """
         - get size of the file in every wait_interval seconds.
         - Considers the file stable after two identical size readings.
-        - Aborts and returns False if wait_timeout is exceeded.
+        - Aborts and returns False if wait_timeout is exceeded or on shutdown.
         """
-        import time
-        
         start = time.time()
         last_size = -1
         stable_count = 0
@@ -224,6 +602,7 @@ class VideoHandler(FileSystemEventHandler):
                 last_size = size
                 stable_count = 0
 
-            time.sleep(self.wait_interval)
+            if self._closing.wait(self.wait_interval):
+                return False
 
         return False
@@ -1,8 +1,10 @@
 import os
 import subprocess
 from typing import Optional, Tuple
-from .config import S3_BUCKET_NAME
+from .config import S3_BUCKET_NAME, S3_ENDPOINT_URL
+from .metrics import UPLOADED_BYTES
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
 
@@ -39,12 +41,20 @@ def convert_to_mp4(video_path: str) -> Tuple[str, bool]:
     except subprocess.CalledProcessError:
         # Return original path if conversion fails
         return video_path, False
+    except OSError as e:
+        print(f"❌ ffmpeg could not be run, uploading the original file: {e}")
+        return video_path, False
 
-_s3 = boto3.client("s3")
+if S3_ENDPOINT_URL:
+    # S3-compatible servers are addressed by path, not by bucket subdomain
+    _s3 = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL, config=Config(s3={"addressing_style": "path"}))
+else:
+    _s3 = boto3.client("s3")
 def upload_to_s3(local_path: str) -> Optional[str]:
     key = os.path.basename(local_path)
     try:
         _s3.upload_file(local_path, S3_BUCKET_NAME, key)
+        UPLOADED_BYTES.inc(os.path.getsize(local_path))
         return key
     except (BotoCoreError, ClientError) as e:
         print(f"❌ fail {e}")
@@ -61,4 +71,6 @@ def process_and_upload_video(video_path: str) -> Optional[str]:
     if not s3_key:
         return None
     
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL.rstrip('/')}/{S3_BUCKET_NAME}/{s3_key}"
     return f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
\ No newline at end of file
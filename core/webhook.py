@@ -0,0 +1,94 @@
+import hmac
+from typing import List, Optional
+
+from .local_http import LocalHTTPServer, Request
+from .config import WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_TOKEN
+
+
+class SurveyWebhook:
+    """
+    Local endpoint the survey page (or a relay) calls when a survey is submitted.
+
+    POST /survey-complete with a JSON body naming the survey by page URL or
+    page id, one or many at a time:
+        {"url": "..."}  {"id": "..."}  {"urls": [...], "ids": [...]}
+    The surveys are removed from the reminder immediately. Repeating a call
+    is harmless; the response lists what was removed by this call:
+        {"removed": [...]}
+
+    The body must be sent as application/json, which browsers only do
+    cross-origin after a CORS preflight. CORS is only answered when a token
+    is set, so without one no other web page the user opens can reach the
+    endpoint.
+    """
+
+    def __init__(self, reminder, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                 token: str = WEBHOOK_TOKEN):
+        """
+        Args:
+            reminder: SurveyReminder whose store is updated
+            host: interface to bind
+            port: TCP port (0 picks a free one)
+            token: shared secret expected in X-AVAS-Token or ?token=; empty accepts
+                   any caller but disables CORS
+        """
+        self.reminder = reminder
+        self.token = token
+        self.server = LocalHTTPServer(host, port, name="survey webhook", cors=bool(token))
+        self.server.route("POST", "/survey-complete", self._handle_complete)
+        self.server.route("GET", "/health", lambda request: (200, {"status": "ok"}))
+
+    @property
+    def url(self) -> str:
+        return f"{self.server.url}/survey-complete"
+
+    def start(self):
+        self.server.start()
+        return self
+
+    def stop(self):
+        self.server.stop()
+
+    def _authorised(self, request: Request) -> bool:
+        if not self.token:
+            return True
+        supplied = request.headers.get("X-AVAS-Token") or request.query.get("token") or ""
+        return hmac.compare_digest(supplied.encode("utf-8"), self.token.encode("utf-8"))
+
+    def _handle_complete(self, request: Request):
+        if not self._authorised(request):
+            return 401, {"error": "invalid token"}
+        content_type = (request.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            return 415, {"error": "body must be sent as application/json"}
+        try:
+            payload = request.json()
+        except ValueError:
+            return 400, {"error": "body must be JSON"}
+        if not isinstance(payload, dict):
+            return 400, {"error": "body must be a JSON object"}
+
+        urls = _as_list(payload.get("urls")) + _as_list(payload.get("url"))
+        page_ids = [str(i) for i in _as_list(payload.get("ids")) + _as_list(payload.get("id"))]
+        if not urls and not page_ids:
+            return 400, {"error": "expected url, urls, id or ids"}
+        if not all(isinstance(url, str) for url in urls):
+            return 400, {"error": "url and urls must be strings"}
+
+        removed = self.reminder.mark_completed(urls=urls, page_ids=page_ids)
+        return 200, {"removed": removed}
+
+
+def _as_list(value) -> List:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def start_webhook(reminder) -> Optional[SurveyWebhook]:
+    """Start the webhook if WEBHOOK_PORT is configured."""
+    if not WEBHOOK_PORT:
+        return None
+    if not WEBHOOK_TOKEN:
+        print("Survey webhook without WEBHOOK_TOKEN: CORS is off, browser pages cannot call it")
+    return SurveyWebhook(reminder).start()
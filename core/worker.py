@@ -0,0 +1,172 @@
+import os
+import time
+import signal
+import threading
+import multiprocessing
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import (
+    JOB_QUEUE_FILE,
+    STATE_DB_FILE,
+    WORKER_HEARTBEAT,
+    WORKER_STALE_AFTER,
+    WORKER_POLL_INTERVAL,
+    LEASE_ENABLED
+)
+from .job_queue import JobQueue, Job
+from .state_db import DirectoryStateDB, DONE, OUTPUT
+from .reminder import get_reminder
+from .dispatcher import get_dispatcher
+from .video_handler import VideoHandler
+from .lease import LeaseManager
+
+
+def run_worker(worker_id: str, stop_event=None, db_file: Path = JOB_QUEUE_FILE,
+               state_file: Path = STATE_DB_FILE, poll_interval: float = WORKER_POLL_INTERVAL) -> None:
+    """
+    Worker process main loop: claim batches from the job queue and process them.
+
+    A worker finishes the job it is on before it stops (stop_event, SIGTERM or
+    SIGINT). It does not run the reminder schedule or send email: surveys and
+    notifications go to the shared store and spool, which the watcher serves.
+
+    Args:
+        worker_id: name recorded on claimed jobs
+        stop_event: threading.Event that ends the loop (default: set by SIGTERM/SIGINT)
+        db_file: job queue database
+        state_file: directory state database the processing status is written to
+        poll_interval: seconds between looks at an empty queue
+    """
+    stop = stop_event or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: stop.set())
+
+    get_reminder(start_scheduler=False)
+    get_dispatcher(start=False)
+    jobs = JobQueue(db_file)
+    state = DirectoryStateDB(state_file)
+    lease = LeaseManager(node_id=worker_id).start() if LEASE_ENABLED else None
+    handler = VideoHandler(None, state=state, lease=lease)
+    print(f"Worker {worker_id} started (pid {os.getpid()})")
+
+    while not stop.is_set():
+        job = jobs.claim(worker_id)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        _process_job(job, jobs, state, handler)
+
+    if lease:
+        lease.stop()
+    print(f"Worker {worker_id} stopped")
+
+
+def _process_job(job: Job, jobs: JobQueue, state: DirectoryStateDB, handler) -> None:
+    # a job taken over from a dead worker may be partly done already, and a
+    # conversion output queued by the watcher is not a recording
+    paths = [p for p in job.paths
+             if (state.get(os.path.basename(p)) or {}).get("status") not in (DONE, OUTPUT)]
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(WORKER_HEARTBEAT):
+            jobs.heartbeat(job.id)
+
+    heartbeat = threading.Thread(target=beat, name=f"heartbeat-{job.id}", daemon=True)
+    heartbeat.start()
+    try:
+        if paths:
+            handler.process_batch(paths)
+        jobs.complete(job.id)
+    except Exception as e:
+        print(f"Job {job.id} failed: {e}")
+        jobs.fail(job.id, repr(e))
+    finally:
+        done.set()
+        heartbeat.join()
+
+
+class WorkerPool:
+    """
+    Run N worker processes next to the watcher and keep them running.
+
+    A supervisor thread restarts a worker whose process exited and puts its
+    unfinished job back in the queue; jobs whose heartbeat stopped (a hung
+    worker) are put back after WORKER_STALE_AFTER seconds. Each worker can
+    also be run on its own with `python -m core.main worker`.
+    """
+
+    def __init__(self, count: int, db_file: Path = JOB_QUEUE_FILE, stale_after: float = WORKER_STALE_AFTER,
+                 check_interval: float = 1.0):
+        """
+        Args:
+            count: number of worker processes
+            db_file: job queue database
+            stale_after: seconds without heartbeat after which a running job is queued again
+            check_interval: how often the supervisor checks the workers
+        """
+        self.count = count
+        self.db_file = Path(db_file)
+        self.stale_after = stale_after
+        self.check_interval = check_interval
+        self.jobs = JobQueue(self.db_file)
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stopping = threading.Event()
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        self._supervisor: Optional[threading.Thread] = None
+
+    def start(self):
+        # jobs left running by a previous run whose worker is gone
+        self.jobs.requeue_stale(self.stale_after)
+        for index in range(self.count):
+            self._spawn(f"worker-{index + 1}")
+        self._supervisor = threading.Thread(target=self._supervise, name="worker-supervisor", daemon=True)
+        self._supervisor.start()
+        print(f"Started {self.count} worker processes")
+        return self
+
+    def _spawn(self, worker_id: str):
+        process = self._ctx.Process(
+            target=run_worker, args=(worker_id, None, self.db_file), name=worker_id, daemon=True
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    def _supervise(self):
+        while not self._stopping.wait(self.check_interval):
+            for worker_id, process in list(self._processes.items()):
+                if process.is_alive() or self._stopping.is_set():
+                    continue
+                print(f"Worker {worker_id} exited with code {process.exitcode}, restarting")
+                self.jobs.requeue_worker(worker_id)
+                self._spawn(worker_id)
+            self.jobs.requeue_stale(self.stale_after)
+
+    def status(self) -> List[Dict]:
+        return [
+            {"worker": worker_id, "pid": process.pid, "alive": process.is_alive()}
+            for worker_id, process in sorted(self._processes.items())
+        ]
+
+    def stop(self, timeout: float = 10):
+        """Let workers finish their current job for up to timeout seconds, then kill them."""
+        self._stopping.set()
+        if self._supervisor:
+            self._supervisor.join()
+        # SIGTERM asks a worker to stop after its current job (a shared multiprocessing
+        # Event is not used: a worker killed while waiting on it can deadlock set())
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for worker_id, process in self._processes.items():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                print(f"Worker {worker_id} still busy at shutdown, killing it")
+                process.kill()
+                process.join()
+                # its job is picked up again at the next start
+                self.jobs.requeue_worker(worker_id)
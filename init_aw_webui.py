@@ -3,9 +3,23 @@ import sys
 import shutil
 import platform
 import os
+import json
+import queue
+import re
+import gzip
+import base64
+import ctypes
+import errno
+import time
+import hashlib
+import argparse
+import urllib.error
+import urllib.request
+import threading
 from pathlib import Path
+from typing import Dict, List, Optional
 
-def run(cmd: str, *, cwd: Path = None) -> int:
+def run(cmd: str, *, cwd: Optional[Path] = None) -> int:
     """
     Run a shell command in bash -lc (or cmd.exe on Windows) and return its exit code.
     """
@@ -21,72 +35,512 @@ def run(cmd: str, *, cwd: Path = None) -> int:
         print(f"Failed to execute command: {full}\nError: {e}", file=sys.stderr)
         return 1
 
-def find_aw_static() -> Path:
-    """
-    Search common locations for the ActivityWatch server 'static' directory.
-    Returns the Path if found, otherwise None.
-    """
-    def is_aw_server_static(static_path: Path) -> bool:
-        return static_path.is_dir() and static_path.name == 'static' and \
-               static_path.parent.name.lower() in ('aw_server', 'aw-server')
+# directories never searched: VCS metadata, dependency trees, virtualenvs and caches
+PRUNE_DIRS = {
+    '.git', '.hg', '.svn', 'node_modules', '__pycache__', '.cache', 'Cache', 'Caches',
+    '.venv', 'venv', '.tox', '.nox', '.mypy_cache', '.pytest_cache', '.npm', '.cargo',
+    '.rustup', '.gradle', '.m2', 'site-packages', 'dist-packages', 'proc', 'sys', 'dev',
+    'Library', 'snap', '.Trash', '$Recycle.Bin',
+}
+SEARCH_MAX_DEPTH = 6
+SEARCH_WORKERS = 8
+
+
+def _cache_file() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or (Path.home() / '.cache')
+    return Path(base) / 'avas' / 'aw_static.json'
+
+
+def is_aw_server_static(static_path: Path) -> bool:
+    return static_path.is_dir() and static_path.name == 'static' and \
+           static_path.parent.name.lower() in ('aw_server', 'aw-server')
+
 
+def _load_cached_static() -> Optional[Path]:
+    try:
+        with open(_cache_file(), 'r', encoding='utf-8') as f:
+            cached = Path(json.load(f)['static_dir'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return cached if is_aw_server_static(cached) else None
+
+
+def _save_cached_static(static_dir: Path) -> None:
+    cache = _cache_file()
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache, 'w', encoding='utf-8') as f:
+            json.dump({'static_dir': str(static_dir)}, f)
+    except OSError as e:
+        print(f"Could not cache the static directory location: {e}", file=sys.stderr)
+
+
+def _install_candidates() -> List[Path]:
+    """Static directories of the usual ActivityWatch installs, and next to aw-server on PATH."""
     home = Path.home()
     system = platform.system()
-    roots = []
+    layouts = ['aw-server/aw_server/static', 'aw-server/aw-server/static']
     if system == 'Darwin':
-        roots = [Path("/Applications"), home / "Applications", Path("/opt"), Path("/usr/local")]
-    elif system == 'Linux':
-        roots = [home, Path("/usr"), Path("/opt"), Path("/usr/local")]
+        installs = [Path('/Applications/ActivityWatch.app/Contents/MacOS'),
+                    Path('/Applications/ActivityWatch.app/Contents/Resources'),
+                    home / 'Applications/ActivityWatch.app/Contents/MacOS',
+                    home / 'Applications/ActivityWatch.app/Contents/Resources']
+        layouts = ['aw_server/static'] + layouts
     elif system == 'Windows':
-        # Check Program Files and local app data
-        prog = os.environ.get('ProgramFiles', 'C:/Program Files')
-        prog_x86 = os.environ.get('ProgramFiles(x86)', 'C:/Program Files (x86)')
-        local = os.environ.get('LOCALAPPDATA', home)
-        roots = [Path(prog) / 'ActivityWatch' / 'aw-server',
-                 Path(prog_x86) / 'ActivityWatch' / 'aw-server',
-                 Path(local) / 'Programs' / 'activitywatch' / 'aw-server',
-                 home]
+        local = os.environ.get('LOCALAPPDATA', str(home))
+        installs = [Path(os.environ.get('ProgramFiles', 'C:/Program Files')) / 'ActivityWatch',
+                    Path(os.environ.get('ProgramFiles(x86)', 'C:/Program Files (x86)')) / 'ActivityWatch',
+                    Path(local) / 'Programs' / 'activitywatch']
     else:
-        roots = [home]
+        installs = [home / 'activitywatch', home / '.local/opt/activitywatch',
+                    Path('/opt/activitywatch'), Path('/usr/local/activitywatch'), Path('/usr/lib/activitywatch')]
+    candidates = [install / layout for install in installs for layout in layouts]
 
+    # aw-server on PATH: a bundle keeps aw_server/static next to the binary,
+    # a pip install keeps it in the package inside site-packages
+    executable = shutil.which('aw-server')
+    if executable:
+        bin_dir = Path(os.path.realpath(executable)).parent
+        candidates += [bin_dir / 'aw_server' / 'static', bin_dir / 'static',
+                       bin_dir.parent / 'aw-server' / 'aw_server' / 'static']
+        for lib in ('lib', 'Lib'):
+            candidates += sorted((bin_dir.parent / lib).glob('python3*/site-packages/aw_server/static'))
+        candidates += [bin_dir.parent / 'Lib' / 'site-packages' / 'aw_server' / 'static']
+    return candidates
+
+
+def _search_roots() -> List[Path]:
+    home = Path.home()
+    system = platform.system()
+    if system == 'Darwin':
+        return [Path("/Applications"), home / "Applications", Path("/opt"), Path("/usr/local"), home]
+    if system == 'Linux':
+        return [Path("/opt"), Path("/usr/local"), Path("/usr"), home]
+    if system == 'Windows':
+        local = os.environ.get('LOCALAPPDATA', home)
+        return [Path(os.environ.get('ProgramFiles', 'C:/Program Files')),
+                Path(os.environ.get('ProgramFiles(x86)', 'C:/Program Files (x86)')),
+                Path(local) / 'Programs', home]
+    return [home]
+
+
+def search_static(roots: List[Path], max_depth: int = SEARCH_MAX_DEPTH,
+                  workers: int = SEARCH_WORKERS) -> Optional[Path]:
+    """
+    Walk roots breadth-first with a pool of threads, at most max_depth levels
+    deep, skipping PRUNE_DIRS, hidden directories and symlinks; returns the
+    first aw-server static directory found and stops every worker.
+    """
+    pending = queue.Queue()
+    found: List[Path] = []
+    done = threading.Event()
+    # directories queued or being scanned; the walk is over when it drops to 0
+    outstanding = [0]
+    lock = threading.Lock()
+
+    def push(path: Path, depth: int):
+        with lock:
+            outstanding[0] += 1
+        pending.put((path, depth))
+
+    def worker():
+        while not done.is_set():
+            try:
+                path, depth = pending.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if done.is_set():
+                            break
+                        try:
+                            if not entry.is_dir(follow_symlinks=False):
+                                continue
+                        except OSError:
+                            continue
+                        if entry.name == 'static' and Path(path).name.lower() in ('aw_server', 'aw-server'):
+                            with lock:
+                                found.append(Path(entry.path))
+                            done.set()
+                            break
+                        if depth < max_depth and entry.name not in PRUNE_DIRS \
+                                and not (entry.name.startswith('.') and depth > 0):
+                            push(Path(entry.path), depth + 1)
+            except OSError:
+                pass
+            finally:
+                with lock:
+                    outstanding[0] -= 1
+                    if outstanding[0] == 0:
+                        done.set()
+
+    seen = set()
     for root in roots:
-        if not root or not Path(root).exists():
-            continue
-        try:
-            for static_dir in Path(root).rglob('static'):
-                if is_aw_server_static(static_dir):
-                    return static_dir.resolve()
-        except (PermissionError, OSError):
-            continue
-    return None
+        if root and Path(root).is_dir() and os.path.realpath(root) not in seen:
+            seen.add(os.path.realpath(root))
+            push(Path(root), 0)
+    if not seen:
+        return None
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return found[0].resolve() if found else None
 
-def backup_rebuild_copy(dist_dir: Path, static_dir: Path) -> bool:
+
+def find_aw_static(use_cache: bool = True) -> Optional[Path]:
     """
-    Backup the existing static_dir and replace it with dist_dir contents.
-    Returns True on success, False on error (restores backup if copy fails).
+    Locate the ActivityWatch server 'static' directory.
+
+    Tries the location found last time, then the known install locations
+    and aw-server on PATH, and only then a bounded parallel walk of the
+    usual install roots. A found location is cached for later runs.
+    Returns the Path if found, otherwise None.
     """
-    backup_dir = static_dir.parent / (static_dir.name + ".backup")
+    if use_cache:
+        cached = _load_cached_static()
+        if cached:
+            return cached
+
+    static_dir = next((c.resolve() for c in _install_candidates() if is_aw_server_static(c)), None)
+    if static_dir is None:
+        print("Searching for the ActivityWatch static directory...")
+        static_dir = search_static(_search_roots())
+    if static_dir is not None:
+        _save_cached_static(static_dir)
+    return static_dir
+
+MANIFEST_NAME = '.avas-manifest.json'
+# deploy_static results
+DEPLOYED = 'deployed'
+UNCHANGED = 'unchanged'
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(dist_dir: Path, skip_maps: bool = False) -> Dict[str, Dict]:
+    """{relative path: {"sha256", "size"}} for every file to deploy from dist_dir."""
+    manifest = {}
+    for root, dirs, files in os.walk(dist_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if skip_maps and name.endswith('.map'):
+                continue
+            path = Path(root) / name
+            rel = path.relative_to(dist_dir).as_posix()
+            manifest[rel] = {'sha256': _file_hash(path), 'size': path.stat().st_size}
+    return manifest
+
+
+def _read_manifest(static_dir: Path) -> Dict[str, Dict]:
     try:
-        if backup_dir.exists():
-            shutil.rmtree(backup_dir)
-        shutil.move(str(static_dir), str(backup_dir))
-        shutil.copytree(str(dist_dir), str(static_dir))
-        shutil.rmtree(backup_dir)
-        print("✅ Frontend deployed successfully.")
+        with open(static_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)['files']
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def _deployed_unchanged(static_dir: Path, rel: str, entry: Dict, deployed: Dict[str, Dict]) -> bool:
+    target = static_dir / rel
+    return deployed.get(rel) == entry and target.is_file() and target.stat().st_size == entry['size']
+
+
+# renameat2() flag from <linux/fs.h>; AT_FDCWD makes it resolve paths like rename()
+RENAME_EXCHANGE = 2
+AT_FDCWD = -100
+
+
+def _exchange(a: Path, b: Path) -> bool:
+    """
+    Atomically swap two existing paths with renameat2(RENAME_EXCHANGE).
+    Returns False where that is not available (not Linux, glibc < 2.28,
+    kernel < 3.15, or a filesystem without support); raises OSError for
+    any other failure.
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return False
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    if renameat2(AT_FDCWD, os.fsencode(str(a)), AT_FDCWD, os.fsencode(str(b)), RENAME_EXCHANGE) == 0:
         return True
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        return False
+    raise OSError(err, os.strerror(err), str(b))
+
+
+def _swap_in(new: Path, live: Path, old: Path) -> None:
+    """
+    Move new to live; whatever was at live ends up at old (replaced if present).
+
+    With RENAME_EXCHANGE the live path always points at a complete
+    directory. Without it, live is renamed away first, so for a moment
+    between the two renames the path does not exist.
+    """
+    if old.exists():
+        shutil.rmtree(old)
+    if live.exists():
+        if _exchange(new, live):
+            os.rename(new, old)
+            return
+        os.rename(live, old)
+    os.rename(new, live)
+
+
+def deploy_static(dist_dir: Path, static_dir: Path, skip_maps: bool = False,
+                  force: bool = False) -> Optional[str]:
+    """
+    Replace static_dir with the contents of dist_dir.
+
+    Files are compared by SHA-256 with the manifest written by the previous
+    deploy: unchanged files are hard-linked from the live directory into a
+    staging directory next to it, only changed files are copied. The staging
+    directory is then swapped in (_swap_in), so the server never sees a
+    half-copied directory; the replaced one is kept as <static>.previous.
+    On Linux the swap is a single atomic rename; elsewhere it takes two, and
+    a request arriving between them finds no static directory at all.
+    Returns DEPLOYED or UNCHANGED on success, None on error (the live
+    directory is left or put back as it was).
+    """
+    staging = static_dir.parent / (static_dir.name + '.staging')
+    previous = static_dir.parent / (static_dir.name + '.previous')
+    manifest = build_manifest(dist_dir, skip_maps)
+    deployed = {} if force else _read_manifest(static_dir)
+    if deployed == manifest:
+        print("✅ Frontend already up to date.")
+        return UNCHANGED
+
+    copied = linked = 0
+    try:
+        if staging.exists():
+            shutil.rmtree(staging)
+        for rel, entry in manifest.items():
+            target = staging / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if _deployed_unchanged(static_dir, rel, entry, deployed):
+                try:
+                    os.link(static_dir / rel, target)
+                    linked += 1
+                    continue
+                except OSError:
+                    pass
+            shutil.copy2(str(dist_dir / rel), str(target))
+            copied += 1
+        with open(staging / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump({'files': manifest}, f, indent=1)
+
+        _swap_in(staging, static_dir, previous)
     except Exception as e:
         print(f"❌ Deployment failed: {e}", file=sys.stderr)
-        if backup_dir.exists():
-            if static_dir.exists():
-                shutil.rmtree(static_dir)
-            shutil.move(str(backup_dir), str(static_dir))
+        if not static_dir.exists() and previous.exists():
+            os.rename(previous, static_dir)
             print("🔄 Restored original static directory.")
+        shutil.rmtree(staging, ignore_errors=True)
+        return None
+
+    removed = len(deployed.keys() - manifest.keys())
+    print(f"✅ Frontend deployed successfully: {copied} files copied, {linked} unchanged, {removed} removed.")
+    return DEPLOYED
+
+
+def rollback_static(static_dir: Path) -> bool:
+    """
+    Put <static>.previous back in place; the rejected directory is kept as
+    <static>.failed for inspection. Returns False if there is nothing to
+    roll back to.
+    """
+    previous = static_dir.parent / (static_dir.name + '.previous')
+    failed = static_dir.parent / (static_dir.name + '.failed')
+    if not previous.is_dir():
+        print("❌ No previous static directory to roll back to.", file=sys.stderr)
         return False
+    _swap_in(previous, static_dir, failed)
+    print(f"🔄 Rolled back to the previous frontend (rejected one kept in {failed.name}).")
+    return True
+
+
+def _probe(url: str, expected: Optional[bytes], timeout: float) -> bool:
+    """One readiness check: url answers 200 and, if given, serves exactly expected."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            if resp.status != 200:
+                return False
+            return expected is None or resp.read() == expected
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def wait_until_ready(url: str = 'http://localhost:5600', expected_index: Optional[bytes] = None,
+                     deadline: float = 60, initial_delay: float = 0.25, max_delay: float = 4,
+                     process: Optional[subprocess.Popen] = None) -> Optional[float]:
+    """
+    Poll the server until it is up, with exponential backoff.
+
+    Ready means GET <url>/ returns 200 (with expected_index as body when
+    given) and GET <url>/api/0/info returns 200. aw-server reads index.html
+    from disk on every request, so an old server still running answers both
+    with the new files; pass the restarted server as process and it must
+    also still be running, otherwise the probes may be answered by the old
+    one while the new one failed (e.g. to bind the port).
+
+    Returns:
+        seconds until the server was ready, or None if it was not by the
+        deadline or process exited
+    """
+    base = url.rstrip('/')
+    started = time.monotonic()
+    delay = initial_delay
+    while True:
+        if process is not None and process.poll() is not None:
+            print(f"❌ The restarted aw-server exited with code {process.returncode}.", file=sys.stderr)
+            return None
+        if _probe(base + '/', expected_index, timeout=2) and _probe(base + '/api/0/info', None, timeout=2):
+            if process is None or process.poll() is None:
+                return time.monotonic() - started
+            continue
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+# text assets worth precompressing, and the smallest file worth it
+COMPRESSIBLE = ('.js', '.css', '.html', '.json', '.svg', '.txt', '.map', '.webmanifest')
+MIN_COMPRESS_SIZE = 1024
+ASSET_MANIFEST_NAME = 'asset-manifest.json'
+_SOURCE_MAP_COMMENT = re.compile(rb'\n?(//# sourceMappingURL=\S+|/\*# sourceMappingURL=\S+ \*/)\s*$')
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built without it
+    brotli = None
+
+
+def _integrity(data: bytes) -> str:
+    """Subresource Integrity value (sha384) of data."""
+    return 'sha384-' + base64.b64encode(hashlib.sha384(data).digest()).decode('ascii')
 
-def restart_activitywatch() -> None:
+
+def _write_if_changed(path: Path, data: bytes) -> None:
+    if path.is_file() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def package_dist(dist_dir: Path, out_dir: Path, maps: str = 'separate', level: int = 9) -> Dict:
+    """
+    Build a deployable copy of dist_dir in out_dir with precompressed variants.
+
+    Every text asset gets a .gz (and a .br when the brotli module is
+    installed) next to it if that is smaller. Source maps are kept (maps=
+    'keep'), left out together with their sourceMappingURL comments
+    ('strip'), or moved to <out_dir>-maps for debugging ('separate').
+    out_dir/asset-manifest.json lists each asset with its SRI integrity
+    hash and sizes; every variant is decompressed and checked against that
+    hash before it is recorded. Variants of unchanged files are reused from
+    the previous run.
+
+    Returns:
+        totals: {"files", "raw", "gzip", "br"} in bytes over the compressible assets
+    """
+    if maps not in ('keep', 'strip', 'separate'):
+        raise ValueError(f"maps must be keep, strip or separate, not {maps!r}")
+    maps_dir = out_dir.parent / (out_dir.name + '-maps')
+    try:
+        with open(out_dir / ASSET_MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            previous = json.load(f)['assets']
+    except (OSError, ValueError, KeyError, TypeError):
+        previous = {}
+
+    assets: Dict[str, Dict] = {}
+    written = {ASSET_MANIFEST_NAME}
+    totals = {'files': 0, 'raw': 0, 'gzip': 0, 'br': 0}
+    for root, dirs, files in os.walk(dist_dir):
+        dirs.sort()
+        for name in sorted(files):
+            source = Path(root) / name
+            rel = source.relative_to(dist_dir).as_posix()
+            data = source.read_bytes()
+            if name.endswith('.map') and maps != 'keep':
+                if maps == 'separate':
+                    _write_if_changed(maps_dir / rel, data)
+                continue
+            if maps != 'keep' and name.endswith(('.js', '.css')):
+                data = _SOURCE_MAP_COMMENT.sub(b'\n', data)
+
+            _write_if_changed(out_dir / rel, data)
+            written.add(rel)
+            entry = {'integrity': _integrity(data), 'size': len(data)}
+            if name.endswith(COMPRESSIBLE) and len(data) >= MIN_COMPRESS_SIZE:
+                old = previous.get(rel, {})
+                for encoding, suffix, compress, decompress in _encoders(level):
+                    variant = out_dir / (rel + suffix)
+                    if old.get('integrity') == entry['integrity'] and encoding in old and variant.is_file():
+                        entry[encoding] = old[encoding]
+                    else:
+                        packed = compress(data)
+                        if len(packed) >= len(data) * 0.95:
+                            continue
+                        if _integrity(decompress(packed)) != entry['integrity']:
+                            raise RuntimeError(f"{encoding} variant of {rel} does not match its source")
+                        _write_if_changed(variant, packed)
+                        entry[encoding] = len(packed)
+                    written.add(rel + suffix)
+                totals['files'] += 1
+                totals['raw'] += len(data)
+                totals['gzip'] += entry.get('gzip', len(data))
+                totals['br'] += entry.get('br', entry.get('gzip', len(data)))
+            assets[rel] = entry
+
+    # files of earlier builds that are gone from dist
+    for root, _, files in os.walk(out_dir):
+        for name in files:
+            path = Path(root) / name
+            if path.relative_to(out_dir).as_posix() not in written:
+                path.unlink()
+    _write_if_changed(out_dir / ASSET_MANIFEST_NAME,
+                      json.dumps({'assets': assets}, indent=1, sort_keys=True).encode('utf-8'))
+    return totals
+
+
+def _encoders(level: int):
+    yield 'gzip', '.gz', lambda data: gzip.compress(data, compresslevel=level, mtime=0), gzip.decompress
+    if brotli is not None:
+        yield 'br', '.br', lambda data: brotli.compress(data, quality=11), brotli.decompress
+
+
+def print_savings(totals: Dict) -> None:
+    raw = totals['raw'] or 1
+    print(f"Precompressed {totals['files']} assets: {totals['raw'] / 1024:.0f} KiB raw, "
+          f"{totals['gzip'] / 1024:.0f} KiB gzip ({100 - 100 * totals['gzip'] / raw:.0f}% smaller)"
+          + (f", {totals['br'] / 1024:.0f} KiB brotli ({100 - 100 * totals['br'] / raw:.0f}% smaller)"
+             if brotli is not None else " (install brotli for .br variants)"))
+
+
+def restart_activitywatch() -> Optional[subprocess.Popen]:
     """
     Restart ActivityWatch by killing existing processes and starting the server/client.
+
+    Returns:
+        the started aw-server process, or None where it is not started
+        directly (macOS app bundle) or could not be started
     """
+    server = None
     system = platform.system()
     if system == 'Windows':
         subprocess.call(["taskkill", "/F", "/IM", "aw-server.exe"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -95,7 +549,7 @@ def restart_activitywatch() -> None:
         prog_local = os.environ.get('LOCALAPPDATA', os.environ.get('ProgramFiles', r'C:\Program Files'))
         aw_server = Path(prog_local) / 'Programs' / 'activitywatch' / 'aw-server.exe'
         if aw_server.exists():
-            subprocess.Popen([str(aw_server)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            server = subprocess.Popen([str(aw_server)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
         aw_client = Path(prog_local) / 'Programs' / 'activitywatch' / 'ActivityWatch.exe'
         if aw_client.exists():
@@ -104,41 +558,83 @@ def restart_activitywatch() -> None:
         print("🔁 ActivityWatch (Windows) 已重启。")
 
     else:
-        # Kill any running ActivityWatch processes
+        # Kill any running ActivityWatch processes; a pip-installed aw-server
+        # has no "activitywatch" in its command line
         subprocess.call(["pkill", "-f", "activitywatch"], stderr=subprocess.DEVNULL)
+        subprocess.call(["pkill", "-x", "aw-server"], stderr=subprocess.DEVNULL)
         if system == 'Darwin':
             aw_app = Path("/Applications/ActivityWatch.app")
             if aw_app.exists():
                 subprocess.Popen(["open", "-a", "ActivityWatch"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         elif system == 'Linux':
-            subprocess.Popen(["aw-server"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    print("🔁 ActivityWatch restarted.")
+            try:
+                server = subprocess.Popen(["aw-server"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                print(f"❌ Could not start aw-server: {e}", file=sys.stderr)
+    print("🔁 ActivityWatch restart requested.")
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deploy the AVAS web UI into ActivityWatch")
+    parser.add_argument('--dist', type=Path, default=Path(__file__).parent / "dist",
+                        help="built frontend to deploy (default: dist next to this script)")
+    parser.add_argument('--static', type=Path, help="aw-server static directory (default: search for it)")
+    parser.add_argument('--skip-maps', action='store_true', help="do not deploy .map source maps")
+    parser.add_argument('--package', action='store_true',
+                        help="deploy a precompressed build (gzip/brotli variants, asset manifest) "
+                             "made in build/webui instead of dist as is")
+    parser.add_argument('--maps', choices=('keep', 'strip', 'separate'), default='separate',
+                        help="source maps in the packaged build (default: separate, into build/webui-maps)")
+    parser.add_argument('--force', action='store_true', help="copy every file, ignoring the last manifest")
+    parser.add_argument('--rescan', action='store_true', help="ignore the cached static directory location")
+    parser.add_argument('--no-restart', action='store_true', help="do not restart ActivityWatch")
+    parser.add_argument('--ready-url', default='http://localhost:5600', help="aw-server URL probed after the restart")
+    parser.add_argument('--ready-timeout', type=float, default=60,
+                        help="seconds the server has to come up healthy (default 60)")
+    parser.add_argument('--no-rollback', action='store_true',
+                        help="keep the new frontend even if the server does not come up healthy")
+    args = parser.parse_args(argv)
 
-def main():
-    dist_dir = Path(__file__).parent / "dist"
+    dist_dir = args.dist
     if not dist_dir.exists():
         print(f"Error: dist directory not found at {dist_dir}", file=sys.stderr)
         sys.exit(1)
 
-    static_dir = find_aw_static()
+    static_dir = args.static or find_aw_static(use_cache=not args.rescan)
     if not static_dir:
         print("Error: Could not locate ActivityWatch static directory.", file=sys.stderr)
         sys.exit(1)
 
+    if args.package:
+        build_dir = Path(__file__).parent / "build" / "webui"
+        print_savings(package_dist(dist_dir, build_dir, maps=args.maps))
+        dist_dir = build_dir
+
     print(f"Found static directory: {static_dir}")
-    if not backup_rebuild_copy(dist_dir, static_dir):
+    result = deploy_static(dist_dir, static_dir, skip_maps=args.skip_maps, force=args.force)
+    if not result:
         sys.exit(1)
+    if args.no_restart:
+        print(f"Deployment complete. Restart ActivityWatch and visit {args.ready_url} to verify.")
+        return
+
+    index = static_dir / 'index.html'
+    server = restart_activitywatch()
+    elapsed = wait_until_ready(args.ready_url, index.read_bytes() if index.is_file() else None,
+                               deadline=args.ready_timeout, process=server)
+    if elapsed is not None:
+        print(f"✅ ActivityWatch ready after {elapsed:.1f}s. Deployment complete: {args.ready_url}")
+        return
 
-    restart_activitywatch()
-    print("Deployment complete. Visit http://localhost:5600 to verify.")
+    print(f"❌ ActivityWatch did not come up healthy within {args.ready_timeout:.0f}s.", file=sys.stderr)
+    if result == DEPLOYED and not args.no_rollback and rollback_static(static_dir):
+        server = restart_activitywatch()
+        elapsed = wait_until_ready(args.ready_url, deadline=args.ready_timeout, process=server)
+        if elapsed is not None:
+            print(f"ActivityWatch is back on the previous frontend after {elapsed:.1f}s.")
+        else:
+            print("❌ ActivityWatch is not healthy on the previous frontend either.", file=sys.stderr)
+    sys.exit(1)
 
 if __name__ == '__main__':
     main()
-
-
-
-
-
-
-
-
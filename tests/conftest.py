@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# before core.config is imported: defaults for anything outliving a test's
+# patches (late timer threads, spawned worker processes) stay out of data/ too
+_SESSION_DATA = tempfile.mkdtemp(prefix="avas-tests-")
+os.environ.setdefault("TRACE_LOG_FILE", os.path.join(_SESSION_DATA, "logs", "trace.jsonl"))
+os.environ.setdefault("STATE_DB_FILE", os.path.join(_SESSION_DATA, "directory_state.db"))
+os.environ.setdefault("NOTIFY_SPOOL_DIR", os.path.join(_SESSION_DATA, "notification_spool"))
+os.environ.setdefault("PENDING_SURVEYS_FILE", os.path.join(_SESSION_DATA, "pending_surveys.json"))
+os.environ.setdefault("JOB_QUEUE_FILE", os.path.join(_SESSION_DATA, "jobs.db"))
+
+from core import tracing  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_data(tmp_path, monkeypatch):
+    """Point the trace log, state DBs, notification spool and survey store of each test at tmp_path."""
+    data = tmp_path / "data"
+    tracing.stop_trace_logging()
+    monkeypatch.setattr("core.tracing.TRACE_LOG_FILE", str(data / "logs" / "trace.jsonl"))
+    for module in ("core.config", "core.offline_handler", "core.tenants"):
+        monkeypatch.setattr(f"{module}.STATE_DB_FILE", data / "directory_state.db")
+    monkeypatch.setattr("core.tenants.PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr("core.dispatcher.NOTIFY_SPOOL_DIR", data / "notification_spool")
+    monkeypatch.setattr("core.reminder.PENDING_SURVEYS_FILE", data / "pending_surveys.json")
+    monkeypatch.setattr("core.monitor.JOB_QUEUE_FILE", data / "jobs.db")
+    yield data
+    tracing.stop_trace_logging()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_SESSION_DATA, ignore_errors=True)
@@ -0,0 +1,123 @@
+"""
+Local stand-in for the Google Apps Script endpoint.
+
+Serves the three calls AVAS makes against SCRIPT_URL:
+- POST page batch (call_appscript_batch): creates a page, returns its URL
+- POST {"action": "status"} (get_survey_statuses): completion flags by page id
+- GET ?id=<page id>: the survey page, blank once the survey is completed
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import urlsplit, parse_qs
+
+SURVEY_HTML = (
+    "<html><head><title>Video survey</title></head><body>"
+    "<form>" + "<p>Please answer the question about this video.</p>" * 10 +
+    "<button type='submit'>Submit</button></form></body></html>"
+)
+BLANK_HTML = "<html><body></body></html>"
+
+
+class FakeAppsScriptServer:
+    """Threaded HTTP server on 127.0.0.1 with an in-memory page table."""
+
+    def __init__(self, status_enabled: bool = True):
+        """
+        Args:
+            status_enabled: answer bulk status calls; when False they fail with 404
+                            like an older deployment of the script would
+        """
+        self.status_enabled = status_enabled
+        self.pages: Dict[str, bool] = {}  # page id -> completed
+        self.batches: List[dict] = []
+        self.batch_pages: Dict[str, dict] = {}  # page URL -> the batch that created it
+        self.requests: List[str] = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/exec"
+
+    def page_url(self, page_id: str) -> str:
+        return f"{self.url}?id={page_id}"
+
+    def add_page(self, completed: bool = False) -> str:
+        """Create a page directly and return its URL."""
+        with self._lock:
+            page_id = str(self._next_id)
+            self._next_id += 1
+            self.pages[page_id] = completed
+        return self.page_url(page_id)
+
+    def complete(self, page_id: str):
+        with self._lock:
+            self.pages[page_id] = True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: str, content_type: str = "text/plain"):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append("GET")
+                    page_id = (parse_qs(urlsplit(self.path).query).get("id") or [None])[0]
+                    completed = server.pages.get(page_id)
+                if completed is None:
+                    self._reply(404, "not found")
+                else:
+                    self._reply(200, BLANK_HTML if completed else SURVEY_HTML, "text/html")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if payload.get("action") == "status":
+                    with server._lock:
+                        server.requests.append("status")
+                        statuses = {pid: server.pages[pid] for pid in payload.get("pageIds", [])
+                                    if pid in server.pages}
+                    if not server.status_enabled:
+                        self._reply(404, "unknown action")
+                        return
+                    self._reply(200, json.dumps({"statuses": statuses}), "application/json")
+                    return
+                page_url = server.add_page()
+                with server._lock:
+                    server.requests.append("batch")
+                    server.batches.append(payload)
+                    server.batch_pages[page_url] = payload
+                self._reply(200, page_url)
+
+        return Handler
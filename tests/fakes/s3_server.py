@@ -0,0 +1,198 @@
+"""
+Local stand-in for the S3 API, enough for boto3's upload_file.
+
+Serves the calls an upload makes against S3_ENDPOINT_URL with path-style
+addressing (/<bucket>/<key>):
+- PUT object, with a plain or aws-chunked (streaming checksum) body
+- multipart uploads: POST ?uploads, PUT ?partNumber&uploadId, POST ?uploadId
+- HEAD / GET of a stored object
+Objects are kept in memory unless keep_data is False, then only their size is.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+
+
+def decode_aws_chunked(data: bytes) -> bytes:
+    """Payload of an aws-chunked body: "<hex size>[;chunk-signature=...]\\r\\n<data>\\r\\n" ... "0\\r\\n<trailers>"."""
+    payload = []
+    pos = 0
+    while True:
+        line_end = data.index(b"\r\n", pos)
+        size = int(data[pos:line_end].split(b";")[0], 16)
+        if size == 0:
+            return b"".join(payload)
+        start = line_end + 2
+        payload.append(data[start:start + size])
+        pos = start + size + 2
+
+
+class FakeS3Server:
+    """Threaded HTTP server on 127.0.0.1 with an in-memory object table."""
+
+    def __init__(self, keep_data: bool = True, latency: float = 0.0):
+        """
+        Args:
+            keep_data: keep object bodies (False: only sizes, for large benchmark runs)
+            latency: seconds added to every request, to model a remote endpoint
+        """
+        self.keep_data = keep_data
+        self.latency = latency
+        # (bucket, key) -> body (b"" without keep_data)
+        self.objects: Dict[Tuple[str, str], bytes] = {}
+        self.sizes: Dict[Tuple[str, str], int] = {}
+        # (bucket, key, completed at) in completion order
+        self.uploads: List[Tuple[str, str, float]] = []
+        self.requests: List[str] = []
+        self._parts: Dict[str, Dict[int, bytes]] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def received_bytes(self) -> int:
+        with self._lock:
+            return sum(self.sizes.values())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _store(self, bucket: str, key: str, body: bytes):
+        with self._lock:
+            self.objects[(bucket, key)] = body if self.keep_data else b""
+            self.sizes[(bucket, key)] = len(body)
+            self.uploads.append((bucket, key, time.time()))
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes = b"", headers: Dict[str, str] = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def _target(self):
+                parts = urlsplit(self.path)
+                bucket, _, key = unquote(parts.path).lstrip("/").partition("/")
+                return bucket, key, parse_qs(parts.query, keep_blank_values=True)
+
+            def _body(self) -> bytes:
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                streaming = self.headers.get("x-amz-content-sha256", "").startswith("STREAMING-")
+                if streaming or "aws-chunked" in self.headers.get("Content-Encoding", ""):
+                    data = decode_aws_chunked(data)
+                return data
+
+            def _begin(self, name: str):
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.requests.append(name)
+
+            def do_PUT(self):
+                bucket, key, query = self._target()
+                body = self._body()
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if "uploadId" in query:
+                    self._begin("upload_part")
+                    with server._lock:
+                        parts = server._parts.get(query["uploadId"][0])
+                        if parts is None:
+                            self._reply(404)
+                            return
+                        parts[int(query["partNumber"][0])] = body
+                else:
+                    self._begin("put_object")
+                    server._store(bucket, key, body)
+                self._reply(200, headers={"ETag": etag})
+
+            def do_POST(self):
+                bucket, key, query = self._target()
+                self._body()
+                if "uploads" in query:
+                    self._begin("create_multipart_upload")
+                    upload_id = uuid.uuid4().hex
+                    with server._lock:
+                        server._parts[upload_id] = {}
+                    self._reply(200, (
+                        "<InitiateMultipartUploadResult>"
+                        f"<Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId>"
+                        "</InitiateMultipartUploadResult>"
+                    ).encode("utf-8"), {"Content-Type": "application/xml"})
+                elif "uploadId" in query:
+                    self._begin("complete_multipart_upload")
+                    with server._lock:
+                        parts = server._parts.pop(query["uploadId"][0], None)
+                    if parts is None:
+                        self._reply(404)
+                        return
+                    server._store(bucket, key, b"".join(parts[n] for n in sorted(parts)))
+                    self._reply(200, (
+                        "<CompleteMultipartUploadResult>"
+                        f"<Bucket>{bucket}</Bucket><Key>{key}</Key><ETag>\"{uuid.uuid4().hex}-{len(parts)}\"</ETag>"
+                        "</CompleteMultipartUploadResult>"
+                    ).encode("utf-8"), {"Content-Type": "application/xml"})
+                else:
+                    self._reply(400)
+
+            def do_DELETE(self):
+                _, _, query = self._target()
+                self._begin("abort_multipart_upload")
+                with server._lock:
+                    server._parts.pop((query.get("uploadId") or [""])[0], None)
+                self._reply(204)
+
+            def do_GET(self):
+                bucket, key, _ = self._target()
+                self._begin("get_object")
+                with server._lock:
+                    body = server.objects.get((bucket, key))
+                if body is None:
+                    self._reply(404)
+                else:
+                    self._reply(200, body, {"Content-Type": "application/octet-stream"})
+
+            def do_HEAD(self):
+                bucket, key, _ = self._target()
+                self._begin("head_object")
+                with server._lock:
+                    size = server.sizes.get((bucket, key))
+                if size is None:
+                    self._reply(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+
+        return Handler
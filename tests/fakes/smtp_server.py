@@ -0,0 +1,112 @@
+"""
+Local stand-in for the SMTP relay.
+
+Speaks enough SMTP for smtplib (EHLO/HELO, optional AUTH, MAIL, RCPT,
+DATA, NOOP, RSET, QUIT) without TLS, so the notifier has to be used with
+SMTP_STARTTLS=0. Every accepted message is kept with its arrival time.
+"""
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+from email.message import Message
+from typing import List, Tuple
+
+
+class FakeSMTPServer:
+    """Threaded SMTP sink on 127.0.0.1."""
+
+    def __init__(self):
+        # (received at, envelope recipients, parsed message)
+        self.messages: List[Tuple[float, List[str], Message]] = []
+        self.sessions = 0
+        self._lock = threading.Lock()
+        self._received = threading.Condition(self._lock)
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        """Wait until at least count messages have arrived."""
+        with self._received:
+            return self._received.wait_for(lambda: len(self.messages) >= count, timeout)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                self.wfile.write(line.encode("ascii") + b"\r\n")
+
+            def handle(self):
+                with server._lock:
+                    server.sessions += 1
+                recipients: List[str] = []
+                self.reply("220 localhost fake SMTP")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode("utf-8", "replace").strip()
+                    verb = command.split(" ", 1)[0].upper()
+                    if verb == "EHLO":
+                        self.reply("250-localhost")
+                        self.reply("250 AUTH PLAIN LOGIN")
+                    elif verb in ("HELO", "NOOP", "MAIL"):
+                        self.reply("250 OK")
+                    elif verb == "AUTH":
+                        self.reply("235 Authentication successful")
+                    elif verb == "RCPT":
+                        recipients.append(command.partition(":")[2].strip().strip("<>"))
+                        self.reply("250 OK")
+                    elif verb == "RSET":
+                        recipients = []
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        self._receive(recipients)
+                        recipients = []
+                        self.reply("250 OK queued")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+            def _receive(self, recipients: List[str]):
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                    # undo dot-stuffing
+                    lines.append(line[1:] if line.startswith(b"..") else line)
+                message = message_from_bytes(b"".join(lines))
+                with server._received:
+                    server.messages.append((time.time(), list(recipients), message))
+                    server._received.notify_all()
+
+        return Handler
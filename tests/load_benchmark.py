@@ -0,0 +1,439 @@
+"""
+End-to-end load benchmark of the AVAS pipeline against local stand-ins.
+
+Synthesizes test videos with ffmpeg's testsrc, drops them into a temporary
+watch directory at a given arrival rate and runs the real MonitorCore /
+VideoHandler pipeline, with S3, the Apps Script endpoint and the SMTP relay
+replaced by the servers in tests/fakes. Reports file-to-notification
+latency (drop of the file until the email naming it reaches the SMTP
+stand-in), throughput, CPU and disk use, and the per-stage trace summary.
+
+Usage:
+    python -m tests.load_benchmark --videos 40 --rate 20 --durations 10,60 \\
+        --formats mp4:libx264,mov:libx264,avi:mpeg4 --json bench.json --max-p95 90
+
+Run it in a fresh process: the AVAS settings are read from the environment
+when core is first imported, so the benchmark sets them before that.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import datetime
+import threading
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tests.fakes.appscript_server import FakeAppsScriptServer
+from tests.fakes.s3_server import FakeS3Server
+from tests.fakes.smtp_server import FakeSMTPServer
+
+# audio codec muxed with each container
+AUDIO_CODECS = {".mp4": "aac", ".mov": "aac", ".avi": "pcm_s16le"}
+BENCH_BUCKET = "avas-bench"
+BENCH_RECIPIENT = "bench@example.com"
+_URL_IN_BODY = re.compile(r"<([^<>\s]+)>")
+
+
+def parse_formats(value: str) -> List[Tuple[str, str]]:
+    """ "mp4:libx264,avi:mpeg4" -> [(".mp4", "libx264"), (".avi", "mpeg4")]"""
+    formats = []
+    for item in value.split(","):
+        ext, _, codec = item.strip().partition(":")
+        ext = "." + ext.lstrip(".").lower()
+        if ext not in AUDIO_CODECS or not codec:
+            raise ValueError(f"invalid format {item!r}, expected one of mp4/mov/avi:<ffmpeg video codec>")
+        formats.append((ext, codec))
+    return formats
+
+
+def arrival_times(count: int, per_minute: float, poisson: bool = False, seed: Optional[int] = None) -> List[float]:
+    """Offsets in seconds at which the files are dropped, evenly spaced or as a Poisson process."""
+    if per_minute <= 0:
+        return [0.0] * count
+    rng = random.Random(seed)
+    offsets = []
+    now = 0.0
+    for index in range(count):
+        if index:
+            now += rng.expovariate(per_minute / 60) if poisson else 60 / per_minute
+        offsets.append(now)
+    return offsets
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def synthesize_videos(out_dir: Path, durations: List[float], formats: List[Tuple[str, str]], count: int,
+                      size: str = "640x360", fps: int = 25, jobs: int = 4) -> List[Path]:
+    """
+    Render count testsrc videos, cycling through durations and formats.
+
+    Files are named like recordings (YYYY-MM-DDTHH-MM-SS-ffffff) so the
+    pipeline extracts a timestamp from them as it does in production.
+
+    Raises:
+        subprocess.CalledProcessError: if ffmpeg fails, e.g. on an unknown codec
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = datetime.datetime.now().replace(microsecond=0)
+    specs = []
+    for index in range(count):
+        duration = durations[index % len(durations)]
+        ext, codec = formats[index % len(formats)]
+        stamp = (start + datetime.timedelta(seconds=index)).strftime("%Y-%m-%dT%H-%M-%S")
+        specs.append((out_dir / f"{stamp}-{index:06d}{ext}", duration, codec))
+
+    def render(spec):
+        path, duration, codec = spec
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc=duration={duration}:size={size}:rate={fps}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+            "-c:v", codec, "-pix_fmt", "yuv420p", "-c:a", AUDIO_CODECS[path.suffix], "-shortest",
+            str(path)
+        ], check=True, stdin=subprocess.DEVNULL)
+        return path
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        return list(pool.map(render, specs))
+
+
+class ResourceSampler:
+    """
+    Sample CPU and disk use in the background.
+
+    CPU is this process plus its finished children (ffmpeg, ffprobe, worker
+    processes), from os.times(), in percent of one core. Disk figures come
+    from /proc/diskstats and cover the whole machine; they are left out where
+    that file does not exist.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.cpu_peak = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start: Optional[Tuple[float, float, Dict[str, Tuple[int, int, int]]]] = None
+        self._end = self._start
+
+    @staticmethod
+    def _cpu() -> float:
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+
+    @staticmethod
+    def _disks() -> Dict[str, Tuple[int, int, int]]:
+        """device -> (sectors read, sectors written, ms busy) for whole disks."""
+        disks = {}
+        try:
+            with open("/proc/diskstats", "r") as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 13:
+                        continue
+                    name = fields[2]
+                    if name.startswith(("loop", "ram")) or not os.path.exists(f"/sys/block/{name}"):
+                        continue
+                    disks[name] = (int(fields[5]), int(fields[9]), int(fields[12]))
+        except OSError:
+            pass
+        return disks
+
+    def _sample(self):
+        return time.monotonic(), self._cpu(), self._disks()
+
+    def start(self):
+        self._start = self._end = self._sample()
+        self._thread = threading.Thread(target=self._run, name="bench-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        previous = self._start
+        while not self._stop.wait(self.interval):
+            current = self._sample()
+            elapsed = current[0] - previous[0]
+            if elapsed > 0:
+                self.cpu_peak = max(self.cpu_peak, (current[1] - previous[1]) / elapsed * 100)
+            previous = current
+
+    def stop(self) -> Dict:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._end = self._sample()
+        return self.summary()
+
+    def summary(self) -> Dict:
+        (t0, cpu0, disks0), (t1, cpu1, disks1) = self._start, self._end
+        wall = max(t1 - t0, 1e-9)
+        result = {
+            "cpu_avg_pct": (cpu1 - cpu0) / wall * 100,
+            "cpu_peak_pct": self.cpu_peak,
+            "cpu_count": os.cpu_count(),
+        }
+        if disks1:
+            deltas = {
+                name: tuple(end - start for start, end in zip(disks0.get(name, (0, 0, 0)), disks1[name]))
+                for name in disks1
+            }
+            busiest = max(deltas, key=lambda name: deltas[name][2])
+            result.update({
+                "disk_read_mib": sum(d[0] for d in deltas.values()) * 512 / 2 ** 20,
+                "disk_written_mib": sum(d[1] for d in deltas.values()) * 512 / 2 ** 20,
+                "disk_busiest": busiest,
+                "disk_busy_pct": deltas[busiest][2] / (wall * 1000) * 100,
+            })
+        return result
+
+
+def match_notifications(messages, batch_pages: Dict[str, dict]) -> Dict[str, float]:
+    """
+    First notification time per video name.
+
+    Notification emails list page URLs; the Apps Script stand-in knows which
+    videos each page was created for.
+
+    Args:
+        messages: (received at, recipients, message) from FakeSMTPServer
+        batch_pages: page URL -> batch payload from FakeAppsScriptServer
+    """
+    notified: Dict[str, float] = {}
+    for received_at, _, message in list(messages):
+        body = message.get_payload(decode=True) or b""
+        for url in _URL_IN_BODY.findall(body.decode("utf-8", "replace")):
+            for name in (batch_pages.get(url) or {}).get("videoNames", []):
+                if name not in notified or received_at < notified[name]:
+                    notified[name] = received_at
+    return notified
+
+
+def _bench_environment(root: Path, s3: FakeS3Server, appscript: FakeAppsScriptServer,
+                       smtp: FakeSMTPServer, args) -> Dict[str, str]:
+    """Settings pointing AVAS at the stand-ins and keeping its state files under root."""
+    env = {
+        "S3_ENDPOINT_URL": s3.url,
+        "S3_BUCKET_NAME": BENCH_BUCKET,
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_REGION", "eu-north-1"),
+        "SCRIPT_URL": appscript.url,
+        "SMTP_SERVER": smtp.host,
+        "SMTP_PORT": str(smtp.port),
+        "SMTP_STARTTLS": "0",
+        "SMTP_USERNAME": "",
+        "SMTP_PASSWORD": "",
+        "FROM_EMAIL": "avas@example.com",
+        "RECIPIENT_EMAIL": BENCH_RECIPIENT,
+        "SURVEY_JSON_PATH": str(root / "surveys" / "questions.json"),
+        "SURVEY_RULES_FILE": str(root / "surveys" / "rules.json"),
+        "NOTIFY_SPOOL_DIR": str(root / "data" / "notification_spool"),
+        "STATE_DB_FILE": str(root / "data" / "directory_state.db"),
+        "JOB_QUEUE_FILE": str(root / "data" / "jobs.db"),
+        "PENDING_SURVEYS_FILE": str(root / "data" / "pending_surveys.json"),
+        "TRACE_LOG_FILE": str(root / "data" / "trace.jsonl"),
+        "WEBHOOK_PORT": "0",
+        "METRICS_PORT": "0",
+        "CONTROL_PORT": "0",
+        "LEASE_ENABLED": "0",
+        "TENANTS_FILE": "",
+        "WORKER_PROCESSES": str(args.workers),
+    }
+    if args.batch_interval is not None:
+        env["BATCH_INTERVAL"] = str(args.batch_interval)
+    if args.digest_window is not None:
+        env["NOTIFY_DIGEST_WINDOW"] = str(args.digest_window)
+    return env
+
+
+def run_benchmark(args) -> Dict:
+    """Synthesize, drop and measure; returns the results (see format_report)."""
+    if any(name == "core" or name.startswith("core.") for name in sys.modules):
+        raise RuntimeError("core is already imported; run the benchmark in a fresh process")
+    for tool in ("ffmpeg", "ffprobe"):
+        if shutil.which(tool) is None:
+            raise RuntimeError(f"{tool} not found on PATH")
+
+    root = Path(tempfile.mkdtemp(prefix="avas-bench-"))
+    sources = root / "sources"
+    watch_dir = root / "watch"
+    watch_dir.mkdir()
+    (root / "surveys").mkdir()
+    (root / "surveys" / "questions.json").write_text(json.dumps({"title": "Benchmark survey"}))
+
+    print(f"Synthesizing {args.videos} videos in {sources}")
+    videos = synthesize_videos(sources, args.durations, args.formats, args.videos, args.size, args.fps, args.jobs)
+    offsets = arrival_times(len(videos), args.rate, args.poisson, args.seed)
+
+    s3 = FakeS3Server(keep_data=False, latency=args.s3_latency).start()
+    appscript = FakeAppsScriptServer().start()
+    smtp = FakeSMTPServer().start()
+    os.environ.update(_bench_environment(root, s3, appscript, smtp, args))
+
+    from core.monitor import MonitorCore
+    from core.trace_summary import summarize, format_summary
+
+    log_path = root / "avas.log"
+    dropped: Dict[str, float] = {}
+    monitor = MonitorCore()
+    sampler = ResourceSampler()
+    try:
+        with open(log_path, "w", encoding="utf-8") as log, \
+                (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(log)):
+            monitor.start(str(watch_dir), callback=None, workers=args.workers)
+            sampler.start()
+            started = time.time()
+            for video, offset in zip(videos, offsets):
+                delay = started + offset - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                dropped[video.name] = time.time()
+                shutil.copyfile(video, watch_dir / video.name)
+
+            deadline = time.time() + args.timeout
+            notified: Dict[str, float] = {}
+            while time.time() < deadline:
+                notified = match_notifications(smtp.messages, dict(appscript.batch_pages))
+                if all(name in notified for name in dropped):
+                    break
+                time.sleep(0.2)
+            resources = sampler.stop()
+            monitor.stop()
+    finally:
+        if monitor.running:
+            monitor.stop()
+        s3.stop()
+        appscript.stop()
+        smtp.stop()
+
+    latencies = sorted(notified[name] - dropped[name] for name in dropped if name in notified)
+    results = {
+        "videos": len(dropped),
+        "notified": len(latencies),
+        "missing": sorted(name for name in dropped if name not in notified),
+        "durations": args.durations,
+        "formats": [f"{ext[1:]}:{codec}" for ext, codec in args.formats],
+        "rate_per_minute": args.rate,
+        "workers": args.workers,
+        "emails": len(smtp.messages),
+        "uploaded_mib": s3.received_bytes() / 2 ** 20,
+        "log": str(log_path),
+    }
+    if latencies:
+        span = max(notified.values()) - min(dropped.values())
+        results.update({
+            "latency_p50_s": percentile(latencies, 0.50),
+            "latency_p95_s": percentile(latencies, 0.95),
+            "latency_p99_s": percentile(latencies, 0.99),
+            "latency_max_s": latencies[-1],
+            "files_per_minute": len(latencies) / span * 60 if span > 0 else None,
+        })
+    results.update(resources)
+    try:
+        with open(os.environ["TRACE_LOG_FILE"], "r", encoding="utf-8") as f:
+            stages = summarize(f)
+        results["stages"] = stages
+        results["stage_table"] = format_summary(stages) if stages else ""
+    except OSError:
+        results["stages"] = {}
+
+    if args.keep:
+        print(f"Kept benchmark files in {root}")
+    else:
+        log_copy = Path(tempfile.gettempdir()) / "avas-bench.log"
+        shutil.copyfile(log_path, log_copy)
+        results["log"] = str(log_copy)
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def format_report(results: Dict) -> str:
+    lines = [
+        f"files        {results['videos']} dropped, {results['notified']} notified, "
+        f"{len(results['missing'])} missing, {results['emails']} emails",
+    ]
+    if results.get("latency_p50_s") is not None:
+        lines.append(
+            f"latency      p50 {results['latency_p50_s']:.2f} s   p95 {results['latency_p95_s']:.2f} s   "
+            f"p99 {results['latency_p99_s']:.2f} s   max {results['latency_max_s']:.2f} s"
+        )
+    if results.get("files_per_minute"):
+        lines.append(f"throughput   {results['files_per_minute']:.1f} files/min, "
+                     f"{results['uploaded_mib']:.1f} MiB uploaded")
+    lines.append(f"cpu          avg {results['cpu_avg_pct']:.0f}%   peak {results['cpu_peak_pct']:.0f}% "
+                 f"of one core ({results['cpu_count']} cores)")
+    if "disk_busy_pct" in results:
+        lines.append(
+            f"disk         read {results['disk_read_mib']:.1f} MiB, written {results['disk_written_mib']:.1f} MiB, "
+            f"{results['disk_busiest']} {results['disk_busy_pct']:.0f}% busy"
+        )
+    if results.get("stage_table"):
+        lines += ["", results["stage_table"]]
+    lines += ["", f"pipeline output: {results['log']}"]
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end AVAS load benchmark against local stand-ins")
+    parser.add_argument("--videos", type=int, default=20, help="number of videos to drop")
+    parser.add_argument("--durations", default="5,30", help="video durations in seconds, cycled")
+    parser.add_argument("--formats", default="mp4:libx264,mov:libx264,avi:mpeg4",
+                        help="container:codec pairs, cycled (non-mp4 files are transcoded by AVAS)")
+    parser.add_argument("--size", default="640x360", help="video resolution")
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--rate", type=float, default=30, help="arriving files per minute (0 = all at once)")
+    parser.add_argument("--poisson", action="store_true", help="random (Poisson) arrivals instead of evenly spaced")
+    parser.add_argument("--seed", type=int, default=None, help="seed for --poisson")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (WORKER_PROCESSES)")
+    parser.add_argument("--batch-interval", type=int, default=None, help="override BATCH_INTERVAL")
+    parser.add_argument("--digest-window", type=float, default=None, help="override NOTIFY_DIGEST_WINDOW")
+    parser.add_argument("--s3-latency", type=float, default=0.0, help="seconds added to each S3 request")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="parallel ffmpeg renders")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="seconds to wait for notifications after the last drop")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--max-p95", type=float, default=None,
+                        help="exit 1 if p95 latency exceeds this many seconds or a file is missing")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary directory")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline output")
+    args = parser.parse_args(argv)
+
+    try:
+        args.durations = [float(d) for d in args.durations.split(",") if d.strip()]
+        args.formats = parse_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        results = run_benchmark(args)
+    except (RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"Benchmark failed: {e}")
+        return 1
+
+    print(format_report(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in results.items() if k != "stage_table"}, f, indent=2)
+
+    if args.max_p95 is not None:
+        p95 = results.get("latency_p95_s")
+        if results["missing"] or p95 is None or p95 > args.max_p95:
+            print(f"FAIL: p95 latency {p95} s (limit {args.max_p95} s), {len(results['missing'])} missing")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
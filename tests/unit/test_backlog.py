@@ -0,0 +1,99 @@
+import threading
+from unittest.mock import Mock
+
+from core.backlog import BacklogDrainer, group_into_sessions
+
+
+def named(*times):
+    return [f"/videos/2024-05-01T{t}.mov" for t in times]
+
+
+class TestGroupIntoSessions:
+
+    def test_gap_starts_new_session(self):
+        """Test that recordings far apart end up in different sessions"""
+        paths = named("10-30-00", "10-00-00", "10-10-00", "14-00-00", "14-05-00")
+
+        sessions = group_into_sessions(paths, session_gap=1800, max_files=10)
+
+        assert sessions == [named("10-00-00", "10-10-00", "10-30-00"), named("14-00-00", "14-05-00")]
+
+    def test_session_size_capped(self):
+        """Test that a long session is split after max_files files"""
+        paths = named("10-00-00", "10-01-00", "10-02-00", "10-03-00", "10-04-00")
+
+        sessions = group_into_sessions(paths, session_gap=1800, max_files=2)
+
+        assert [len(s) for s in sessions] == [2, 2, 1]
+
+    def test_untimestamped_files_use_mtime(self, tmp_path):
+        """Test that files without a timestamp in the name are ordered by mtime"""
+        import os
+        first, second = tmp_path / "clip_b.mov", tmp_path / "clip_a.mov"
+        first.write_bytes(b"x")
+        second.write_bytes(b"x")
+        os.utime(first, (1000, 1000))
+        os.utime(second, (5000, 5000))
+
+        sessions = group_into_sessions([str(second), str(first)], session_gap=1800)
+
+        assert sessions == [[str(first)], [str(second)]]
+
+
+class TestBacklogDrainer:
+
+    def test_sessions_processed_in_order_with_progress(self):
+        """Test that each session is one batch and progress is reported after each"""
+        video_handler = Mock()
+        video_handler.is_idle.return_value = True
+        reports = []
+        drainer = BacklogDrainer(
+            video_handler, named("10-00-00", "10-05-00", "15-00-00"),
+            session_gap=1800, session_delay=0, on_progress=reports.append
+        )
+
+        drainer.run()
+
+        assert [c[0][0] for c in video_handler.process_batch.call_args_list] == [
+            named("10-00-00", "10-05-00"), named("15-00-00")
+        ]
+        assert [(r["files_done"], r["sessions_done"]) for r in reports] == [(2, 1), (3, 2)]
+        assert reports[-1]["files_total"] == 3
+
+    def test_waits_for_live_events(self):
+        """Test that no backlog session starts while a live batch is pending"""
+        video_handler = Mock()
+        video_handler.is_idle.side_effect = [False, False, True]
+        drainer = BacklogDrainer(video_handler, named("10-00-00"), session_delay=0, poll_interval=0.01)
+
+        drainer.run()
+
+        assert video_handler.is_idle.call_count == 3
+        video_handler.process_batch.assert_called_once()
+
+    def test_failed_session_does_not_stop_catch_up(self):
+        """Test that an exception in one session does not abort the rest"""
+        video_handler = Mock()
+        video_handler.is_idle.return_value = True
+        video_handler.process_batch.side_effect = [RuntimeError("boom"), None]
+        drainer = BacklogDrainer(video_handler, named("10-00-00", "15-00-00"), session_delay=0)
+
+        drainer.run()
+
+        assert video_handler.process_batch.call_count == 2
+        assert drainer.progress()["files_done"] == 2
+
+    def test_stop_between_sessions(self):
+        """Test that stop() ends the catch-up after the session in progress"""
+        video_handler = Mock()
+        video_handler.is_idle.return_value = True
+        started = threading.Event()
+        video_handler.process_batch.side_effect = lambda session, backlog: started.set()
+        drainer = BacklogDrainer(video_handler, named("10-00-00", "15-00-00"), session_delay=10)
+
+        drainer.start()
+        assert started.wait(2)
+        drainer.stop(timeout=2)
+
+        assert not drainer.running
+        video_handler.process_batch.assert_called_once()
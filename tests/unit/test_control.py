@@ -0,0 +1,52 @@
+from unittest.mock import Mock
+
+import requests
+
+from core.control import ControlAPI, call_control
+
+
+class TestControlAPI:
+
+    def setup_method(self):
+        self.monitor = Mock()
+        self.monitor.status.return_value = {"queued": ["a.mov"], "paused": False}
+        self.monitor.flush.return_value = 1
+        self.monitor.retry_failed.return_value = ["b.mov"]
+        self.api = ControlAPI(self.monitor, port=0, token="").start()
+
+    def teardown_method(self):
+        self.api.stop()
+
+    def test_status(self):
+        """Test that GET /status returns the monitor status"""
+        response = requests.get(self.api.url + "/status", timeout=5)
+
+        assert response.status_code == 200
+        assert response.json() == {"queued": ["a.mov"], "paused": False}
+
+    def test_actions(self):
+        """Test that the POST actions reach the monitor"""
+        assert requests.post(self.api.url + "/flush", timeout=5).json() == {"flushed": 1}
+        assert requests.post(self.api.url + "/retry-failed", timeout=5).json() == {"retried": ["b.mov"]}
+        assert requests.post(self.api.url + "/pause", timeout=5).json() == {"paused": True}
+        assert requests.post(self.api.url + "/resume", timeout=5).json() == {"paused": False}
+
+        self.monitor.pause.assert_called_once()
+        self.monitor.resume.assert_called_once()
+
+    def test_action_requires_post(self):
+        """Test that actions are not triggered by GET"""
+        assert requests.get(self.api.url + "/flush", timeout=5).status_code == 405
+        self.monitor.flush.assert_not_called()
+
+    def test_token_required(self):
+        """Test that a configured token is enforced"""
+        self.api.token = "secret"
+
+        assert requests.get(self.api.url + "/status", timeout=5).status_code == 401
+        response = requests.get(self.api.url + "/status", headers={"X-AVAS-Token": "secret"}, timeout=5)
+        assert response.status_code == 200
+
+    def test_client(self):
+        """Test that call_control talks to the API"""
+        assert call_control("flush", port=self.api.server.port) == {"flushed": 1}
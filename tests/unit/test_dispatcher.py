@@ -0,0 +1,106 @@
+import time
+from unittest.mock import patch
+
+from core.dispatcher import NotificationDispatcher
+
+
+class TestNotificationDispatcher:
+
+    def make_dispatcher(self, tmp_path, **kwargs):
+        options = dict(digest_window=0, retry_base=10, retry_max=100, max_attempts=3)
+        options.update(kwargs)
+        return NotificationDispatcher(spool_dir=tmp_path / "spool", **options)
+
+    @patch('core.dispatcher.send_notification_email')
+    def test_enqueue_only_writes_spool(self, mock_send, tmp_path):
+        """Test that enqueueing does not send anything on the caller's thread"""
+        dispatcher = self.make_dispatcher(tmp_path)
+
+        dispatcher.enqueue_batch(["a.mov"], ["https://page/1"], recipient="r@test")
+
+        mock_send.assert_not_called()
+        assert dispatcher.pending_count() == 1
+
+    @patch('core.dispatcher.send_notification_email')
+    def test_sent_entries_removed_from_spool(self, mock_send, tmp_path):
+        """Test that a successful send removes the spooled notification"""
+        dispatcher = self.make_dispatcher(tmp_path)
+        dispatcher.enqueue_batch(["a.mov"], ["https://page/1"], recipient="r@test")
+
+        dispatcher.dispatch_due()
+
+        mock_send.assert_called_once()
+        recipient, subject, body = mock_send.call_args[0]
+        assert recipient == "r@test"
+        assert "<https://page/1>" in body
+        assert dispatcher.pending_count() == 0
+
+    @patch('core.dispatcher.send_notification_email')
+    def test_failure_retried_with_backoff(self, mock_send, tmp_path):
+        """Test that a failed send stays spooled and is delayed exponentially"""
+        mock_send.side_effect = OSError("smtp down")
+        dispatcher = self.make_dispatcher(tmp_path)
+        dispatcher.enqueue_email("r@test", "subject", "body")
+
+        delay = dispatcher.dispatch_due()
+        entry = dispatcher._load_spool()[0]
+
+        assert entry['attempts'] == 1
+        assert 9 < delay <= 10
+        # not due yet, so nothing is attempted
+        dispatcher.dispatch_due()
+        assert mock_send.call_count == 1
+
+        entry['next_attempt'] = time.time()
+        dispatcher._save_entry(entry)
+        dispatcher.dispatch_due()
+        entry = dispatcher._load_spool()[0]
+        assert entry['attempts'] == 2
+        assert entry['next_attempt'] - time.time() > 19
+
+    @patch('core.dispatcher.send_notification_email')
+    def test_gives_up_after_max_attempts(self, mock_send, tmp_path):
+        """Test that a notification is moved to failed/ after max_attempts"""
+        mock_send.side_effect = OSError("smtp down")
+        dispatcher = self.make_dispatcher(tmp_path, max_attempts=1)
+        dispatcher.enqueue_email("r@test", "subject", "body")
+
+        dispatcher.dispatch_due()
+
+        assert dispatcher.pending_count() == 0
+        assert len(list(dispatcher.failed_dir.glob("*.json"))) == 1
+
+    @patch('core.dispatcher.send_notification_email')
+    def test_digest_merges_batches_in_window(self, mock_send, tmp_path):
+        """Test that batches within the digest window become one email"""
+        dispatcher = self.make_dispatcher(tmp_path, digest_window=60)
+        dispatcher.enqueue_batch(["a.mov"], ["https://page/1"], recipient="r@test")
+        dispatcher.enqueue_batch(["b.mov", "c.mov"], ["https://page/2"], recipient="r@test")
+
+        delay = dispatcher.dispatch_due()
+        mock_send.assert_not_called()
+        assert 0 < delay <= 60
+
+        dispatcher.flush()
+        dispatcher.dispatch_due()
+
+        mock_send.assert_called_once()
+        _, subject, body = mock_send.call_args[0]
+        assert "2 batches, 3 videos" in subject
+        assert "<https://page/1>" in body and "<https://page/2>" in body
+        assert dispatcher.pending_count() == 0
+
+    @patch('core.dispatcher.send_notification_email')
+    def test_background_thread_sends(self, mock_send, tmp_path):
+        """Test that the dispatcher thread picks up new notifications promptly"""
+        dispatcher = self.make_dispatcher(tmp_path)
+        dispatcher.start()
+        try:
+            dispatcher.enqueue_batch(["a.mov"], ["https://page/1"], recipient="r@test")
+            deadline = time.time() + 2
+            while dispatcher.pending_count() and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            dispatcher.stop(timeout=2)
+
+        mock_send.assert_called_once()
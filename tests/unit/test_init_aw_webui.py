@@ -0,0 +1,334 @@
+import os
+import pytest
+from pathlib import Path
+
+import init_aw_webui as webui
+
+
+def make_static(root: Path, *parts) -> Path:
+    static = root.joinpath(*parts, "aw_server", "static")
+    static.mkdir(parents=True)
+    return static
+
+
+class TestFindStatic:
+
+    def test_search_finds_nested_static(self, tmp_path):
+        """Test that the walk finds the aw-server static directory below a root"""
+        static = make_static(tmp_path, "apps", "activitywatch", "aw-server")
+        (tmp_path / "other" / "static").mkdir(parents=True)
+
+        assert webui.search_static([tmp_path]) == static.resolve()
+
+    def test_search_prunes_and_limits_depth(self, tmp_path):
+        """Test that pruned directories and too deep levels are not searched"""
+        make_static(tmp_path, "project", "node_modules", "aw-server")
+        make_static(tmp_path, "a", "b", "c", "d")
+
+        assert webui.search_static([tmp_path], max_depth=3) is None
+        assert webui.search_static([tmp_path], max_depth=6) is not None
+
+    def test_search_without_roots(self, tmp_path):
+        assert webui.search_static([tmp_path / "missing"]) is None
+
+    def test_aw_server_on_path_and_cache(self, tmp_path, monkeypatch):
+        """Test that aw-server on PATH is used first and the location is cached"""
+        bundle = tmp_path / "activitywatch" / "aw-server"
+        static = make_static(bundle)
+        executable = bundle / "aw-server"
+        executable.write_text("")
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setattr(webui.shutil, "which", lambda name: str(executable))
+        monkeypatch.setattr(webui, "search_static", lambda roots: None)
+
+        assert webui.find_aw_static() == static.resolve()
+        assert (tmp_path / "cache" / "avas" / "aw_static.json").exists()
+
+        # later runs take the cached location without looking at PATH
+        monkeypatch.setattr(webui.shutil, "which", lambda name: None)
+        assert webui.find_aw_static() == static.resolve()
+
+    def test_stale_cache_is_ignored(self, tmp_path, monkeypatch):
+        static = make_static(tmp_path, "aw-server")
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        webui._save_cached_static(static)
+        os.rename(static, tmp_path / "moved")
+
+        assert webui._load_cached_static() is None
+
+
+class TestDeployStatic:
+
+    def setup_method(self):
+        self.copies = []
+
+    def make_dist(self, root: Path) -> Path:
+        dist = root / "dist"
+        (dist / "js").mkdir(parents=True)
+        (dist / "index.html").write_text("<html>v1</html>")
+        (dist / "js" / "app.js").write_text("console.log(1)")
+        (dist / "js" / "app.js.map").write_text("{}")
+        return dist
+
+    def test_first_deploy_replaces_directory(self, tmp_path):
+        dist = self.make_dist(tmp_path)
+        static = tmp_path / "aw_server" / "static"
+        static.mkdir(parents=True)
+        (static / "old.html").write_text("old")
+
+        assert webui.deploy_static(dist, static)
+
+        assert (static / "index.html").read_text() == "<html>v1</html>"
+        assert (static / "js" / "app.js.map").exists()
+        assert not (static / "old.html").exists()
+        assert (tmp_path / "aw_server" / "static.previous" / "old.html").exists()
+        assert not (tmp_path / "aw_server" / "static.staging").exists()
+
+    def test_redeploy_copies_only_changed_files(self, tmp_path, monkeypatch):
+        """Test that unchanged files are linked from the live directory, not copied"""
+        dist = self.make_dist(tmp_path)
+        static = tmp_path / "aw_server" / "static"
+        webui.deploy_static(dist, static)
+        app_inode = (static / "js" / "app.js").stat().st_ino
+
+        (dist / "index.html").write_text("<html>v2</html>")
+        copy2 = webui.shutil.copy2
+        monkeypatch.setattr(webui.shutil, "copy2", lambda src, dst: (self.copies.append(src), copy2(src, dst)))
+        assert webui.deploy_static(dist, static)
+
+        assert [Path(p).name for p in self.copies] == ["index.html"]
+        assert (static / "index.html").read_text() == "<html>v2</html>"
+        assert (static / "js" / "app.js").stat().st_ino == app_inode
+
+        self.copies.clear()
+        assert webui.deploy_static(dist, static)
+        assert self.copies == []
+
+    def test_skip_maps(self, tmp_path):
+        dist = self.make_dist(tmp_path)
+        static = tmp_path / "aw_server" / "static"
+
+        webui.deploy_static(dist, static, skip_maps=True)
+
+        assert (static / "js" / "app.js").exists()
+        assert not (static / "js" / "app.js.map").exists()
+
+    def test_failed_deploy_leaves_live_directory(self, tmp_path, monkeypatch):
+        """Test that a copy error leaves the served directory as it was"""
+        dist = self.make_dist(tmp_path)
+        static = tmp_path / "aw_server" / "static"
+        webui.deploy_static(dist, static)
+        (dist / "index.html").write_text("<html>v2</html>")
+
+        def broken_copy(src, dst):
+            raise OSError("disk full")
+        monkeypatch.setattr(webui.shutil, "copy2", broken_copy)
+
+        assert not webui.deploy_static(dist, static)
+        assert (static / "index.html").read_text() == "<html>v1</html>"
+        assert not (tmp_path / "aw_server" / "static.staging").exists()
+
+    def test_swap_never_leaves_static_missing(self, tmp_path, monkeypatch):
+        """Test that the live directory exists at every rename when RENAME_EXCHANGE is available"""
+        dist = self.make_dist(tmp_path)
+        static = tmp_path / "aw_server" / "static"
+        webui.deploy_static(dist, static)
+        probe_a, probe_b = tmp_path / "a", tmp_path / "b"
+        probe_a.mkdir()
+        probe_b.mkdir()
+        if not webui._exchange(probe_a, probe_b):
+            pytest.skip("renameat2(RENAME_EXCHANGE) not available here")
+
+        (dist / "index.html").write_text("<html>v2</html>")
+        seen = []
+        rename = webui.os.rename
+        monkeypatch.setattr(webui.os, "rename", lambda src, dst: (seen.append(static.is_dir()), rename(src, dst)))
+        assert webui.deploy_static(dist, static)
+
+        assert seen and all(seen)
+        assert (static / "index.html").read_text() == "<html>v2</html>"
+        assert (tmp_path / "aw_server" / "static.previous" / "index.html").read_text() == "<html>v1</html>"
+
+    def test_swap_without_exchange(self, tmp_path, monkeypatch):
+        """Test that the two-rename fallback still deploys and keeps the previous directory"""
+        dist = self.make_dist(tmp_path)
+        static = tmp_path / "aw_server" / "static"
+        webui.deploy_static(dist, static)
+        monkeypatch.setattr(webui, "_exchange", lambda a, b: False)
+
+        (dist / "index.html").write_text("<html>v2</html>")
+        assert webui.deploy_static(dist, static)
+
+        assert (static / "index.html").read_text() == "<html>v2</html>"
+        assert (tmp_path / "aw_server" / "static.previous" / "index.html").read_text() == "<html>v1</html>"
+        assert not (tmp_path / "aw_server" / "static.staging").exists()
+
+
+class TestPackageDist:
+
+    def make_dist(self, root: Path) -> Path:
+        dist = root / "dist"
+        (dist / "js").mkdir(parents=True)
+        (dist / "index.html").write_text("<html>" + "<p>survey</p>" * 200 + "</html>")
+        (dist / "js" / "app.js").write_text("console.log('video');\n" * 200 + "//# sourceMappingURL=app.js.map")
+        (dist / "js" / "app.js.map").write_text('{"version": 3}')
+        (dist / "logo.png").write_bytes(os.urandom(2048))
+        return dist
+
+    def test_variants_and_manifest(self, tmp_path):
+        """Test that text assets get verified gzip variants listed in the manifest"""
+        import gzip
+        import json
+        dist = self.make_dist(tmp_path)
+        out = tmp_path / "build" / "webui"
+
+        totals = webui.package_dist(dist, out)
+
+        manifest = json.loads((out / "asset-manifest.json").read_text())["assets"]
+        app = (out / "js" / "app.js").read_bytes()
+        assert b"sourceMappingURL" not in app
+        assert gzip.decompress((out / "js" / "app.js.gz").read_bytes()) == app
+        assert manifest["js/app.js"]["integrity"] == webui._integrity(app)
+        assert manifest["js/app.js"]["gzip"] < manifest["js/app.js"]["size"]
+        # binary assets are copied but not compressed
+        assert "logo.png" in manifest and not (out / "logo.png.gz").exists()
+        assert totals["files"] == 2 and totals["gzip"] < totals["raw"]
+
+    def test_map_modes(self, tmp_path):
+        dist = self.make_dist(tmp_path)
+
+        webui.package_dist(dist, tmp_path / "separate", maps="separate")
+        webui.package_dist(dist, tmp_path / "strip", maps="strip")
+        webui.package_dist(dist, tmp_path / "keep", maps="keep")
+
+        assert (tmp_path / "separate-maps" / "js" / "app.js.map").exists()
+        assert not (tmp_path / "separate" / "js" / "app.js.map").exists()
+        assert not (tmp_path / "strip" / "js" / "app.js.map").exists()
+        assert not (tmp_path / "strip-maps").exists()
+        assert (tmp_path / "keep" / "js" / "app.js.map").exists()
+        assert b"sourceMappingURL" in (tmp_path / "keep" / "js" / "app.js").read_bytes()
+
+    def test_rebuild_reuses_and_prunes(self, tmp_path):
+        """Test that unchanged variants are kept and files gone from dist are removed"""
+        dist = self.make_dist(tmp_path)
+        out = tmp_path / "webui"
+        webui.package_dist(dist, out)
+        variant = out / "js" / "app.js.gz"
+        before = variant.stat().st_mtime_ns
+
+        (dist / "index.html").unlink()
+        webui.package_dist(dist, out)
+
+        assert variant.stat().st_mtime_ns == before
+        assert not (out / "index.html").exists()
+        assert not (out / "index.html.gz").exists()
+
+
+class TestReadiness:
+
+    def setup_method(self):
+        from core.local_http import LocalHTTPServer
+        self.server = LocalHTTPServer(name="aw-server-stand-in")
+        self.index = b"<html>v2</html>"
+        self.info_failures = 0
+        self.server.route("GET", "/", lambda request: (200, self.index, "text/html"))
+        self.server.route("GET", "/api/0/info", self.info)
+        self.server.start()
+
+    def teardown_method(self):
+        self.server.stop()
+
+    def info(self, request):
+        if self.info_failures:
+            self.info_failures -= 1
+            return 503, "starting"
+        return 200, {"version": "test"}
+
+    def test_ready_after_backoff(self):
+        """Test that the probe retries until the server answers healthy"""
+        self.info_failures = 3
+
+        elapsed = webui.wait_until_ready(self.server.url, self.index, deadline=5, initial_delay=0.01)
+
+        assert elapsed is not None and elapsed < 5
+        assert self.info_failures == 0
+
+    def test_old_frontend_is_not_ready(self):
+        """Test that a server still serving another index.html is not considered ready"""
+        elapsed = webui.wait_until_ready(self.server.url, b"<html>v3</html>", deadline=0.3, initial_delay=0.05)
+        assert elapsed is None
+
+    def test_old_server_answering_is_not_ready(self):
+        """Test that probes answered by the old server do not count once the restarted one exited"""
+        import subprocess
+        import sys
+        exited = subprocess.Popen([sys.executable, "-c", "pass"])
+        exited.wait()
+
+        elapsed = webui.wait_until_ready(self.server.url, self.index, deadline=0.3, initial_delay=0.05, process=exited)
+        assert elapsed is None
+
+        running = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+        try:
+            assert webui.wait_until_ready(self.server.url, self.index, deadline=2, process=running) is not None
+        finally:
+            running.kill()
+            running.wait()
+
+    def test_unreachable_server(self):
+        url = self.server.url
+        self.server.stop()
+        assert webui.wait_until_ready(url, deadline=0.2, initial_delay=0.05) is None
+
+    def test_unhealthy_deploy_is_rolled_back(self, tmp_path, monkeypatch):
+        """Test that main restores the previous frontend when the new one does not come up"""
+        static = tmp_path / "aw_server" / "static"
+        static.mkdir(parents=True)
+        (static / "index.html").write_text("<html>v1</html>")
+        dist = tmp_path / "dist"
+        dist.mkdir()
+        (dist / "index.html").write_text("<html>v2</html>")
+        restarts = []
+        monkeypatch.setattr(webui, "restart_activitywatch", lambda: restarts.append(1))
+        # the stand-in serves whatever is deployed but is only healthy on v1
+        self.server.route("GET", "/", lambda request: (200, (static / "index.html").read_bytes(), "text/html"))
+        self.server.route("GET", "/api/0/info", lambda request: (
+            (200, {}) if b"v1" in (static / "index.html").read_bytes() else (500, "broken")
+        ))
+
+        with pytest.raises(SystemExit):
+            webui.main(["--dist", str(dist), "--static", str(static),
+                        "--ready-url", self.server.url, "--ready-timeout", "0.5"])
+
+        assert (static / "index.html").read_text() == "<html>v1</html>"
+        assert (tmp_path / "aw_server" / "static.failed" / "index.html").read_text() == "<html>v2</html>"
+        assert len(restarts) == 2
+
+    def test_failed_restart_is_rolled_back_while_old_server_serves(self, tmp_path, monkeypatch):
+        """Test that a new aw-server that exits is not hidden by the old one serving the new files"""
+        import subprocess
+        import sys
+        static = tmp_path / "aw_server" / "static"
+        static.mkdir(parents=True)
+        (static / "index.html").write_text("<html>v1</html>")
+        dist = tmp_path / "dist"
+        dist.mkdir()
+        (dist / "index.html").write_text("<html>v2</html>")
+        started = []
+
+        def restart():
+            # e.g. the port is still taken by the old server
+            server = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(1)"])
+            server.wait()
+            started.append(server)
+            return server
+        monkeypatch.setattr(webui, "restart_activitywatch", restart)
+        # the old server keeps running and reads whatever is on disk
+        self.server.route("GET", "/", lambda request: (200, (static / "index.html").read_bytes(), "text/html"))
+
+        with pytest.raises(SystemExit):
+            webui.main(["--dist", str(dist), "--static", str(static),
+                        "--ready-url", self.server.url, "--ready-timeout", "2"])
+
+        assert (static / "index.html").read_text() == "<html>v1</html>"
+        assert len(started) == 2
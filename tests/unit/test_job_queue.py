@@ -0,0 +1,195 @@
+import os
+import time
+import signal
+import threading
+import multiprocessing
+from unittest.mock import patch, MagicMock
+
+from core.job_queue import JobQueue, QUEUED, RUNNING, DONE, FAILED
+from core.worker import run_worker, WorkerPool
+from core.state_db import DirectoryStateDB, DONE as FILE_DONE
+
+
+def _claim_all(db_file, worker, results):
+    jobs = JobQueue(db_file)
+    claimed = []
+    while True:
+        job = jobs.claim(worker)
+        if job is None:
+            break
+        claimed.append(job.id)
+        jobs.complete(job.id)
+    results.put(claimed)
+
+
+class TestJobQueue:
+
+    def test_claim_in_order_and_complete(self, tmp_path):
+        """Test that jobs are claimed oldest first and only once"""
+        jobs = JobQueue(tmp_path / "jobs.db")
+        first = jobs.enqueue(["/v/a.mov", "/v/b.mov"])
+        second = jobs.enqueue(["/v/c.mov"])
+
+        job = jobs.claim("w1")
+        assert (job.id, job.paths, job.attempts) == (first, ["/v/a.mov", "/v/b.mov"], 1)
+        assert jobs.claim("w2").id == second
+        assert jobs.claim("w3") is None
+
+        jobs.complete(first)
+        assert jobs.counts() == {DONE: 1, RUNNING: 1}
+
+    def test_unfinished_paths_not_enqueued_twice(self, tmp_path):
+        """Test that a file already waiting or running is not queued again"""
+        jobs = JobQueue(tmp_path / "jobs.db")
+        job_id = jobs.enqueue(["/v/a.mov"])
+
+        assert jobs.enqueue(["/v/a.mov"]) is None
+        assert jobs.enqueue(["/v/a.mov", "/v/b.mov"]) is not None
+
+        jobs.claim("w1")
+        jobs.complete(job_id)
+        assert jobs.enqueue(["/v/a.mov"]) is not None
+
+    def test_failed_job_retried_until_max_attempts(self, tmp_path):
+        """Test that a failing job is queued again and then left failed"""
+        jobs = JobQueue(tmp_path / "jobs.db", max_attempts=2)
+        job_id = jobs.enqueue(["/v/a.mov"])
+
+        jobs.fail(jobs.claim("w1").id, "boom")
+        assert jobs.counts() == {QUEUED: 1}
+        jobs.fail(jobs.claim("w1").id, "boom")
+        assert jobs.counts() == {FAILED: 1}
+        # a failed job no longer blocks the file
+        assert jobs.enqueue(["/v/a.mov"]) != job_id
+
+    def test_jobs_of_dead_worker_requeued(self, tmp_path):
+        """Test that running jobs are put back by worker or by stale heartbeat"""
+        jobs = JobQueue(tmp_path / "jobs.db")
+        jobs.enqueue(["/v/a.mov"])
+        jobs.enqueue(["/v/b.mov"])
+        jobs.claim("w1")
+        jobs.claim("w2")
+
+        assert jobs.requeue_worker("w1") == 1
+        assert jobs.requeue_stale(older_than=3600) == 0
+        assert jobs.requeue_stale(older_than=-1) == 1
+        assert jobs.counts() == {QUEUED: 2}
+        assert jobs.claim("w3").attempts == 2
+
+    def test_concurrent_processes_claim_each_job_once(self, tmp_path):
+        """Test that several processes draining one queue never share a job"""
+        db_file = tmp_path / "jobs.db"
+        jobs = JobQueue(db_file)
+        expected = {jobs.enqueue([f"/v/{i}.mov"]) for i in range(60)}
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_claim_all, args=(db_file, f"w{i}", results)) for i in range(3)]
+        for p in procs:
+            p.start()
+        claimed = [job for _ in procs for job in results.get(timeout=30)]
+        for p in procs:
+            p.join(10)
+
+        assert sorted(claimed) == sorted(expected)
+        assert jobs.counts() == {DONE: 60}
+
+
+class TestWorker:
+
+    def test_worker_processes_jobs_and_skips_done_files(self, tmp_path):
+        """Test that a worker runs queued batches and skips files already done"""
+        jobs = JobQueue(tmp_path / "jobs.db")
+        state = DirectoryStateDB(tmp_path / "state.db")
+        state.mark("a.mov", FILE_DONE)
+        jobs.enqueue(["/v/a.mov", "/v/b.mov"])
+
+        stop = threading.Event()
+        handler = MagicMock()
+        handler.process_batch.side_effect = lambda paths: stop.set()
+        with patch('core.worker.VideoHandler', return_value=handler), \
+             patch('core.worker.get_reminder') as mock_reminder, \
+             patch('core.worker.get_dispatcher') as mock_dispatcher:
+            worker = threading.Thread(
+                target=run_worker, args=("w1", stop, tmp_path / "jobs.db", tmp_path / "state.db", 0.01)
+            )
+            worker.start()
+            worker.join(5)
+
+        handler.process_batch.assert_called_once_with(["/v/b.mov"])
+        mock_reminder.assert_called_once_with(start_scheduler=False)
+        mock_dispatcher.assert_called_once_with(start=False)
+        assert JobQueue(tmp_path / "jobs.db").counts() == {DONE: 1}
+
+    def test_conversion_output_not_processed_by_another_worker(self, tmp_path):
+        """Test that the watcher does not queue an .mp4 a worker is still converting"""
+        from watchdog.events import FileCreatedEvent
+        from core.video_handler import VideoHandler
+        from core.state_db import OUTPUT
+
+        jobs = JobQueue(tmp_path / "jobs.db")
+        state = DirectoryStateDB(tmp_path / "state.db")
+        watcher = VideoHandler(None, batch_interval=0.05, state=state, job_queue=jobs)
+        source = tmp_path / "a.mov"
+        source.write_bytes(b"video")
+
+        def slow_convert(path):
+            mp4_path = os.path.splitext(path)[0] + ".mp4"
+            with open(mp4_path, "wb") as f:
+                f.write(b"half")
+            # the watcher sees the output long before ffmpeg is done
+            watcher.on_created(FileCreatedEvent(mp4_path))
+            time.sleep(0.5)
+            return mp4_path, True
+
+        stop = threading.Event()
+        with patch.object(VideoHandler, '_wait_for_stable_file', return_value=True), \
+             patch('core.video_handler.get_video_duration', return_value=10), \
+             patch('core.video_handler.convert_to_mp4', side_effect=slow_convert), \
+             patch('core.video_handler.process_and_upload_video', return_value="https://s3/a.mp4") as mock_upload, \
+             patch('core.video_handler.call_appscript_batch', return_value="https://page"), \
+             patch('core.video_handler.notify_batch') as mock_notify, \
+             patch('core.video_handler.add_survey_to_track'), \
+             patch('core.worker.get_reminder'), \
+             patch('core.worker.get_dispatcher'):
+            workers = [
+                threading.Thread(target=run_worker, args=(name, stop, tmp_path / "jobs.db", tmp_path / "state.db", 0.01))
+                for name in ("w1", "w2")
+            ]
+            for worker in workers:
+                worker.start()
+            watcher.process_batch([str(source)])
+            time.sleep(1)
+            stop.set()
+            for worker in workers:
+                worker.join(5)
+
+        mock_upload.assert_called_once_with(str(tmp_path / "a.mp4"))
+        mock_notify.assert_called_once()
+        assert state.get("a.mp4")["status"] == OUTPUT
+        assert jobs.counts() == {DONE: 1}
+
+
+class TestWorkerPool:
+
+    def test_killed_worker_restarted_and_job_requeued(self, tmp_path, monkeypatch):
+        """Test that the pool restarts a dead worker and stops its workers quickly"""
+        # spawned workers read their config from the environment
+        monkeypatch.setenv("STATE_DB_FILE", str(tmp_path / "state.db"))
+        pool = WorkerPool(2, tmp_path / "jobs.db", check_interval=0.1).start()
+        try:
+            victim = pool.status()[0]
+            os.kill(victim["pid"], signal.SIGKILL)
+
+            deadline = time.time() + 20
+            while time.time() < deadline:
+                current = pool.status()[0]
+                if current["pid"] != victim["pid"] and current["alive"]:
+                    break
+                time.sleep(0.1)
+            assert current["pid"] != victim["pid"] and current["alive"]
+        finally:
+            started = time.time()
+            pool.stop(timeout=10)
+            assert time.time() - started < 10
+        assert not any(w["alive"] for w in pool.status())
@@ -0,0 +1,173 @@
+import os
+import time
+import multiprocessing
+
+from core.lease import LeaseManager, CLAIMED, HELD, DONE, LEASE_DIR_NAME
+
+
+def _claim_directory(watch_dir, node_id, results):
+    lease = LeaseManager(node_id=node_id, ttl=60)
+    claimed = []
+    for name in sorted(os.listdir(watch_dir)):
+        path = os.path.join(watch_dir, name)
+        if os.path.isfile(path) and lease.claim(path) == CLAIMED:
+            claimed.append(name)
+            lease.release(path, done=True)
+    results.put(claimed)
+
+
+def _expire(lease, path, age):
+    lease_file = lease._lease_file(path)
+    past = time.time() - age
+    os.utime(lease_file, (past, past))
+
+
+class TestLeaseManager:
+
+    def test_claim_is_exclusive(self, tmp_path):
+        """Test that only one node gets the lease on a file"""
+        path = str(tmp_path / "a.mov")
+        first = LeaseManager(node_id="node-1")
+        second = LeaseManager(node_id="node-2")
+
+        assert first.claim(path) == CLAIMED
+        assert second.claim(path) == HELD
+        assert first.claim(path) == CLAIMED  # already ours
+        assert (tmp_path / LEASE_DIR_NAME / "a.mov.lease").exists()
+        assert first.held() == [path]
+
+    def test_release_done_marks_file_for_all_nodes(self, tmp_path):
+        """Test that a finished file is not claimed again by any node"""
+        path = str(tmp_path / "a.mov")
+        first = LeaseManager(node_id="node-1")
+        second = LeaseManager(node_id="node-2")
+
+        first.claim(path)
+        first.release(path, done=True)
+
+        assert first.held() == []
+        assert not (tmp_path / LEASE_DIR_NAME / "a.mov.lease").exists()
+        assert second.claim(path) == DONE
+
+    def test_release_not_done_frees_file(self, tmp_path):
+        """Test that a released but unfinished file can be claimed by another node"""
+        path = str(tmp_path / "a.mov")
+        first = LeaseManager(node_id="node-1")
+        second = LeaseManager(node_id="node-2")
+
+        first.claim(path)
+        first.release(path, done=False)
+
+        assert second.claim(path) == CLAIMED
+
+    def test_expired_lease_is_taken_over(self, tmp_path):
+        """Test that the lease of a node that stopped renewing it is taken over"""
+        path = str(tmp_path / "a.mov")
+        dead = LeaseManager(node_id="node-1", ttl=30)
+        alive = LeaseManager(node_id="node-2", ttl=30)
+        dead.claim(path)
+
+        assert alive.orphaned([path]) == []
+        _expire(dead, path, 60)
+        assert alive.orphaned([path]) == [path]
+
+        assert alive.claim(path) == CLAIMED
+        assert alive.orphaned([path]) == []
+        # the old owner notices at its next heartbeat
+        dead.renew()
+        assert dead.held() == []
+
+    def test_renew_keeps_lease_alive(self, tmp_path):
+        """Test that renewing touches the lease so it does not expire"""
+        path = str(tmp_path / "a.mov")
+        owner = LeaseManager(node_id="node-1", ttl=30)
+        other = LeaseManager(node_id="node-2", ttl=30)
+        owner.claim(path)
+        _expire(owner, path, 60)
+
+        owner.renew()
+
+        assert other.claim(path) == HELD
+
+    def test_stop_releases_held_leases(self, tmp_path):
+        """Test that stopping the heartbeat releases leases without marking them done"""
+        path = str(tmp_path / "a.mov")
+        owner = LeaseManager(node_id="node-1", heartbeat=0.05).start()
+        owner.claim(path)
+
+        owner.stop()
+
+        assert owner.held() == []
+        assert LeaseManager(node_id="node-2").claim(path) == CLAIMED
+
+    def test_shared_lease_dir(self, tmp_path):
+        """Test that leases go to the configured directory"""
+        lease_dir = tmp_path / "leases"
+        lease = LeaseManager(node_id="node-1", lease_dir=str(lease_dir))
+
+        lease.claim(str(tmp_path / "videos" / "a.mov"))
+
+        assert (lease_dir / "a.mov.lease").exists()
+
+    def test_done_markers_pruned(self, tmp_path):
+        """Test that markers go once their video is gone or, with a retention, once they are old"""
+        kept, removed, old = (tmp_path / name for name in ("kept.mov", "removed.mov", "old.mov"))
+        lease = LeaseManager(node_id="node-1")
+        for path in (kept, removed, old):
+            path.write_bytes(b"video")
+            lease.claim(str(path))
+            lease.release(str(path), done=True)
+        removed.unlink()
+        past = time.time() - 3600
+        os.utime(lease._done_file(str(old)), (past, past))
+
+        assert lease.prune_done(str(tmp_path)) == 1
+        assert sorted(os.listdir(tmp_path / LEASE_DIR_NAME)) == ["kept.mov.done", "old.mov.done"]
+        assert lease.claim(str(removed)) == CLAIMED
+
+        lease.done_retention = 60
+        assert lease.prune_done(str(tmp_path)) == 1
+        assert sorted(os.listdir(tmp_path / LEASE_DIR_NAME)) == ["kept.mov.done", "removed.mov.lease"]
+        assert LeaseManager(node_id="node-2").prune_done(str(tmp_path / "empty")) == 0
+
+    def test_each_file_claimed_once_across_processes(self, tmp_path):
+        """Test that several processes sharing a directory process every file exactly once"""
+        watch_dir = tmp_path / "videos"
+        watch_dir.mkdir()
+        names = [f"clip_{i:02d}.mov" for i in range(30)]
+        for name in names:
+            (watch_dir / name).write_bytes(b"x")
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        processes = [
+            ctx.Process(target=_claim_directory, args=(str(watch_dir), f"node-{i}", results))
+            for i in range(4)
+        ]
+        for process in processes:
+            process.start()
+        claimed = [results.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join(timeout=10)
+
+        everything = [name for batch in claimed for name in batch]
+        assert sorted(everything) == names
+
+    def test_video_handler_skips_files_of_other_nodes(self, tmp_path):
+        """Test that the handler only processes files it holds the lease on"""
+        from core.video_handler import VideoHandler
+        from core.state_db import DirectoryStateDB, DONE as FILE_DONE
+
+        held, done, free = (str(tmp_path / n) for n in ("held.mov", "done.mov", "free.mov"))
+        other = LeaseManager(node_id="node-2")
+        other.claim(held)
+        other.claim(done)
+        other.release(done, done=True)
+
+        state = DirectoryStateDB(tmp_path / "state.db")
+        handler = VideoHandler(None, state=state, lease=LeaseManager(node_id="node-1"))
+
+        assert handler._claim(held) is False
+        assert handler._claim(done) is False
+        assert handler._claim(free) is True
+        assert state.get("done.mov")["status"] == FILE_DONE
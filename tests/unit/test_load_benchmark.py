@@ -0,0 +1,76 @@
+import os
+
+import boto3
+import pytest
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from core.notifier import SMTPConnectionPool, build_message, batch_email
+from tests.fakes.appscript_server import FakeAppsScriptServer
+from tests.fakes.s3_server import FakeS3Server
+from tests.fakes.smtp_server import FakeSMTPServer
+from tests.load_benchmark import arrival_times, match_notifications, parse_formats, percentile
+
+
+class TestLoadSchedule:
+
+    def test_even_arrivals(self):
+        assert arrival_times(4, 30) == [0.0, 2.0, 4.0, 6.0]
+        assert arrival_times(3, 0) == [0.0, 0.0, 0.0]
+
+    def test_poisson_arrivals_are_reproducible(self):
+        """Test that seeded random arrivals repeat and keep roughly the requested rate"""
+        offsets = arrival_times(2000, 60, poisson=True, seed=7)
+
+        assert offsets == arrival_times(2000, 60, poisson=True, seed=7)
+        assert offsets == sorted(offsets)
+        assert 1800 < offsets[-1] < 2200
+
+    def test_formats_and_percentiles(self):
+        assert parse_formats("mp4:libx264, AVI:mpeg4") == [(".mp4", "libx264"), (".avi", "mpeg4")]
+        with pytest.raises(ValueError):
+            parse_formats("mkv:libx264")
+        assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 0.5) == 3.0
+        assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 0.99) == 5.0
+
+
+class TestFakes:
+
+    def test_s3_stand_in_accepts_boto3_uploads(self, tmp_path, monkeypatch):
+        """Test that single-request and multipart uploads both arrive intact"""
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+        small = tmp_path / "small.mp4"
+        small.write_bytes(os.urandom(64 * 1024))
+        large = tmp_path / "large.mp4"
+        large.write_bytes(os.urandom(11 * 1024 * 1024))
+
+        with FakeS3Server() as s3:
+            client = boto3.client("s3", endpoint_url=s3.url, region_name="eu-north-1",
+                                  config=Config(s3={"addressing_style": "path"}))
+            transfer = TransferConfig(multipart_threshold=5 * 1024 * 1024, multipart_chunksize=5 * 1024 * 1024)
+            client.upload_file(str(small), "bucket", "small.mp4")
+            client.upload_file(str(large), "bucket", "large.mp4", Config=transfer)
+
+            assert s3.objects[("bucket", "small.mp4")] == small.read_bytes()
+            assert s3.objects[("bucket", "large.mp4")] == large.read_bytes()
+            assert "complete_multipart_upload" in s3.requests
+
+    def test_notifications_matched_to_videos(self):
+        """Test that emails sent without STARTTLS are traced back to the videos on their pages"""
+        with FakeAppsScriptServer() as appscript, FakeSMTPServer() as smtp:
+            import requests
+            first = requests.post(appscript.url, json={"videoNames": ["a.mp4", "b.mov"]}).text
+            second = requests.post(appscript.url, json={"videoNames": ["c.avi"]}).text
+            pool = SMTPConnectionPool(smtp.host, smtp.port, "", "", starttls=False)
+            pool.send_messages([build_message("to@example.com", *batch_email([first]))])
+            pool.send_messages([build_message("to@example.com", *batch_email([first, second]))])
+            pool.close_all()
+            assert smtp.wait_for(2, 2)
+
+            notified = match_notifications(smtp.messages, appscript.batch_pages)
+
+        assert sorted(notified) == ["a.mp4", "b.mov", "c.avi"]
+        assert notified["a.mp4"] == smtp.messages[0][0]
+        assert notified["c.avi"] == smtp.messages[1][0]
+        assert smtp.sessions == 1
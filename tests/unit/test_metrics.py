@@ -0,0 +1,71 @@
+import urllib.request
+
+from core.metrics import Registry, create_metrics_server
+
+
+class TestMetrics:
+
+    def setup_method(self):
+        self.registry = Registry()
+
+    def test_counter_with_labels(self):
+        """Test that counters keep one series per label value"""
+        failures = self.registry.counter("avas_failures_total", "Failures", labels=("stage",))
+        failures.inc(stage="upload")
+        failures.inc(2, stage="upload")
+        failures.inc(stage="page")
+
+        assert failures.value(stage="upload") == 3
+        text = self.registry.render()
+        assert 'avas_failures_total{stage="page"} 1' in text
+        assert 'avas_failures_total{stage="upload"} 3' in text
+        assert "# TYPE avas_failures_total counter" in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that histogram buckets, sum and count follow the text format"""
+        hist = self.registry.histogram("avas_stage_seconds", "Stages", buckets=(1, 5), labels=("stage",))
+        for value in (0.5, 1, 3, 10):
+            hist.observe(value, stage="upload")
+
+        lines = self.registry.render().splitlines()
+        assert 'avas_stage_seconds_bucket{stage="upload",le="1"} 2' in lines
+        assert 'avas_stage_seconds_bucket{stage="upload",le="5"} 3' in lines
+        assert 'avas_stage_seconds_bucket{stage="upload",le="+Inf"} 4' in lines
+        assert 'avas_stage_seconds_sum{stage="upload"} 14.5' in lines
+        assert 'avas_stage_seconds_count{stage="upload"} 4' in lines
+
+    def test_histogram_time_context(self):
+        """Test that time() observes the block duration even when it raises"""
+        hist = self.registry.histogram("avas_stage_seconds", "Stages", buckets=(1,), labels=("stage",))
+        try:
+            with hist.time(stage="smtp"):
+                raise RuntimeError("down")
+        except RuntimeError:
+            pass
+
+        assert hist.count(stage="smtp") == 1
+
+    def test_gauge_function_read_at_scrape(self):
+        """Test that function gauges are evaluated when rendered and errors are skipped"""
+        depth = self.registry.gauge("avas_queue_depth", "Queue")
+        items = [1, 2]
+        depth.set_function(lambda: len(items))
+        items.append(3)
+        assert "avas_queue_depth 3" in self.registry.render()
+
+        depth.set_function(lambda: 1 / 0)
+        assert not [line for line in self.registry.render().splitlines() if line.startswith("avas_queue_depth")]
+
+    def test_metrics_endpoint(self):
+        """Test that GET /metrics serves the registry"""
+        self.registry.counter("avas_uploaded_bytes_total", "Bytes").inc(42)
+        server = create_metrics_server(registry=self.registry).start()
+        try:
+            with urllib.request.urlopen(server.url + "/metrics", timeout=5) as response:
+                body = response.read().decode()
+                content_type = response.headers["Content-Type"]
+        finally:
+            server.stop()
+
+        assert "avas_uploaded_bytes_total 42" in body
+        assert content_type.startswith("text/plain")
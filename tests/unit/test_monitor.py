@@ -0,0 +1,41 @@
+import time
+import threading
+from unittest.mock import Mock, patch
+
+from core.monitor import MonitorCore
+from core.scheduler import get_scheduler
+from core.dispatcher import get_dispatcher, notify_batch
+from core.reminder import get_reminder
+
+
+class TestMonitorCore:
+
+    def test_restart_gets_running_services(self, tmp_path):
+        """Test that scheduled jobs and notifications still run after stop() and a second start()"""
+        watch = tmp_path / "videos"
+        watch.mkdir()
+        monitor = MonitorCore()
+        ran = threading.Event()
+
+        with patch('core.dispatcher.send_notification_email') as mock_send:
+            monitor.start(str(watch), Mock(), workers=0)
+            monitor.stop(timeout=1)
+            assert monitor.watches == {}
+
+            monitor.start(str(watch), Mock(), workers=0)
+            try:
+                assert monitor.reminder is get_reminder()
+                assert monitor.reminder.scheduler is get_scheduler()
+                get_scheduler().every("probe", 0.05, ran.set)
+                notify_batch(["a.mp4"], ["https://page"], "to@example.com")
+                get_dispatcher().flush()
+
+                assert ran.wait(2)
+                deadline = time.time() + 2
+                while not mock_send.called and time.time() < deadline:
+                    time.sleep(0.01)
+            finally:
+                monitor.stop(timeout=1)
+
+        mock_send.assert_called_once()
+        assert mock_send.call_args[0][0] == "to@example.com"
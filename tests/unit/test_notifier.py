@@ -0,0 +1,103 @@
+import smtplib
+import pytest
+from unittest.mock import Mock, patch
+
+from core.notifier import SMTPConnectionPool, build_message
+
+
+def make_conn():
+    conn = Mock()
+    conn.noop.return_value = (250, b"OK")
+    return conn
+
+
+class TestSMTPConnectionPool:
+
+    def setup_method(self):
+        self.pool = SMTPConnectionPool(
+            server="smtp.test", port=587, username="user", password="pw",
+            max_idle=1, idle_timeout=60, timeout=5
+        )
+
+    def teardown_method(self):
+        self.pool.close_all()
+
+    @patch('core.notifier.smtplib.SMTP')
+    def test_messages_share_one_session(self, mock_smtp):
+        """Test that several messages go out over a single login"""
+        conn = make_conn()
+        mock_smtp.return_value = conn
+
+        messages = [build_message("a@test", f"subject {i}", "body") for i in range(3)]
+        self.pool.send_messages(messages)
+
+        mock_smtp.assert_called_once_with("smtp.test", 587, timeout=5)
+        conn.starttls.assert_called_once()
+        conn.login.assert_called_once_with("user", "pw")
+        assert conn.sendmail.call_count == 3
+
+    @patch('core.notifier.smtplib.SMTP')
+    def test_session_reused_across_calls(self, mock_smtp):
+        """Test that an idle session is health-checked and reused"""
+        conn = make_conn()
+        mock_smtp.return_value = conn
+
+        self.pool.send_messages([build_message("a@test", "one", "body")])
+        self.pool.send_messages([build_message("a@test", "two", "body")])
+
+        assert mock_smtp.call_count == 1
+        conn.noop.assert_called_once()
+        assert conn.sendmail.call_count == 2
+
+    @patch('core.notifier.smtplib.SMTP')
+    def test_dead_idle_session_replaced(self, mock_smtp):
+        """Test that a session failing NOOP is dropped and a new one opened"""
+        stale, fresh = make_conn(), make_conn()
+        stale.noop.side_effect = smtplib.SMTPServerDisconnected()
+        mock_smtp.side_effect = [stale, fresh]
+
+        self.pool.send_messages([build_message("a@test", "one", "body")])
+        self.pool.send_messages([build_message("a@test", "two", "body")])
+
+        assert mock_smtp.call_count == 2
+        assert fresh.sendmail.call_count == 1
+
+    @patch('core.notifier.smtplib.SMTP')
+    def test_expired_idle_session_not_reused(self, mock_smtp):
+        """Test that sessions idle past idle_timeout are closed instead of reused"""
+        first, second = make_conn(), make_conn()
+        mock_smtp.side_effect = [first, second]
+        self.pool.idle_timeout = 0
+
+        self.pool.send_messages([build_message("a@test", "one", "body")])
+        self.pool.send_messages([build_message("a@test", "two", "body")])
+
+        assert mock_smtp.call_count == 2
+        first.noop.assert_not_called()
+        first.quit.assert_called()
+
+    @patch('core.notifier.smtplib.SMTP')
+    def test_reconnect_on_disconnect_mid_batch(self, mock_smtp):
+        """Test that a dropped session is replaced and the failed message retried"""
+        broken, fresh = make_conn(), make_conn()
+        broken.sendmail.side_effect = [None, smtplib.SMTPServerDisconnected()]
+        mock_smtp.side_effect = [broken, fresh]
+
+        messages = [build_message("a@test", f"subject {i}", "body") for i in range(3)]
+        self.pool.send_messages(messages)
+
+        assert broken.sendmail.call_count == 2
+        assert fresh.sendmail.call_count == 2
+
+    @patch('core.notifier.smtplib.SMTP')
+    def test_permanent_error_keeps_session(self, mock_smtp):
+        """Test that a rejected message is raised without dropping the session"""
+        conn = make_conn()
+        conn.sendmail.side_effect = smtplib.SMTPDataError(550, b"rejected")
+        mock_smtp.return_value = conn
+
+        with pytest.raises(smtplib.SMTPDataError):
+            self.pool.send_messages([build_message("a@test", "one", "body")])
+
+        assert conn.sendmail.call_count == 1
+        assert len(self.pool._idle) == 1
@@ -0,0 +1,183 @@
+import os
+import json
+from unittest.mock import Mock, patch
+
+from core.offline_handler import OfflineHandler
+from core.state_db import DirectoryStateDB, SEEN, PROCESSING, DONE, FAILED
+
+NS = 1_000_000_000
+
+
+def touch(path, mtime=None):
+    path.write_bytes(b"data")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestOfflineHandlerScan:
+
+    def make_handler(self, tmp_path, **kwargs):
+        watch = tmp_path / "highlights"
+        watch.mkdir()
+        return watch, OfflineHandler(str(watch), db_file=tmp_path / "directory_state.db", **kwargs)
+
+    def process(self, handler):
+        video_handler = Mock()
+        pending = handler.check_and_process_offline_files(video_handler)
+        if handler.drainer:
+            handler.drainer.join(5)
+        return pending, video_handler
+
+    def test_scan_only_video_files(self, tmp_path):
+        """Test that the scan keeps video files and skips other entries"""
+        watch, handler = self.make_handler(tmp_path)
+        touch(watch / "a.mov", 1000)
+        touch(watch / "b.MP4", 2000)
+        touch(watch / "notes.txt")
+        (watch / "folder.mp4").mkdir()
+
+        assert handler._scan_video_files() == {"a.mov": (4, 1000 * NS), "b.MP4": (4, 2000 * NS)}
+
+    def test_unchanged_directory_not_rewritten(self, tmp_path):
+        """Test that update_state touches the DB only when the directory changed"""
+        watch, handler = self.make_handler(tmp_path)
+        touch(watch / "a.mov", 1000)
+        handler.update_state()
+
+        with patch.object(handler.state, 'sync', wraps=handler.state.sync) as mock_sync:
+            handler.update_state()
+            mock_sync.assert_not_called()
+
+            touch(watch / "b.mov", 2000)
+            handler.update_state()
+            mock_sync.assert_called_once()
+
+        assert handler.state.names() == ["a.mov", "b.mov"]
+
+    def test_first_run_treats_existing_files_as_done(self, tmp_path):
+        """Test that files present before any state existed are not reprocessed"""
+        watch, handler = self.make_handler(tmp_path)
+        touch(watch / "a.mov", 1000)
+
+        pending, video_handler = self.process(handler)
+
+        assert pending == []
+        video_handler.process_batch.assert_not_called()
+        assert handler.state.get("a.mov")["status"] == DONE
+
+    def test_offline_files_detected(self, tmp_path):
+        """Test that files added while not running are handed to the video handler"""
+        watch, handler = self.make_handler(tmp_path)
+        touch(watch / "a.mov", 1000)
+        self.process(handler)
+        touch(watch / "b.mov", 2000)
+
+        pending, video_handler = self.process(handler)
+
+        assert pending == ["b.mov"]
+        video_handler.process_batch.assert_called_once_with([str(watch / "b.mov")], backlog=True)
+
+    def test_seen_but_unprocessed_files_retried(self, tmp_path):
+        """Test that files seen by a scan but never processed are picked up at restart"""
+        watch, handler = self.make_handler(tmp_path)
+        self.process(handler)
+        touch(watch / "a.mov", 1000)
+        touch(watch / "b.mov", 2000)
+        handler.update_state()
+        handler.state.mark("a.mov", PROCESSING)
+        handler.state.mark("a.mov", DONE)
+        handler.state.mark("b.mov", PROCESSING)
+
+        restarted = OfflineHandler(str(watch), db_file=tmp_path / "directory_state.db")
+        pending, _ = self.process(restarted)
+
+        assert pending == ["b.mov"]
+
+    def test_failed_files_retried_until_max_attempts(self, tmp_path):
+        """Test that failed files are retried, but not past max_attempts"""
+        watch, handler = self.make_handler(tmp_path, max_attempts=2)
+        self.process(handler)
+        touch(watch / "a.mov", 1000)
+        handler.update_state()
+
+        handler.state.mark("a.mov", PROCESSING)
+        handler.state.mark("a.mov", FAILED, "upload failed")
+        assert self.process(handler)[0] == ["a.mov"]
+
+        handler.state.mark("a.mov", PROCESSING)
+        handler.state.mark("a.mov", FAILED, "upload failed")
+        assert self.process(handler)[0] == []
+
+        row = handler.state.get("a.mov")
+        assert (row["status"], row["attempts"], row["last_error"]) == (FAILED, 2, "upload failed")
+
+    def test_orphan_sweep_prunes_done_markers(self, tmp_path):
+        """Test that the periodic lease sweep deletes markers of files that are gone"""
+        from core.lease import LeaseManager, LEASE_DIR_NAME
+        watch, handler = self.make_handler(tmp_path)
+        lease = LeaseManager(node_id="node-1")
+        for name in ("a.mov", "b.mov"):
+            (watch / name).write_bytes(b"video")
+            lease.release(str(watch / name), done=True)
+        (watch / "b.mov").unlink()
+
+        assert handler.reclaim_orphans(lease, Mock()) == []
+        assert os.listdir(watch / LEASE_DIR_NAME) == ["a.mov.done"]
+
+    def test_legacy_json_state_imported(self, tmp_path):
+        """Test that files listed in the old JSON state count as processed"""
+        watch = tmp_path / "highlights"
+        watch.mkdir()
+        touch(watch / "a.mov", 1000)
+        touch(watch / "b.mov", 2000)
+        (tmp_path / "directory_state.json").write_text(json.dumps({"files": {"a.mov": 1000}}))
+
+        handler = OfflineHandler(str(watch), db_file=tmp_path / "directory_state.db")
+        pending, _ = self.process(handler)
+
+        assert pending == ["b.mov"]
+        assert handler.state.get("a.mov")["status"] == DONE
+
+
+class TestDirectoryStateDB:
+
+    def test_sync_adds_and_removes(self, tmp_path):
+        """Test that a scan inserts new files as seen and drops vanished ones"""
+        db = DirectoryStateDB(tmp_path / "state.db")
+
+        assert db.sync({"a.mov": (1, 10), "b.mov": (2, 20)}) == (2, 0)
+        db.mark("a.mov", DONE)
+        assert db.sync({"a.mov": (1, 11), "c.mov": (3, 30)}) == (1, 1)
+
+        assert db.names() == ["a.mov", "c.mov"]
+        assert db.get("a.mov")["status"] == DONE
+        assert db.get("a.mov")["mtime_ns"] == 11
+        assert db.get("c.mov")["status"] == SEEN
+        assert db.initialized
+
+    def test_counts_and_persistence(self, tmp_path):
+        """Test that statuses survive reopening the database"""
+        db = DirectoryStateDB(tmp_path / "state.db")
+        db.sync({"a.mov": (1, 10), "b.mov": (2, 20)})
+        db.mark_many(["a.mov", "b.mov"], PROCESSING)
+        db.mark("b.mov", DONE)
+        db.close()
+
+        reopened = DirectoryStateDB(tmp_path / "state.db")
+        assert reopened.counts() == {PROCESSING: 1, DONE: 1}
+        assert reopened.pending(max_attempts=3) == ["a.mov"]
+
+    def test_failed_and_reset(self, tmp_path):
+        """Test that failed files are listed and reset() makes them pending again"""
+        db = DirectoryStateDB(tmp_path / "state.db")
+        db.sync({"a.mov": (1, 10), "b.mov": (2, 20)})
+        db.mark_many(["a.mov", "b.mov"], PROCESSING)
+        db.mark("a.mov", FAILED, "upload failed")
+        db.mark("b.mov", DONE)
+
+        assert [(r["name"], r["last_error"]) for r in db.failed()] == [("a.mov", "upload failed")]
+
+        db.reset(["a.mov"])
+        assert db.failed() == []
+        assert db.get("a.mov")["attempts"] == 0
+        assert db.pending(max_attempts=1) == ["a.mov"]
@@ -0,0 +1,296 @@
+import datetime
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from core.appscript_client import get_survey_statuses
+from core.reminder import SurveyReminder
+from core.config import RECIPIENT_EMAIL
+from tests.fakes.appscript_server import FakeAppsScriptServer
+
+
+def page(status=200, text="", headers=None, chunk_size=64):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.status_code = status
+    response.encoding = "utf-8"
+    response.headers = headers or {}
+    data = text.encode("utf-8")
+    response.iter_content.side_effect = lambda chunk_size=1: iter(
+        [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    )
+    return response
+
+
+SURVEY_PAGE = "<html><body><form>" + "video survey question " * 20 + "<button>submit</button></form></body></html>"
+
+
+class TestSurveyReminderChecks:
+
+    def setup_method(self):
+        # no bulk status endpoint: every survey goes through the page check
+        self.status_patch = patch('core.reminder.get_survey_statuses', return_value=None)
+        self.status_patch.start()
+
+    def teardown_method(self):
+        self.status_patch.stop()
+
+    def make_reminder(self, tmp_path, **kwargs):
+        return SurveyReminder(
+            check_hour=0, check_minute=0,
+            data_file=tmp_path / "pending_surveys.json",
+            start_scheduler=False, **kwargs
+        )
+
+    def test_checks_run_concurrently(self, tmp_path):
+        """Test that the sweep takes about as long as the slowest request"""
+        reminder = self.make_reminder(tmp_path, max_workers=20, per_host_limit=20)
+        surveys = [{'url': f"https://script.test/exec?id={i}"} for i in range(20)]
+
+        def slow_get(url, **kwargs):
+            time.sleep(0.2)
+            return page(text=SURVEY_PAGE)
+
+        with patch.object(reminder._session, 'get', side_effect=slow_get):
+            start = time.time()
+            results = reminder._check_surveys(surveys)
+            elapsed = time.time() - start
+
+        assert results == [False] * 20
+        assert elapsed < 1.0
+
+    def test_per_host_limit(self, tmp_path):
+        """Test that concurrent requests to one host are capped"""
+        reminder = self.make_reminder(tmp_path, max_workers=10, per_host_limit=3)
+        surveys = [{'url': f"https://script.test/exec?id={i}"} for i in range(12)]
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def tracking_get(url, **kwargs):
+            with lock:
+                active.append(url)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(url)
+            return page(text=SURVEY_PAGE)
+
+        with patch.object(reminder._session, 'get', side_effect=tracking_get):
+            reminder._check_surveys(surveys)
+
+        assert max(peak) <= 3
+
+    def test_results_keep_survey_order(self, tmp_path):
+        """Test that completion flags line up with the input surveys"""
+        reminder = self.make_reminder(tmp_path)
+        surveys = [
+            {'url': "https://script.test/exec?id=done"},
+            {'url': "https://script.test/exec?id=open"},
+            {'url': "https://script.test/exec?id=gone"},
+        ]
+        pages = {
+            "https://script.test/exec?id=done": page(text="<html></html>"),
+            "https://script.test/exec?id=open": page(text=SURVEY_PAGE),
+            "https://script.test/exec?id=gone": page(status=404),
+        }
+
+        with patch.object(reminder._session, 'get', side_effect=lambda url, **kwargs: pages[url]):
+            assert reminder._check_surveys(surveys) == [True, False, True]
+
+
+class TestStreamedProbe:
+
+    def make_reminder(self, tmp_path):
+        return SurveyReminder(
+            check_hour=0, check_minute=0,
+            data_file=tmp_path / "pending_surveys.json",
+            start_scheduler=False
+        )
+
+    def test_stops_reading_live_page_early(self, tmp_path):
+        """Test that a live survey page is not downloaded in full"""
+        reminder = self.make_reminder(tmp_path)
+        response = page()
+        consumed = []
+
+        def chunks(chunk_size=1):
+            data = (SURVEY_PAGE + "x" * 1_000_000).encode("utf-8")
+            for i in range(0, len(data), chunk_size):
+                consumed.append(i)
+                yield data[i:i + chunk_size]
+
+        response.iter_content.side_effect = chunks
+        with patch.object(reminder._session, 'get', return_value=response):
+            assert reminder._is_survey_completed("https://script.test/exec?id=1") is False
+
+        assert len(consumed) == 1
+
+    def test_blank_pages_detected(self, tmp_path):
+        """Test the blank page heuristics on streamed bodies"""
+        reminder = self.make_reminder(tmp_path)
+        padding = "<!-- " + "x" * 300 + " -->"
+        blank_pages = [
+            "<html></html>",
+            "<html><head>" + padding + "</head><body><p>nothing here</p></body></html>",
+            "<html><head><title>video survey</title>" + padding + "</head><body></body></html>",
+        ]
+        for text in blank_pages:
+            with patch.object(reminder._session, 'get', return_value=page(text=text, chunk_size=16)):
+                assert reminder._is_survey_completed("https://script.test/exec?id=1") is True
+
+    def test_conditional_request_with_validators(self, tmp_path):
+        """Test that validators are stored and sent, and a 304 counts as pending"""
+        reminder = self.make_reminder(tmp_path)
+        validators = {}
+        first = page(text=SURVEY_PAGE, headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+
+        with patch.object(reminder._session, 'get', return_value=first) as mock_get:
+            assert reminder._is_survey_completed("https://script.test/exec?id=1", validators) is False
+            assert mock_get.call_args[1]['headers'] == {}
+
+        assert validators == {'etag': '"v1"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+
+        with patch.object(reminder._session, 'get', return_value=page(status=304)) as mock_get:
+            assert reminder._is_survey_completed("https://script.test/exec?id=1", validators) is False
+            assert mock_get.call_args[1]['headers'] == {
+                'If-None-Match': '"v1"',
+                'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT',
+            }
+
+
+class TestBulkStatusCheck:
+
+    def setup_method(self):
+        self.server = FakeAppsScriptServer().start()
+
+    def teardown_method(self):
+        self.server.stop()
+
+    def make_reminder(self, tmp_path, bulk_status=True):
+        return SurveyReminder(
+            check_hour=0, check_minute=0,
+            data_file=tmp_path / "pending_surveys.json",
+            start_scheduler=False, bulk_status=bulk_status
+        )
+
+    def test_bulk_status_off_by_default(self, tmp_path):
+        """Test that without the setting the script is never sent the status action"""
+        reminder = SurveyReminder(
+            check_hour=0, check_minute=0, data_file=tmp_path / "pending_surveys.json", start_scheduler=False
+        )
+        surveys = [{'url': self.server.add_page(completed=True)}, {'url': self.server.add_page()}]
+
+        with patch('core.reminder.get_survey_statuses',
+                   lambda ids: get_survey_statuses(ids, script_url=self.server.url)):
+            results = reminder._check_surveys(surveys)
+
+        assert results == [True, False]
+        assert "status" not in self.server.requests
+
+    def test_bulk_status_answers_all_in_one_request(self, tmp_path):
+        """Test that known pages are resolved by one status call, without page downloads"""
+        reminder = self.make_reminder(tmp_path)
+        surveys = [{'url': self.server.add_page(completed=i % 2 == 0)} for i in range(6)]
+
+        with patch('core.reminder.get_survey_statuses',
+                   lambda ids: get_survey_statuses(ids, script_url=self.server.url)):
+            results = reminder._check_surveys(surveys)
+
+        assert results == [True, False, True, False, True, False]
+        assert self.server.requests == ["status"]
+
+    def test_falls_back_to_page_check(self, tmp_path):
+        """Test that pages the status call cannot answer are checked individually"""
+        self.server.status_enabled = False
+        reminder = self.make_reminder(tmp_path)
+        surveys = [
+            {'url': self.server.add_page(completed=True)},
+            {'url': self.server.add_page(completed=False)},
+            {'url': "http://127.0.0.1:1/no-page-id"},
+        ]
+
+        with patch('core.reminder.get_survey_statuses',
+                   lambda ids: get_survey_statuses(ids, script_url=self.server.url)):
+            results = reminder._check_surveys(surveys)
+
+        assert results == [True, False, False]
+        assert self.server.requests.count("GET") == 2
+
+
+class TestReminderBackoff:
+
+    def make_reminder(self, tmp_path):
+        return SurveyReminder(
+            check_hour=0, check_minute=0,
+            data_file=tmp_path / "pending_surveys.json",
+            start_scheduler=False, backoff_days=[1, 3, 7]
+        )
+
+    def test_backoff_schedule(self, tmp_path):
+        """Test that reminders follow day 1, 3, 7 and then every 4 days"""
+        reminder = self.make_reminder(tmp_path)
+        created = datetime.date(2024, 3, 1)
+        due_days = {}
+        for count in range(5):
+            survey = {'created_at': "2024-03-01T18:30:00", 'reminded_count': count}
+            due_days[count] = next(
+                day for day in range(30)
+                if reminder._reminder_due(survey, created + datetime.timedelta(days=day))
+            )
+
+        assert due_days == {0: 1, 1: 3, 2: 7, 3: 11, 4: 15}
+
+    def test_overdue_survey_not_reminded_daily(self, tmp_path):
+        """Test that a survey behind its schedule gets one reminder, then the next after a gap"""
+        reminder = self.make_reminder(tmp_path)
+        created = datetime.datetime(2024, 3, 1, 18, 30)
+        survey = {'created_at': created.isoformat(), 'reminded_count': 0, 'last_reminded': None}
+        reminded_on = []
+        for day in range(10, 30):
+            today = (created + datetime.timedelta(days=day)).date()
+            if reminder._reminder_due(survey, today):
+                reminded_on.append(day)
+                survey['reminded_count'] += 1
+                survey['last_reminded'] = datetime.datetime.combine(today, datetime.time(13, 14)).isoformat()
+
+        # gaps of the 1,3,7 schedule (2, 4, then 4) counted from day 10
+        assert reminded_on == [10, 12, 16, 20, 24, 28]
+
+    def test_reminded_fields_updated(self, tmp_path):
+        """Test that only due surveys are reminded and their counters advance"""
+        reminder = self.make_reminder(tmp_path)
+        reminder.add_survey("old.mov", "https://page/old")
+        reminder.add_survey("new.mov", "https://page/new")
+        two_days_ago = (datetime.datetime.now() - datetime.timedelta(days=2)).isoformat()
+        reminder.store.update_many({"https://page/old": {'created_at': two_days_ago}})
+
+        with patch.object(reminder, '_check_surveys', return_value=[False, False]), \
+                patch('core.reminder.send_notification_email') as mock_send:
+            reminder.check_and_remind()
+
+        mock_send.assert_called_once()
+        assert "old.mov" in mock_send.call_args[0][2]
+        assert "new.mov" not in mock_send.call_args[0][2]
+        assert reminder.store.get("https://page/old")['reminded_count'] == 1
+        assert reminder.store.get("https://page/old")['last_reminded'] is not None
+        assert reminder.store.get("https://page/new")['reminded_count'] == 0
+
+    def test_reminders_grouped_by_recipient(self, tmp_path):
+        """Test that each tenant's recipient gets a reminder with only their surveys"""
+        reminder = self.make_reminder(tmp_path)
+        reminder.add_survey("a.mov", "https://page/a", "a@example.com")
+        reminder.add_survey("b.mov", "https://page/b", "b@example.com")
+        reminder.add_survey("c.mov", "https://page/c")
+        two_days_ago = (datetime.datetime.now() - datetime.timedelta(days=2)).isoformat()
+        reminder.store.update_many({url: {'created_at': two_days_ago} for url in reminder.store.urls()})
+
+        with patch.object(reminder, '_check_surveys', return_value=[False, False, False]), \
+                patch('core.reminder.send_notification_email') as mock_send:
+            reminder.check_and_remind()
+
+        sent = {call[0][0]: call[0][2] for call in mock_send.call_args_list}
+        assert len(sent) == 3
+        assert "a.mov" in sent["a@example.com"] and "b.mov" not in sent["a@example.com"]
+        assert "b.mov" in sent["b@example.com"]
+        assert "c.mov" in sent[RECIPIENT_EMAIL]
@@ -0,0 +1,124 @@
+import datetime
+import threading
+import time
+
+from core.scheduler import Scheduler, next_daily
+
+
+class FakeClock:
+    """Wall clock that only moves when the test says so."""
+
+    def __init__(self, start):
+        self.now = start
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            return self.now
+
+    def advance(self, seconds):
+        with self.lock:
+            self.now += seconds
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+class TestNextDaily:
+
+    def test_later_today(self):
+        """Test that a time later today is due today"""
+        after = datetime.datetime(2024, 3, 15, 9, 0).timestamp()
+        due = datetime.datetime.fromtimestamp(next_daily(after, 13, 14))
+        assert due == datetime.datetime(2024, 3, 15, 13, 14)
+
+    def test_already_passed_rolls_to_tomorrow(self):
+        """Test that a time already reached today is due tomorrow"""
+        after = datetime.datetime(2024, 3, 15, 13, 14).timestamp()
+        due = datetime.datetime.fromtimestamp(next_daily(after, 13, 14))
+        assert due == datetime.datetime(2024, 3, 16, 13, 14)
+
+
+class TestScheduler:
+
+    def setup_method(self):
+        self.clock = FakeClock(datetime.datetime(2024, 3, 15, 9, 0).timestamp())
+        self.scheduler = Scheduler(max_sleep=0.01, clock=self.clock)
+        self.scheduler.start()
+
+    def teardown_method(self):
+        self.scheduler.stop(timeout=1)
+
+    def test_interval_job_runs_when_due(self):
+        """Test that a job does not run early and runs once it is due"""
+        runs = []
+        self.scheduler.every("tick", 60, lambda: runs.append(self.clock()))
+
+        time.sleep(0.05)
+        assert runs == []
+
+        self.clock.advance(60)
+        assert wait_for(lambda: len(runs) == 1)
+
+    def test_missed_runs_coalesced_after_suspend(self):
+        """Test that a clock jump (suspend) runs a missed job once, not once per missed slot"""
+        runs = []
+        job = self.scheduler.daily("daily", 13, 14, lambda: runs.append(self.clock()))
+
+        self.clock.advance(3 * 24 * 3600)
+        assert wait_for(lambda: len(runs) == 1)
+        time.sleep(0.05)
+
+        assert len(runs) == 1
+        assert job.due > self.clock()
+        assert datetime.datetime.fromtimestamp(job.due).strftime("%H:%M") == "13:14"
+
+    def test_several_schedules(self):
+        """Test that one scheduler serves jobs with different cadences"""
+        fast, slow = [], []
+        self.scheduler.every("fast", 10, lambda: fast.append(1))
+        self.scheduler.every("slow", 25, lambda: slow.append(1))
+
+        for _ in range(5):
+            self.clock.advance(10)
+            time.sleep(0.03)
+
+        assert wait_for(lambda: len(fast) == 5 and len(slow) == 2)
+
+    def test_slow_job_does_not_block_others(self):
+        """Test that a long-running job neither delays other jobs nor overlaps itself"""
+        release = threading.Event()
+        slow_runs, fast_runs = [], []
+
+        def slow():
+            slow_runs.append(1)
+            release.wait(2)
+
+        self.scheduler.every("slow", 10, slow)
+        self.scheduler.every("fast", 10, lambda: fast_runs.append(1), first_delay=15)
+
+        self.clock.advance(10)
+        assert wait_for(lambda: len(slow_runs) == 1)
+        self.clock.advance(10)
+        assert wait_for(lambda: len(fast_runs) == 1)
+        time.sleep(0.05)
+        assert len(slow_runs) == 1
+        release.set()
+
+    def test_cancelled_job_stops(self):
+        """Test that a cancelled job is never run"""
+        runs = []
+        job = self.scheduler.every("tick", 10, lambda: runs.append(1))
+        self.scheduler.cancel(job)
+
+        self.clock.advance(100)
+        time.sleep(0.05)
+
+        assert runs == []
+        assert self.scheduler.jobs() == []
@@ -0,0 +1,63 @@
+import os
+import json
+
+import pytest
+
+from core.survey_loader import load_survey_data, thaw
+
+
+def write(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class TestLoadSurveyData:
+
+    def test_parsed_once_and_shared(self, tmp_path):
+        """Test that an unchanged survey is parsed once and shared read-only"""
+        survey = tmp_path / "questions.json"
+        write(survey, {"questions": [{"text": "How was it?"}]})
+
+        first = load_survey_data(survey)
+        second = load_survey_data(survey)
+
+        assert first is second
+        assert first["_survey_file"] == "questions.json"
+        assert first["questions"][0]["text"] == "How was it?"
+        with pytest.raises(TypeError):
+            first["questions"] = []
+
+    def test_reloaded_after_edit(self, tmp_path):
+        """Test that an edited survey is picked up without a restart"""
+        survey = tmp_path / "questions.json"
+        write(survey, {"version": 1}, mtime_ns=1_000_000_000)
+        assert load_survey_data(survey)["version"] == 1
+
+        write(survey, {"version": 2}, mtime_ns=2_000_000_000)
+
+        assert load_survey_data(survey)["version"] == 2
+
+    def test_broken_edit_keeps_last_good_version(self, tmp_path):
+        """Test that a survey that stops parsing does not replace the cached one"""
+        survey = tmp_path / "questions.json"
+        write(survey, {"version": 1}, mtime_ns=1_000_000_000)
+        load_survey_data(survey)
+
+        survey.write_text("{not json")
+        os.utime(survey, ns=(2_000_000_000, 2_000_000_000))
+
+        assert load_survey_data(survey)["version"] == 1
+
+    def test_missing_file_is_empty(self, tmp_path):
+        assert dict(load_survey_data(tmp_path / "missing.json")) == {}
+
+    def test_thaw_gives_json_serialisable_copy(self, tmp_path):
+        """Test that the shared survey converts back to plain JSON data"""
+        survey = tmp_path / "questions.json"
+        data = {"questions": [{"text": "a", "options": [1, 2]}]}
+        write(survey, data)
+
+        plain = thaw(load_survey_data(survey))
+
+        assert json.loads(json.dumps(plain)) == dict(data, _survey_file="questions.json")
@@ -0,0 +1,92 @@
+import os
+import json
+from pathlib import Path
+
+import pytest
+
+from core.survey_rules import SurveyMatcher, load_survey_mapping, get_survey_for_time
+
+
+RULES = [
+    {"prefix": "P01_", "time": "22:00-02:00", "survey": "p01_night.json"},
+    {"prefix": "P01_", "survey": "p01.json"},
+    {"min_duration": 600, "survey": "long.json"},
+    {"time": ["06:00-12:00"], "survey": "morning.json"},
+    {"prefix": "P0", "max_duration": 30, "survey": "short.json"},
+]
+
+
+class TestSurveyMatcher:
+
+    def setup_method(self):
+        self.matcher = SurveyMatcher(RULES, Path("/surveys"), default="questions.json")
+
+    @pytest.mark.parametrize("filename, video_time, duration, expected", [
+        ("P01_2024-03-15.mov", "23:10", 10, "p01_night.json"),
+        ("P01_2024-03-15.mov", "01:59", None, "p01_night.json"),  # wraps past midnight
+        ("P01_2024-03-15.mov", "12:00", 10, "p01.json"),
+        ("P02_2024-03-15.mov", "08:00", 700, "long.json"),  # first matching rule wins
+        ("P02_2024-03-15.mov", "08:00", 100, "morning.json"),
+        ("P02_2024-03-15.mov", "13:00", 20, "short.json"),
+        ("P02_2024-03-15.mov", "13:00", 30, "questions.json"),  # max_duration is exclusive
+        ("X_2024-03-15.mov", "13:00", 100, "questions.json"),
+        ("X_2024-03-15.mov", None, None, "questions.json"),
+    ])
+    def test_first_matching_rule_wins(self, filename, video_time, duration, expected):
+        assert self.matcher.match(filename, video_time, duration) == Path("/surveys") / expected
+
+    def test_no_default_returns_none(self):
+        """Test that without a default unmatched videos are left to the caller"""
+        matcher = SurveyMatcher([{"prefix": "P01_", "survey": "p01.json"}], Path("/surveys"))
+        assert matcher.match("P02_a.mov", "10:00", 5) is None
+
+    def test_many_rules(self):
+        """Test that later rules are found among many"""
+        rules = [{"prefix": f"P{i:03d}_", "survey": f"p{i:03d}.json"} for i in range(500)]
+        matcher = SurveyMatcher(rules, Path("/surveys"))
+        assert matcher.match("P417_clip.mov") == Path("/surveys/p417.json")
+
+    @pytest.mark.parametrize("rule", [
+        {"prefix": "P01_"},
+        {"time": "25:00-26:00", "survey": "a.json"},
+        {"time": "08:00", "survey": "a.json"},
+    ])
+    def test_invalid_rules_rejected(self, rule):
+        with pytest.raises(ValueError):
+            SurveyMatcher([rule], Path("/surveys"))
+
+
+class TestLoadSurveyMapping:
+
+    def test_rules_file_compiled_and_reloaded(self, tmp_path):
+        """Test that the rules are cached until the file changes"""
+        (tmp_path / "p01.json").write_text(json.dumps({"q": 1}))
+        rules_file = tmp_path / "rules.json"
+        rules_file.write_text(json.dumps({"rules": [{"prefix": "P01_", "survey": "p01.json"}]}))
+        os.utime(rules_file, ns=(1_000_000_000, 1_000_000_000))
+
+        first = load_survey_mapping(rules_file)
+        assert load_survey_mapping(rules_file) is first
+        assert get_survey_for_time(first, "10:00", filename="P01_a.mov") == tmp_path / "p01.json"
+
+        rules_file.write_text(json.dumps({"rules": [{"prefix": "P02_", "survey": "p01.json"}]}))
+        os.utime(rules_file, ns=(2_000_000_000, 2_000_000_000))
+        second = load_survey_mapping(rules_file)
+
+        assert second is not first
+        assert get_survey_for_time(second, "10:00", filename="P01_a.mov") is None
+
+    def test_invalid_edit_keeps_previous_rules(self, tmp_path):
+        rules_file = tmp_path / "rules.json"
+        rules_file.write_text(json.dumps({"default": "questions.json", "rules": []}))
+        os.utime(rules_file, ns=(1_000_000_000, 1_000_000_000))
+        first = load_survey_mapping(rules_file)
+
+        rules_file.write_text(json.dumps({"rules": [{"prefix": "P01_"}]}))
+        os.utime(rules_file, ns=(2_000_000_000, 2_000_000_000))
+
+        assert load_survey_mapping(rules_file) is first
+
+    def test_missing_rules_file_matches_nothing(self, tmp_path):
+        matcher = load_survey_mapping(tmp_path / "missing.json")
+        assert get_survey_for_time(matcher, "10:00", filename="P01_a.mov") is None
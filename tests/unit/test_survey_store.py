@@ -0,0 +1,105 @@
+import json
+import multiprocessing
+import threading
+
+from core.survey_store import PendingSurveyStore
+
+
+def survey(i):
+    return {'video_name': f"video{i}.mov", 'url': f"https://page/{i}", 'reminded_count': 0}
+
+
+def add_from_process(path, start, count):
+    store = PendingSurveyStore(path, compact_every=7)
+    for i in range(start, start + count):
+        store.add(survey(i))
+
+
+class TestPendingSurveyStore:
+
+    def test_add_appends_to_log_only(self, tmp_path):
+        """Test that adding a survey does not rewrite the snapshot"""
+        path = tmp_path / "pending_surveys.json"
+        store = PendingSurveyStore(path, compact_every=100)
+        snapshot_before = path.read_text()
+
+        assert store.add(survey(1)) is True
+        assert store.add(survey(1)) is False
+
+        assert path.read_text() == snapshot_before
+        assert len(path.with_suffix(".log").read_text().splitlines()) == 1
+        assert len(store) == 1 and "https://page/1" in store
+
+    def test_state_survives_reopen(self, tmp_path):
+        """Test that a new store replays snapshot and log"""
+        path = tmp_path / "pending_surveys.json"
+        store = PendingSurveyStore(path, compact_every=100)
+        for i in range(5):
+            store.add(survey(i))
+        store.remove_many(["https://page/1", "https://page/3", "https://page/unknown"])
+        store.update_many({"https://page/0": {'reminded_count': 2}})
+
+        reopened = PendingSurveyStore(path, compact_every=100)
+
+        assert [s['url'] for s in reopened.all()] == ["https://page/0", "https://page/2", "https://page/4"]
+        assert reopened.get("https://page/0")['reminded_count'] == 2
+
+    def test_compaction_folds_log_into_snapshot(self, tmp_path):
+        """Test that the log is folded into the original JSON list format"""
+        path = tmp_path / "pending_surveys.json"
+        store = PendingSurveyStore(path, compact_every=3)
+        for i in range(3):
+            store.add(survey(i))
+
+        assert path.with_suffix(".log").read_text() == ""
+        assert [s['url'] for s in json.loads(path.read_text())] == [f"https://page/{i}" for i in range(3)]
+
+    def test_torn_log_line_ignored(self, tmp_path):
+        """Test that a half-written log line from a crash does not corrupt later entries"""
+        path = tmp_path / "pending_surveys.json"
+        store = PendingSurveyStore(path, compact_every=100)
+        store.add(survey(1))
+        with open(path.with_suffix(".log"), "a") as f:
+            f.write('{"op": "add", "survey": {"url"')
+
+        store = PendingSurveyStore(path, compact_every=100)
+        store.add(survey(2))
+
+        assert [s['url'] for s in PendingSurveyStore(path).all()] == ["https://page/1", "https://page/2"]
+
+    def test_returned_surveys_are_copies(self, tmp_path):
+        """Test that callers cannot change the store by mutating results"""
+        store = PendingSurveyStore(tmp_path / "pending_surveys.json")
+        store.add(survey(1))
+
+        store.all()[0]['reminded_count'] = 99
+
+        assert store.get("https://page/1")['reminded_count'] == 0
+
+    def test_concurrent_thread_writers(self, tmp_path):
+        """Test that concurrent adds from many threads are all kept"""
+        path = tmp_path / "pending_surveys.json"
+        store = PendingSurveyStore(path, compact_every=10)
+        threads = [
+            threading.Thread(target=lambda n=n: [store.add(survey(n * 50 + i)) for i in range(50)])
+            for n in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(PendingSurveyStore(path)) == 200
+
+    def test_concurrent_process_writers(self, tmp_path):
+        """Test that several processes appending and compacting lose nothing"""
+        path = tmp_path / "pending_surveys.json"
+        PendingSurveyStore(path)
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=add_from_process, args=(path, n * 30, 30)) for n in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(timeout=60)
+
+        assert len(PendingSurveyStore(path)) == 90
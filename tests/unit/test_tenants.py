@@ -0,0 +1,183 @@
+import json
+import time
+import threading
+
+import pytest
+
+from core.tenants import Tenant, FairSlots, load_tenants
+from core.config import RECIPIENT_EMAIL
+
+
+class TestLoadTenants:
+
+    def test_load_with_defaults_and_relative_paths(self, tmp_path):
+        """Test that tenants are read with defaults and paths relative to the file"""
+        tenants_file = tmp_path / "tenants.json"
+        tenants_file.write_text(json.dumps({"tenants": [
+            {"name": "p01", "watch_dir": "p01", "survey_file": "surveys/p01.json",
+             "recipient": "p01@example.com", "batch_interval": 30},
+            {"name": "p02", "watch_dir": str(tmp_path / "p02")},
+        ]}))
+
+        first, second = load_tenants(tenants_file)
+
+        assert first.watch_dir == str(tmp_path / "p01")
+        assert str(first.survey_file) == str(tmp_path / "surveys" / "p01.json")
+        assert first.recipient == "p01@example.com"
+        assert first.batch_interval == 30
+        assert first.state_file.parts[-3:] == ("tenants", "p01", "directory_state.db")
+        assert second.recipient == RECIPIENT_EMAIL
+        assert second.state_file != first.state_file
+
+    @pytest.mark.parametrize("entries", [
+        [],
+        [{"name": "p01"}],
+        [{"name": "p01", "watch_dir": "a"}, {"name": "p01", "watch_dir": "b"}],
+        [{"name": "p01", "watch_dir": "a"}, {"name": "p02", "watch_dir": "a"}],
+        [{"name": "../p01", "watch_dir": "a"}],
+    ])
+    def test_invalid_files_rejected(self, tmp_path, entries):
+        """Test that empty lists, missing fields and repeated names or directories are errors"""
+        tenants_file = tmp_path / "tenants.json"
+        tenants_file.write_text(json.dumps(entries))
+
+        with pytest.raises(ValueError):
+            load_tenants(tenants_file)
+
+    def test_unnamed_tenant_uses_global_state_file(self):
+        """Test that the single-directory tenant keeps the usual state DB"""
+        from core.config import STATE_DB_FILE
+        assert Tenant("", "/videos").state_file == STATE_DB_FILE
+
+
+class TestFairSlots:
+
+    def test_tenants_take_turns(self):
+        """Test that a busy tenant does not starve the others"""
+        slots = FairSlots(1)
+        order = []
+        slots.acquire("busy")
+
+        def run(tenant):
+            with slots.slot(tenant):
+                order.append(tenant)
+
+        threads = []
+        for tenant in ("busy", "busy", "busy", "quiet"):
+            thread = threading.Thread(target=run, args=(tenant,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.05)
+        slots.release()
+        for thread in threads:
+            thread.join(2)
+
+        assert order[:2] == ["busy", "quiet"]
+        assert sorted(order) == ["busy", "busy", "busy", "quiet"]
+        assert slots.in_use() == 0
+
+    def test_slots_bound_concurrency(self):
+        """Test that no more batches run than there are slots"""
+        slots = FairSlots(2)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def run(tenant):
+            with slots.slot(tenant):
+                with lock:
+                    running.append(tenant)
+                    peak.append(len(running))
+                time.sleep(0.02)
+                with lock:
+                    running.remove(tenant)
+
+        threads = [threading.Thread(target=run, args=(f"t{i % 3}",)) for i in range(9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+
+        assert max(peak) == 2
+
+    def test_cancelled_wait_gives_up(self):
+        """Test that a waiter leaves the queue when cancelled"""
+        slots = FairSlots(1)
+        slots.acquire("a")
+        cancel = threading.Event()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(slots.acquire("b", cancel)))
+        waiter.start()
+        time.sleep(0.05)
+
+        cancel.set()
+        waiter.join(2)
+        slots.release()
+
+        assert result == [False]
+        assert slots.in_use() == 0
+        assert slots.acquire("c")
+
+
+class TestTenantSettings:
+
+    def test_handler_uses_tenant_survey_and_recipient(self, tmp_path):
+        """Test that a tenant's batch loads its survey and notifies its recipient"""
+        from unittest.mock import patch, ANY
+        from core.video_handler import VideoHandler
+
+        survey = tmp_path / "p01.json"
+        survey.write_text(json.dumps({"question": "p01"}))
+        handler = VideoHandler(None, survey_file=survey, recipient="p01@example.com",
+                               slots=FairSlots(1), tenant="p01")
+
+        with patch.object(handler, '_wait_for_stable_file', return_value=True), \
+             patch('core.video_handler.get_video_duration', return_value=10), \
+             patch('core.video_handler.convert_to_mp4', side_effect=lambda p: (p, False)), \
+             patch('core.video_handler.process_and_upload_video', return_value="https://s3/a.mp4"), \
+             patch('core.video_handler.call_appscript_batch', return_value="https://page") as mock_appscript, \
+             patch('core.video_handler.notify_batch') as mock_notify, \
+             patch('core.video_handler.add_survey_to_track') as mock_track:
+            video = tmp_path / "a.mp4"
+            video.write_bytes(b"video")
+            handler.process_batch([str(video)])
+
+        survey_data = mock_appscript.call_args.kwargs["survey_data_list"][0]
+        assert survey_data["question"] == "p01"
+        assert survey_data["_survey_file"] == "p01.json"
+        mock_notify.assert_called_once_with(["a.mp4"], ["https://page"], "p01@example.com", trace_ids=ANY)
+        mock_track.assert_called_once_with("a.mp4", "https://page", "p01@example.com")
+        assert handler.slots.in_use() == 0
+
+    def test_tenant_survey_beats_global_rules_default(self, tmp_path, monkeypatch):
+        """Test that a tenant's survey_file wins over the default of the shared rules file"""
+        from unittest.mock import patch
+        from core.video_handler import VideoHandler
+
+        (tmp_path / "global.json").write_text(json.dumps({"question": "global"}))
+        (tmp_path / "short.json").write_text(json.dumps({"question": "short"}))
+        (tmp_path / "p01.json").write_text(json.dumps({"question": "p01"}))
+        rules = tmp_path / "rules.json"
+        rules.write_text(json.dumps({"default": "global.json", "rules": [{"survey": "short.json", "max_duration": 5}]}))
+        monkeypatch.setattr("core.tenants.SURVEY_RULES_FILE", rules)
+
+        def survey_for(tenant, duration):
+            handler = VideoHandler(None, survey_file=tenant.survey_file, survey_rules=tenant.survey_rules)
+            video = tmp_path / tenant.name / "a.mp4"
+            video.parent.mkdir(exist_ok=True)
+            video.write_bytes(b"video")
+            with patch.object(handler, '_wait_for_stable_file', return_value=True), \
+                 patch('core.video_handler.get_video_duration', return_value=duration), \
+                 patch('core.video_handler.convert_to_mp4', side_effect=lambda p: (p, False)), \
+                 patch('core.video_handler.process_and_upload_video', return_value="https://s3/a.mp4"), \
+                 patch('core.video_handler.call_appscript_batch', return_value="https://page") as mock_appscript, \
+                 patch('core.video_handler.notify_batch'), \
+                 patch('core.video_handler.add_survey_to_track'):
+                handler.process_batch([str(video)])
+            return mock_appscript.call_args.kwargs["survey_data_list"][0]["question"]
+
+        own = Tenant("p01", str(tmp_path / "p01"), survey_file=str(tmp_path / "p01.json"))
+        shared = Tenant("p02", str(tmp_path / "p02"))
+        assert survey_for(own, 60) == "p01"
+        assert survey_for(own, 2) == "short"
+        assert survey_for(shared, 60) == "global"
@@ -0,0 +1,98 @@
+import json
+import time
+
+import pytest
+
+from core import tracing
+from core.metrics import STAGE_SECONDS, FAILURES
+from core.trace_summary import summarize, format_summary
+
+
+@pytest.fixture
+def trace_log(tmp_path):
+    tracing.stop_trace_logging()
+    log_file = tmp_path / "trace.jsonl"
+    tracing.start_trace_logging(log_file)
+    yield log_file
+    tracing.stop_trace_logging()
+
+
+def read_lines(log_file):
+    tracing.stop_trace_logging()
+    return [json.loads(line) for line in log_file.read_text().splitlines()]
+
+
+class TestSpans:
+
+    def test_span_written_as_json_line(self, trace_log):
+        """Test that a span logs its stage, trace id, duration and extra fields"""
+        before = STAGE_SECONDS.count(stage="probe")
+        with tracing.span("probe", "abc123", file="a.mov") as result:
+            result["video_seconds"] = 12.5
+
+        [entry] = read_lines(trace_log)
+        assert entry["event"] == "span"
+        assert entry["trace_id"] == "abc123"
+        assert entry["stage"] == "probe"
+        assert entry["file"] == "a.mov"
+        assert entry["video_seconds"] == 12.5
+        assert entry["ok"] is True
+        assert entry["duration_ms"] >= 0
+        assert STAGE_SECONDS.count(stage="probe") == before + 1
+
+    def test_failed_span(self, trace_log):
+        """Test that exceptions and ok=False mark the span as failed"""
+        before = FAILURES.value(stage="upload")
+        with pytest.raises(RuntimeError):
+            with tracing.span("upload", "t1"):
+                raise RuntimeError("s3 down")
+        with tracing.span("upload", "t2") as result:
+            result["ok"] = False
+
+        entries = read_lines(trace_log)
+        assert [e["ok"] for e in entries] == [False, False]
+        assert "s3 down" in entries[0]["error"]
+        assert entries[0]["level"] == "warning"
+        assert FAILURES.value(stage="upload") == before + 2
+
+    def test_notify_span_logged_around_send(self, trace_log, tmp_path):
+        """Test that the dispatcher logs the notify stage with the videos' trace ids when it sends"""
+        from unittest.mock import patch
+        from core.dispatcher import NotificationDispatcher
+
+        dispatcher = NotificationDispatcher(spool_dir=tmp_path / "spool")
+        dispatcher.enqueue_batch(["a.mov", "b.mov"], ["https://page/1"], "r@test", trace_ids=["t1", "t2"])
+        dispatcher.enqueue_email("r@test", "Reminder", "body")
+        with patch('core.dispatcher.send_notification_email', side_effect=lambda *args: time.sleep(0.02)):
+            dispatcher.dispatch_due()
+
+        [entry] = [e for e in read_lines(trace_log) if e.get("stage") == "notify"]
+        assert entry["trace_ids"] == ["t1", "t2"]
+        assert entry["videos"] == 2
+        assert entry["ok"] is True
+        assert entry["duration_ms"] >= 20
+
+
+class TestTraceSummary:
+
+    def test_per_stage_breakdown(self):
+        """Test that spans are aggregated per stage and other lines ignored"""
+        lines = [
+            json.dumps({"event": "span", "stage": "upload", "duration_ms": ms, "ok": ok})
+            for ms, ok in ((100, True), (300, True), (200, False))
+        ] + [
+            json.dumps({"event": "span", "stage": "wait", "duration_ms": 2000, "ok": True}),
+            json.dumps({"event": "video", "trace_id": "x"}),
+            "not json",
+        ]
+
+        summary = summarize(lines)
+
+        assert set(summary) == {"upload", "wait"}
+        assert summary["upload"]["count"] == 3
+        assert summary["upload"]["failures"] == 1
+        assert summary["upload"]["p50_ms"] == 200
+        assert summary["upload"]["max_ms"] == 300
+        table = format_summary(summary).splitlines()
+        assert table[1].startswith("wait")
+        assert table[2].startswith("upload")
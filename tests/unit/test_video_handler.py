@@ -1,7 +1,7 @@
 import pytest
 import threading
 import time
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import ANY, Mock, patch, MagicMock
 from watchdog.events import DirCreatedEvent, FileCreatedEvent
 
 from core.video_handler import VideoHandler
@@ -13,11 +13,21 @@ class TestVideoHandlerQueueLogic:
         """Setup for each test"""
         self.callback = Mock()
         self.handler = VideoHandler(self.callback, batch_interval=0.1)  # Short interval for testing
+        # batches that get this far must not reach the real Apps Script, spool or survey store
+        self.outputs = [
+            patch('core.video_handler.call_appscript_batch', return_value=None),
+            patch('core.video_handler.notify_batch'),
+            patch('core.video_handler.add_survey_to_track'),
+        ]
+        for output in self.outputs:
+            output.start()
     
     def teardown_method(self):
         """Cleanup after each test"""
         if self.handler._timer:
             self.handler._timer.cancel()
+        for output in self.outputs:
+            output.stop()
 
     def test_single_file_starts_timer(self):
         """Test that a single file starts the timer"""
@@ -359,4 +369,260 @@ class TestVideoHandlerQueueLogic:
         
         # Test None uses default
         handler3 = VideoHandler(Mock(), batch_interval=None)
-        assert handler3.batch_interval == 10
\ No newline at end of file
+        assert handler3.batch_interval == 10
+
+    def test_is_idle_tracks_live_batches(self):
+        """Test that is_idle is False while a live event waits for its batch"""
+        assert self.handler.is_idle()
+
+        with patch.object(self.handler, 'process_batch') as mock_process:
+            self.handler.on_created(FileCreatedEvent("/test/video.mov"))
+            assert not self.handler.is_idle()
+
+            self.handler._timer.join()
+            mock_process.assert_called_once_with(["/test/video.mov"])
+
+        assert self.handler.is_idle()
+
+
+class TestVideoHandlerDrain:
+
+    def setup_method(self):
+        self.handler = VideoHandler(Mock(), batch_interval=10, wait_interval=0.01)
+
+    def test_drain_cancels_pending_timer(self):
+        """Test that drain drops queued files and new events instead of waiting for the timer"""
+        self.handler.on_created(FileCreatedEvent("/test/video.mov"))
+        timer = self.handler._timer
+
+        start = time.time()
+        assert self.handler.drain(timeout=5)
+        assert time.time() - start < 1
+
+        timer.join(1)
+        assert not timer.is_alive()
+        assert self.handler._queue.empty()
+        self.handler.on_created(FileCreatedEvent("/test/late.mov"))
+        assert self.handler._queue.empty()
+
+    def test_drain_waits_for_batch_in_flight(self):
+        """Test that drain lets the running upload finish but starts no further files"""
+        uploading = threading.Event()
+        release = threading.Event()
+        processed = []
+
+        def slow_upload(path):
+            uploading.set()
+            release.wait(2)
+            processed.append(path)
+            return "https://s3/" + path
+
+        with patch.object(self.handler, '_wait_for_stable_file', return_value=True), \
+             patch('core.video_handler.extract_timestamp_from_filename', return_value=("2024-05-01T10:00:00", "10:00")), \
+             patch('core.video_handler.get_video_duration', return_value=10), \
+             patch('core.video_handler.load_survey_data', return_value={}), \
+             patch('core.video_handler.convert_to_mp4', side_effect=lambda p: (p, False)), \
+             patch('core.video_handler.process_and_upload_video', side_effect=slow_upload), \
+             patch('core.video_handler.call_appscript_batch', return_value="https://page") as mock_appscript, \
+             patch('core.video_handler.notify_batch') as mock_notify, \
+             patch('core.video_handler.add_survey_to_track'):
+            worker = threading.Thread(target=self.handler.process_batch, args=(["/test/a.mp4", "/test/b.mp4"],))
+            worker.start()
+            assert uploading.wait(2)
+
+            threading.Timer(0.1, release.set).start()
+            assert self.handler.drain(timeout=5)
+            worker.join(2)
+
+        assert len(processed) == 1
+        mock_appscript.assert_called_once()
+        mock_notify.assert_called_once_with(
+            [processed[0].split("/")[-1]], ["https://page"], self.handler.recipient, trace_ids=ANY
+        )
+        assert len(mock_notify.call_args.kwargs["trace_ids"]) == 1
+
+    def test_drain_gives_up_at_deadline(self):
+        """Test that drain returns False when the batch outlives the deadline"""
+        release = threading.Event()
+        with patch.object(self.handler, '_process_batch', side_effect=lambda items: release.wait(2)):
+            worker = threading.Thread(target=self.handler.process_batch, args=(["/test/a.mp4"],))
+            worker.start()
+            time.sleep(0.05)
+
+            assert not self.handler.drain(timeout=0.1)
+            release.set()
+            worker.join(2)
+
+    def test_live_batch_not_held_behind_backlog_session(self):
+        """Test that a live batch runs during a backlog session, which waits for it between files"""
+        started = []
+        backlog_uploading = threading.Event()
+        backlog_release = threading.Event()
+        live_uploading = threading.Event()
+        live_release = threading.Event()
+
+        def upload(path):
+            started.append(path)
+            if path == "/test/live.mp4":
+                live_uploading.set()
+                live_release.wait(2)
+            elif not backlog_uploading.is_set():
+                backlog_uploading.set()
+                backlog_release.wait(2)
+            return "https://s3/" + path
+
+        with patch.object(self.handler, '_wait_for_stable_file', return_value=True), \
+             patch('core.video_handler.extract_timestamp_from_filename', return_value=("2024-05-01T10:00:00", "10:00")), \
+             patch('core.video_handler.get_video_duration', return_value=10), \
+             patch('core.video_handler.load_survey_data', return_value={}), \
+             patch('core.video_handler.convert_to_mp4', side_effect=lambda p: (p, False)), \
+             patch('core.video_handler.process_and_upload_video', side_effect=upload), \
+             patch('core.video_handler.call_appscript_batch', return_value="https://page"), \
+             patch('core.video_handler.notify_batch'), \
+             patch('core.video_handler.add_survey_to_track'):
+            backlog = threading.Thread(
+                target=self.handler.process_batch, args=(["/test/old1.mp4", "/test/old2.mp4"],), kwargs={"backlog": True}
+            )
+            backlog.start()
+            assert backlog_uploading.wait(2)
+
+            # the live batch starts while the backlog file is still uploading
+            self.handler.on_created(FileCreatedEvent("/test/live.mp4"))
+            self.handler.flush()
+            assert live_uploading.wait(2)
+
+            # the next backlog file waits until the live batch is done
+            backlog_release.set()
+            time.sleep(0.1)
+            assert len(started) == 2
+            live_release.set()
+            backlog.join(2)
+
+        assert started[1] == "/test/live.mp4"
+        assert sorted(started) == ["/test/live.mp4", "/test/old1.mp4", "/test/old2.mp4"]
+        assert self.handler.is_idle()
+
+    def test_restarts_during_stability_wait_keep_the_file_pending(self, tmp_path):
+        """Test that shutdowns while a file is still being copied do not use up its attempts"""
+        from core.state_db import DirectoryStateDB, SEEN
+        from core.config import STATE_MAX_ATTEMPTS
+
+        state = DirectoryStateDB(tmp_path / "state.db")
+        for _ in range(STATE_MAX_ATTEMPTS):
+            handler = VideoHandler(Mock(), batch_interval=10, wait_interval=0.01, state=state)
+            waiting = threading.Event()
+
+            def copying(path, handler=handler):
+                waiting.set()
+                handler._closing.wait(2)
+                return False
+
+            with patch.object(handler, '_wait_for_stable_file', side_effect=copying):
+                worker = threading.Thread(target=handler.process_batch, args=(["/test/large.mov"],))
+                worker.start()
+                assert waiting.wait(2)
+                assert handler.drain(timeout=2)
+                worker.join(2)
+
+        row = state.get("large.mov")
+        assert (row["status"], row["attempts"]) == (SEEN, 0)
+        assert state.pending(STATE_MAX_ATTEMPTS) == ["large.mov"]
+
+
+class TestVideoHandlerControl:
+
+    def setup_method(self):
+        self.handler = VideoHandler(Mock(), batch_interval=10, wait_interval=0.01)
+
+    def teardown_method(self):
+        if self.handler._timer:
+            self.handler._timer.cancel()
+
+    def test_flush_runs_batch_now(self):
+        """Test that flush() processes the queue without waiting for the timer"""
+        done = threading.Event()
+        with patch.object(self.handler, 'process_batch', side_effect=lambda items: done.set()) as mock_process:
+            self.handler.on_created(FileCreatedEvent("/test/video.mov"))
+
+            assert self.handler.flush() == 1
+            assert done.wait(2)
+
+        mock_process.assert_called_once_with(["/test/video.mov"])
+        assert self.handler._timer is None
+
+    def test_pause_holds_queued_files(self):
+        """Test that a paused handler keeps files queued until resume()"""
+        self.handler.pause()
+        with patch.object(self.handler, 'process_batch') as mock_process:
+            self.handler.on_created(FileCreatedEvent("/test/video.mov"))
+            self.handler._run_batch()
+
+            mock_process.assert_not_called()
+            assert self.handler.queued_files() == ["/test/video.mov"]
+            assert not self.handler.is_idle()
+
+            self.handler.resume()
+            assert self.handler._timer is not None
+
+    def test_active_stage_and_failures_reported(self):
+        """Test that the running stage and failures are visible while processing"""
+        seen = {}
+
+        def wait(path):
+            seen["active"] = self.handler.active_files()
+            return False
+
+        with patch.object(self.handler, '_wait_for_stable_file', side_effect=wait):
+            self.handler.process_batch(["/test/video.mov"])
+
+        assert [(a["file"], a["stage"]) for a in seen["active"]] == [("video.mov", "wait")]
+        assert self.handler.active_files() == []
+        [failure] = self.handler.recent_failures()
+        assert (failure["file"], failure["stage"]) == ("video.mov", "wait")
+
+    def test_probe_and_transcode_failures_counted(self):
+        """Test that a failed probe or conversion counts as a stage failure, an .mp4 upload does not"""
+        from core.metrics import FAILURES
+        before = {stage: FAILURES.value(stage=stage) for stage in ("probe", "convert")}
+
+        with patch.object(self.handler, '_wait_for_stable_file', return_value=True), \
+             patch('core.video_handler.extract_timestamp_from_filename', return_value=("2024-05-01T10:00:00", "10:00")), \
+             patch('core.video_handler.get_video_duration', return_value=None), \
+             patch('core.video_handler.convert_to_mp4', side_effect=lambda p: (p, False)), \
+             patch('core.video_handler.process_and_upload_video', return_value="https://s3/v"), \
+             patch('core.video_handler.call_appscript_batch', return_value="https://page"), \
+             patch('core.video_handler.notify_batch') as mock_notify, \
+             patch('core.video_handler.add_survey_to_track'):
+            self.handler.process_batch(["/test/broken.avi", "/test/fine.mp4"])
+
+        assert FAILURES.value(stage="probe") == before["probe"] + 2
+        assert FAILURES.value(stage="convert") == before["convert"] + 1
+        # both are still uploaded as they were before
+        assert sorted(mock_notify.call_args[0][0]) == ["broken.avi", "fine.mp4"]
+
+    def test_failed_conversion_forgets_its_output(self, tmp_path):
+        """Test that a later recording named like a failed conversion's output is still processed"""
+        from core.state_db import DirectoryStateDB, OUTPUT
+        state = DirectoryStateDB(tmp_path / "state.db")
+        handler = VideoHandler(Mock(), batch_interval=10, wait_interval=0.01, state=state)
+        recorded = []
+
+        def failing_convert(path):
+            recorded.append(state.get("clip.mp4")["status"])
+            return path, False
+
+        with patch.object(handler, '_wait_for_stable_file', return_value=True), \
+             patch('core.video_handler.extract_timestamp_from_filename', return_value=("2024-05-01T10:00:00", "10:00")), \
+             patch('core.video_handler.get_video_duration', return_value=10), \
+             patch('core.video_handler.convert_to_mp4', side_effect=failing_convert), \
+             patch('core.video_handler.process_and_upload_video', return_value="https://s3/v"), \
+             patch('core.video_handler.call_appscript_batch', return_value="https://page"), \
+             patch('core.video_handler.notify_batch'), \
+             patch('core.video_handler.add_survey_to_track'):
+            handler.process_batch([str(tmp_path / "clip.avi")])
+
+        assert recorded == [OUTPUT]
+        assert state.get("clip.mp4") is None
+        handler.on_created(FileCreatedEvent(str(tmp_path / "clip.mp4")))
+        assert handler.queued_files() == [str(tmp_path / "clip.mp4")]
+        handler._timer.cancel()
@@ -0,0 +1,129 @@
+import datetime
+import threading
+from unittest.mock import patch
+
+import requests
+
+from core.reminder import SurveyReminder
+from core.webhook import SurveyWebhook
+
+
+class TestSurveyWebhook:
+
+    def setup_method(self):
+        self.webhook = None
+
+    def teardown_method(self):
+        if self.webhook:
+            self.webhook.stop()
+
+    def start(self, tmp_path, token="", surveys=3):
+        self.reminder = SurveyReminder(
+            check_hour=0, check_minute=0,
+            data_file=tmp_path / "pending_surveys.json",
+            start_scheduler=False, reconcile_days=7
+        )
+        for i in range(surveys):
+            self.reminder.add_survey(f"video{i}.mov", f"https://script.test/exec?id={i}")
+        self.webhook = SurveyWebhook(self.reminder, host="127.0.0.1", port=0, token=token).start()
+        return self.webhook
+
+    def test_completion_by_url_and_id(self, tmp_path):
+        """Test that a pushed completion removes the survey immediately"""
+        webhook = self.start(tmp_path)
+
+        resp = requests.post(webhook.url, json={"url": "https://script.test/exec?id=0"}, timeout=5)
+        assert resp.status_code == 200
+        assert resp.json() == {"removed": ["https://script.test/exec?id=0"]}
+
+        resp = requests.post(webhook.url, json={"ids": ["1", "2"]}, timeout=5)
+        assert sorted(resp.json()["removed"]) == ["https://script.test/exec?id=1", "https://script.test/exec?id=2"]
+        assert self.reminder.get_pending_surveys() == []
+
+    def test_idempotent(self, tmp_path):
+        """Test that repeating a completion succeeds without removing anything"""
+        webhook = self.start(tmp_path)
+
+        first = requests.post(webhook.url, json={"id": "1"}, timeout=5)
+        second = requests.post(webhook.url, json={"id": "1"}, timeout=5)
+
+        assert first.json()["removed"] == ["https://script.test/exec?id=1"]
+        assert second.status_code == 200
+        assert second.json()["removed"] == []
+        assert len(self.reminder.get_pending_surveys()) == 2
+
+    def test_burst_of_duplicate_calls(self, tmp_path):
+        """Test that a concurrent burst removes every survey exactly once"""
+        webhook = self.start(tmp_path, surveys=20)
+        removed = []
+        lock = threading.Lock()
+
+        def post(i):
+            resp = requests.post(webhook.url, json={"id": str(i % 20)}, timeout=10)
+            with lock:
+                removed.extend(resp.json()["removed"])
+
+        threads = [threading.Thread(target=post, args=(i,)) for i in range(100)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sorted(removed) == sorted(f"https://script.test/exec?id={i}" for i in range(20))
+        assert self.reminder.get_pending_surveys() == []
+
+    def test_token_required(self, tmp_path):
+        """Test that a configured token is enforced"""
+        webhook = self.start(tmp_path, token="secret")
+
+        assert requests.post(webhook.url, json={"id": "0"}, timeout=5).status_code == 401
+        resp = requests.post(webhook.url, json={"id": "0"}, headers={"X-AVAS-Token": "secret"}, timeout=5)
+        assert resp.json()["removed"] == ["https://script.test/exec?id=0"]
+
+    def test_bad_requests(self, tmp_path):
+        """Test that malformed bodies are rejected"""
+        webhook = self.start(tmp_path)
+
+        json_type = {"Content-Type": "application/json"}
+        assert requests.post(webhook.url, data=b"not json", headers=json_type, timeout=5).status_code == 400
+        assert requests.post(webhook.url, json={"other": 1}, timeout=5).status_code == 400
+        assert requests.post(webhook.url, json={"url": {"a": 1}}, timeout=5).status_code == 400
+        assert requests.post(webhook.url, json={"urls": [["x"]]}, timeout=5).status_code == 400
+        assert requests.get(webhook.url, timeout=5).status_code == 405
+        assert len(self.reminder.get_pending_surveys()) == 3
+
+    def test_cross_origin_simple_post_refused(self, tmp_path):
+        """Test that a text/plain POST a foreign web page could send removes nothing"""
+        webhook = self.start(tmp_path)
+
+        resp = requests.post(webhook.url, data=b'{"id": "0"}', timeout=5,
+                             headers={"Content-Type": "text/plain", "Origin": "https://evil.example"})
+        assert resp.status_code == 415
+        assert "Access-Control-Allow-Origin" not in resp.headers
+        preflight = requests.options(webhook.url, headers={"Origin": "https://evil.example"}, timeout=5)
+        assert "Access-Control-Allow-Origin" not in preflight.headers
+        assert len(self.reminder.get_pending_surveys()) == 3
+
+    def test_non_ascii_token(self, tmp_path):
+        """Test that a non-ASCII token is compared instead of failing the request"""
+        webhook = self.start(tmp_path, token="sécret")
+
+        resp = requests.post(webhook.url, json={"id": "0"}, headers={"X-AVAS-Token": "wrong"}, timeout=5)
+        assert resp.status_code == 401
+        resp = requests.post(webhook.url + "?token=s%C3%A9cret", json={"id": "0"}, timeout=5)
+        assert resp.json()["removed"] == ["https://script.test/exec?id=0"]
+        assert "Access-Control-Allow-Origin" in resp.headers
+
+    def test_polling_only_on_reconciliation(self, tmp_path):
+        """Test that with pushed completions pages are probed only every reconcile_days"""
+        self.start(tmp_path)
+
+        with patch.object(self.reminder, '_check_surveys', return_value=[False] * 3) as mock_check, \
+                patch('core.reminder.send_notification_email'):
+            self.reminder.check_and_remind()
+            self.reminder.check_and_remind()
+            assert mock_check.call_count == 1
+
+            self.reminder.last_probe -= datetime.timedelta(days=7)
+            self.reminder.check_and_remind()
+            assert mock_check.call_count == 2